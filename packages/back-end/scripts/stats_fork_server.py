@@ -0,0 +1,166 @@
+import gc
+import json
+import os
+import selectors
+import signal
+import socket
+import sys
+
+from gbstats.gbstats import process_multiple_experiment_results
+from stats_server import serve
+
+# Fork server for the stats engine. The parent imports gbstats once, runs a
+# small analysis so scipy distributions and pydantic schemas are built, and then
+# forks one child per connection on a unix socket. Each child speaks the same
+# line protocol as stats_server.py over its connection, so scaling the pool up
+# costs a fork instead of a cold interpreter start.
+
+WARMUP_ROWS = [
+    {
+        "dimension": "All",
+        "variation": variation,
+        "users": 1000,
+        "count": 1000,
+        "main_sum": main_sum,
+        "main_sum_squares": main_sum * 3,
+        "denominator_sum": 1000,
+        "denominator_sum_squares": 1200,
+        "main_denominator_sum_product": main_sum * 2,
+        "covariate_sum": main_sum * 0.9,
+        "covariate_sum_squares": main_sum * 2.5,
+        "main_covariate_sum_product": main_sum * 2.2,
+    }
+    for variation, main_sum in [("0", 500), ("1", 540)]
+]
+
+
+def warmup_metric(id, statistic_type):
+    return {
+        "id": id,
+        "name": id,
+        "statistic_type": statistic_type,
+        "main_metric_type": "count",
+        "denominator_metric_type": "count",
+        "covariate_metric_type": "count",
+        "business_metric_type": ["goal"],
+    }
+
+
+def warmup_analysis(stats_engine, sequential_testing_enabled=False):
+    return {
+        "var_names": ["Control", "Variation"],
+        "var_ids": ["0", "1"],
+        "weights": [0.5, 0.5],
+        "stats_engine": stats_engine,
+        "sequential_testing_enabled": sequential_testing_enabled,
+    }
+
+
+WARMUP_DATA = [
+    {
+        "id": "warmup",
+        "data": {
+            "metrics": {
+                "mean": warmup_metric("mean", "mean"),
+                "ratio": warmup_metric("ratio", "ratio"),
+                "mean_ra": warmup_metric("mean_ra", "mean_ra"),
+            },
+            "analyses": [
+                warmup_analysis("bayesian"),
+                warmup_analysis("frequentist"),
+                warmup_analysis("frequentist", sequential_testing_enabled=True),
+            ],
+            "query_results": [
+                {
+                    "metrics": ["mean", "ratio", "mean_ra"],
+                    "rows": [
+                        {
+                            "dimension": row["dimension"],
+                            "variation": row["variation"],
+                            **{
+                                f"m{i}_{k}": v
+                                for i in range(3)
+                                for k, v in row.items()
+                                if k not in ("dimension", "variation")
+                            },
+                        }
+                        for row in WARMUP_ROWS
+                    ],
+                }
+            ],
+        },
+    }
+]
+
+
+def warm_up():
+    for result in process_multiple_experiment_results(WARMUP_DATA):
+        if result.error:
+            sys.stderr.write(f"Stats fork server warm-up failed: {result.error}\n")
+            sys.stderr.flush()
+
+
+def serve_connection(conn):
+    with conn.makefile("r", encoding="utf-8") as infile, conn.makefile(
+        "w", encoding="utf-8"
+    ) as outfile:
+        # Let the caller know which process is serving this connection
+        outfile.write(json.dumps({"pid": os.getpid()}) + "\n")
+        outfile.flush()
+        serve(infile, outfile)
+
+
+def accept(server, selector):
+    conn, _ = server.accept()
+    pid = os.fork()
+    if pid == 0:
+        selector.close()
+        server.close()
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        try:
+            serve_connection(conn)
+        finally:
+            conn.close()
+            os._exit(0)
+    conn.close()
+
+
+def main(socket_path):
+    warm_up()
+    # Move everything allocated so far out of the collector's reach, so children
+    # don't touch (and copy) the shared pages when they collect
+    gc.freeze()
+
+    # Children are never waited on, let the kernel reap them
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen()
+
+    # A single-threaded loop over both the socket and stdin, so we never fork
+    # a process with other threads running. The parent keeps our stdin open;
+    # EOF means it has gone away.
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ)
+    selector.register(sys.stdin.fileno(), selectors.EVENT_READ)
+
+    sys.stdout.write(json.dumps({"ready": True, "pid": os.getpid()}) + "\n")
+    sys.stdout.flush()
+
+    while True:
+        for key, _ in selector.select():
+            if key.fileobj is server:
+                accept(server, selector)
+            elif not os.read(sys.stdin.fileno(), 4096):
+                selector.close()
+                server.close()
+                if os.path.exists(socket_path):
+                    os.unlink(socket_path)
+                return
+
+
+if __name__ == "__main__":
+    main(sys.argv[1])
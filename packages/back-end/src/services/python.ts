@@ -1,7 +1,9 @@
-import { ChildProcess, spawn } from "child_process";
+import { spawn } from "child_process";
+import net from "net";
 import os from "os";
 import path from "path";
 import readline from "readline";
+import { Readable, Writable } from "stream";
 import { randomUUID } from "crypto";
 import {
   CloudWatchClient,
@@ -45,6 +47,15 @@ const STATS_ENGINE_TIMEOUT_MS = parseEnvInt(
   { min: 1, name: "GB_STATS_ENGINE_TIMEOUT_MS" },
 );
 
+// When enabled, a single fork server imports and warms up gbstats once and every
+// pool member is a forked child of it, so growing the pool doesn't pay for a
+// cold interpreter start.
+const USE_FORK_SERVER = stringToBoolean(
+  process.env.GB_STATS_ENGINE_FORK_SERVER,
+);
+
+const SCRIPTS_DIR = path.join(__dirname, "..", "..", "scripts");
+
 // stats_server.py writes via json.dumps(allow_nan=True), so output is strict
 // JSON unless it contains NaN/Infinity literals — fall back to JSON5 for those.
 function parsePythonOutput<T>(line: string): T {
@@ -62,8 +73,134 @@ if (IS_CLOUD) {
   });
 }
 
+function getPythonCommand() {
+  return process.env.GB_ENABLE_PYTHON_DD_PROFILING
+    ? ["ddtrace-run", "python3"]
+    : ["python3"];
+}
+
+function logPythonStderr(pid: number, data: Buffer | string) {
+  const err = data.toString().trim();
+  // Ignore some common warnings in production
+  if (ENVIRONMENT === "production") {
+    // Pandas performance warnings
+    if (err.match(/PerformanceWarning/)) return;
+    // Runtime warnings from numpy
+    if (err.match(/RuntimeWarning/)) return;
+    // OpenTelemetry warnings from ddtrace
+    if (err.match(/OTEL_/)) return;
+  }
+
+  logger.error(`Python stats server (pid: ${pid}) stderr: ${err}`);
+}
+
+// The pipes and lifecycle of a single stats server, either a spawned
+// interpreter or a connection to a child of the fork server
+type StatsServerConnection = {
+  pid: number;
+  input: Writable;
+  output: Readable;
+  stderr?: Readable;
+  isRunning: () => boolean;
+  kill: () => void;
+  onClose: (callback: (reason: string) => void) => void;
+};
+
+function spawnStatsServer(script: string): StatsServerConnection {
+  const [command, ...pythonArgs] = getPythonCommand();
+  const python = spawn(command, [...pythonArgs, "-u", script], {
+    stdio: ["pipe", "pipe", "pipe"],
+  });
+  return {
+    pid: python.pid || -1,
+    input: python.stdin,
+    output: python.stdout,
+    stderr: python.stderr,
+    isRunning: () => python.exitCode === null,
+    kill: () => python.kill(),
+    onClose: (callback) =>
+      python.on("close", (code, signal) =>
+        callback(`exited with code ${code} ${signal}`),
+      ),
+  };
+}
+
+let forkServerSocket: Promise<string> | null = null;
+
+// Start the fork server on first use and resolve with its socket path once it
+// has warmed up. If it ever exits, the next call starts a new one.
+function getForkServerSocket(script: string): Promise<string> {
+  if (forkServerSocket) return forkServerSocket;
+
+  forkServerSocket = new Promise<string>((resolve, reject) => {
+    const socketPath = path.join(
+      os.tmpdir(),
+      `gbstats-${process.pid}-${randomUUID()}.sock`,
+    );
+    const [command, ...pythonArgs] = getPythonCommand();
+    const forkServer = spawn(
+      command,
+      [...pythonArgs, "-u", script, socketPath],
+      { stdio: ["pipe", "pipe", "pipe"] },
+    );
+    const pid = forkServer.pid || -1;
+    logger.debug(`Python stats fork server (pid: ${pid}) started`);
+
+    readline
+      .createInterface({ input: forkServer.stdout, crlfDelay: Infinity })
+      .on("line", (line) => {
+        try {
+          if (JSON.parse(line).ready) {
+            logger.debug(`Python stats fork server (pid: ${pid}) ready`);
+            resolve(socketPath);
+          }
+        } catch (e) {
+          logger.error(
+            `Python stats fork server (pid: ${pid}) failed to parse stdout: ${line}`,
+            e,
+          );
+        }
+      });
+
+    // Forked children share this stderr
+    forkServer.stderr.on("data", (data) => logPythonStderr(pid, data));
+
+    forkServer.on("close", (code, signal) => {
+      logger.debug(
+        `Python stats fork server (pid: ${pid}) exited with code ${code} ${signal}`,
+      );
+      forkServerSocket = null;
+      reject(new Error("Python stats fork server exited"));
+    });
+  });
+  return forkServerSocket;
+}
+
+async function connectToForkServer(
+  script: string,
+): Promise<StatsServerConnection> {
+  const socketPath = await getForkServerSocket(script);
+  const socket = net.createConnection(socketPath);
+  await new Promise<void>((resolve, reject) => {
+    socket.once("connect", resolve);
+    socket.once("error", reject);
+  });
+  return {
+    // The forked child announces its pid as the first line
+    pid: -1,
+    input: socket,
+    output: socket,
+    isRunning: () => !socket.destroyed,
+    kill: () => socket.destroy(),
+    onClose: (callback) =>
+      socket.on("close", (hadError) =>
+        callback(`closed its connection${hadError ? " with an error" : ""}`),
+      ),
+  };
+}
+
 class PythonStatsServer<Input, Output> {
-  private python: ChildProcess;
+  private connection: StatsServerConnection;
   private rl?: readline.Interface;
   private pid = -1;
   private promises: Map<
@@ -75,88 +212,76 @@ class PythonStatsServer<Input, Output> {
     }
   >;
 
-  constructor(script: string) {
-    const [command, ...pythonArgs] = process.env.GB_ENABLE_PYTHON_DD_PROFILING
-      ? ["ddtrace-run", "python3"]
-      : ["python3"];
-
-    this.python = spawn(command, [...pythonArgs, "-u", script], {
-      stdio: ["pipe", "pipe", "pipe"],
-    });
-    this.pid = this.python.pid || -1;
+  constructor(connection: StatsServerConnection) {
+    this.connection = connection;
+    this.pid = connection.pid;
     logger.debug(`Python stats server (pid: ${this.pid}) started`);
     this.promises = new Map();
 
-    if (this.python.stdout) {
-      this.rl = readline
-        .createInterface({ input: this.python.stdout, crlfDelay: Infinity })
-        .on("line", (line) => {
-          const output = line.trim();
-          if (!output) return;
-          try {
-            const parsed:
-              | PythonServerResponse<Output>
-              | { id: string; error: string; stack_trace?: string } =
-              parsePythonOutput(output);
-
-            if (!parsed.id) {
-              logger.error(
-                `Python stats server (pid: ${this.pid}) stdout missing 'id': ${parsed}`,
+    this.rl = readline
+      .createInterface({ input: connection.output, crlfDelay: Infinity })
+      .on("line", (line) => {
+        const output = line.trim();
+        if (!output) return;
+        try {
+          const parsed:
+            | PythonServerResponse<Output>
+            | { id: string; error: string; stack_trace?: string } =
+            parsePythonOutput(output);
+
+          if (!parsed.id) {
+            // Children of the fork server announce their pid before any results
+            const { pid } = parsed as { pid?: number };
+            if (pid) {
+              this.pid = pid;
+              logger.debug(
+                `Python stats server (pid: ${this.pid}) forked from fork server`,
               );
               return;
             }
-
-            const promise = this.promises.get(parsed.id);
-            if (!promise) {
-              logger.warn(
-                `Python stats server (pid: ${this.pid}) stdout has unknown id: ${parsed.id}`,
-                parsed,
-              );
-              return;
-            }
-
-            if ("error" in parsed) {
-              // Add stack trace to error message so we can show it on the front-end
-              const error = new Error(parsed.error || "Unknown error");
-              if (parsed.stack_trace) {
-                error.message += `\n\n${parsed.stack_trace}`;
-              }
-              promise.reject(error);
-            } else {
-              promise.resolve(parsed);
-            }
-
-            // Delete promise
-            this.promises.delete(parsed.id);
-          } catch (e) {
             logger.error(
-              `Python stats server (pid: ${this.pid}) failed to parse stdout: ${output}`,
-              e,
+              `Python stats server (pid: ${this.pid}) stdout missing 'id': ${parsed}`,
             );
             return;
           }
-        });
-    }
 
-    this.python.stderr?.on("data", (data) => {
-      const err = data.toString().trim();
-      // Ignore some common warnings in production
-      if (ENVIRONMENT === "production") {
-        // Pandas performance warnings
-        if (err.match(/PerformanceWarning/)) return;
-        // Runtime warnings from numpy
-        if (err.match(/RuntimeWarning/)) return;
-        // OpenTelemetry warnings from ddtrace
-        if (err.match(/OTEL_/)) return;
-      }
-
-      logger.error(`Python stats server (pid: ${this.pid}) stderr: ${err}`);
-    });
+          const promise = this.promises.get(parsed.id);
+          if (!promise) {
+            logger.warn(
+              `Python stats server (pid: ${this.pid}) stdout has unknown id: ${parsed.id}`,
+              parsed,
+            );
+            return;
+          }
+
+          if ("error" in parsed) {
+            // Add stack trace to error message so we can show it on the front-end
+            const error = new Error(parsed.error || "Unknown error");
+            if (parsed.stack_trace) {
+              error.message += `\n\n${parsed.stack_trace}`;
+            }
+            promise.reject(error);
+          } else {
+            promise.resolve(parsed);
+          }
+
+          // Delete promise
+          this.promises.delete(parsed.id);
+        } catch (e) {
+          logger.error(
+            `Python stats server (pid: ${this.pid}) failed to parse stdout: ${output}`,
+            e,
+          );
+          return;
+        }
+      });
+
+    connection.stderr?.on("data", (data) => logPythonStderr(this.pid, data));
 
     // When the process dies
-    this.python.on("close", (code, signal) => {
+    connection.onClose((reason) => {
       logger.debug(
-        `Python stats server (pid: ${this.pid}) exited with code ${code} ${signal}. Destroying server.`,
+        `Python stats server (pid: ${this.pid}) ${reason}. Destroying server.`,
       );
       this.destroy();
     });
@@ -166,7 +291,7 @@ class PythonStatsServer<Input, Output> {
     this.rl?.removeAllListeners("line");
     this.rl?.close();
     if (this.isRunning()) {
-      this.python.kill();
+      this.connection.kill();
     }
     this.promises.forEach((promise) => {
       clearTimeout(promise.timer);
@@ -176,7 +301,7 @@ class PythonStatsServer<Input, Output> {
   }
 
   isRunning() {
-    return this.python.exitCode === null;
+    return this.connection.isRunning();
   }
 
   async call(data: Input) {
@@ -238,7 +363,7 @@ class PythonStatsServer<Input, Output> {
       logger.debug(
         `Python stats server (pid: ${this.pid}) call started for id ${id}`,
       );
-      this.python.stdin?.write(JSON.stringify({ id, data }) + "\n");
+      this.connection.input.write(JSON.stringify({ id, data }) + "\n");
     });
   }
 }
@@ -246,10 +371,15 @@ class PythonStatsServer<Input, Output> {
 export const statsServerPool = createPool(
   {
     create: async () => {
+      const connection = USE_FORK_SERVER
+        ? await connectToForkServer(
+            path.join(SCRIPTS_DIR, "stats_fork_server.py"),
+          )
+        : spawnStatsServer(path.join(SCRIPTS_DIR, "stats_server.py"));
       return new PythonStatsServer<
         ExperimentDataForStatsEngine[],
         MultipleExperimentMetricAnalysis[]
-      >(path.join(__dirname, "..", "..", "scripts", "stats_server.py"));
+      >(connection);
     },
     destroy: async (server) => server.destroy(),
     validate: async (server) => server.isRunning(),
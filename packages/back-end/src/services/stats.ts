@@ -100,6 +100,7 @@ export function getAnalysisSettingsForStatsEngine(
     dimension: settings.dimensions[0] || "",
     stats_engine: settings.statsEngine,
     p_value_corrected: !!settings.pValueCorrection,
+    p_value_correction: settings.pValueCorrection ?? null,
     sequential_testing_enabled: settings.sequentialTesting ?? false,
     sequential_tuning_parameter: sequentialTestingTuningParameterNumber,
     difference_type: settings.differenceType,
@@ -135,6 +136,7 @@ export function getBanditSettingsForStatsEngine(
     var_ids: sortedVariations.map((v) => v.id),
     decision_metric: banditSettings.decisionMetric,
     bandit_weights_seed: banditSettings.seed,
+    best_arm_method: banditSettings.bestArmMethod ?? "monte_carlo",
     current_weights: banditSettings.currentWeights,
     historical_weights: banditSettings.historicalWeights.map((hw) => ({
       date: hw.date,
@@ -32,6 +32,7 @@ import {
   LegacyBanditResult,
   LookbackOverride,
 } from "./experiment";
+import { BanditBestArmMethod } from "./stats";
 
 export interface SnapshotMetric {
   value: number;
@@ -184,6 +185,7 @@ export interface SnapshotBanditSettings {
   windowSettings?: MetricWindowSettings;
   contextualBandit?: boolean;
   targetingAttributeColumns?: string[];
+  bestArmMethod?: BanditBestArmMethod;
 }
 
 export interface ExperimentSnapshotSettings {
@@ -16,6 +16,8 @@ export type IndexedPValue = {
 
 export type DifferenceType = "relative" | "absolute" | "scaled";
 
+export type BanditBestArmMethod = "monte_carlo" | "quadrature";
+
 // Mirrors the return shape of `useConfidenceLevels`. Grouped together so
 // consumers can receive either the whole bundle (for Bayesian chance-to-win
 // comparisons / display strings) or any single piece of it without pulling
@@ -90,6 +92,9 @@ export interface FrequentistVariationResponseIndividual
   extends BaselineResponse,
     FrequentistTestResult {
   power?: MetricPowerResponseFromStatsEngine;
+  // Set for goal metrics when the analysis has a p_value_correction
+  pValueAdjusted?: number;
+  ciAdjusted?: [number | null, number | null];
 }
 
 type SupplementalResult =
@@ -256,6 +261,7 @@ export interface AnalysisSettingsForStatsEngine {
   dimension: string;
   stats_engine: string;
   p_value_corrected: boolean;
+  p_value_correction?: PValueCorrection;
   sequential_testing_enabled: boolean;
   sequential_tuning_parameter: number;
   difference_type: string;
@@ -268,6 +274,7 @@ export interface AnalysisSettingsForStatsEngine {
   one_sided_intervals?: boolean;
   use_covariate_as_response?: boolean;
   post_stratification_enabled?: boolean;
+  max_strata?: number | null;
 }
 
 export interface BanditSettingsForStatsEngine {
@@ -282,6 +289,7 @@ export interface BanditSettingsForStatsEngine {
   reweight: boolean;
   decision_metric: string;
   bandit_weights_seed: number;
+  best_arm_method?: BanditBestArmMethod;
   contexts?: string[];
 }
 
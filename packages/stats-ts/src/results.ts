@@ -161,6 +161,8 @@ export interface FrequentistVariationResponseIndividual
     BaselineResponse {
   realizedSettings: RealizedSettings;
   power?: PowerResponse | null;
+  pValueAdjusted?: number | null;
+  ciAdjusted?: ResponseCI | null;
 }
 
 export type VariationResponseIndividual =
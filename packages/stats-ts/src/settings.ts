@@ -11,6 +11,8 @@ export type StatisticType =
   | RegressionAdjustedStatisticType;
 export type MetricType = "binomial" | "count" | "quantile";
 export type BusinessMetricType = "goal" | "guardrail" | "secondary";
+export type BestArmMethod = "monte_carlo" | "quadrature";
+export type PValueCorrection = "holm-bonferroni" | "benjamini-hochberg";
 
 export const CONTEXTUAL_BANDIT_DIMENSION_COLUMN = "dimension";
 export const CONTEXTUAL_BANDIT_DIMENSION_VALUE = "All";
@@ -25,6 +27,7 @@ export type AnalysisSettingsForStatsEngineInit = {
   dimension?: string;
   stats_engine?: StatsEngine;
   p_value_corrected?: boolean;
+  p_value_correction?: PValueCorrection | null;
   sequential_testing_enabled?: boolean;
   sequential_tuning_parameter?: number;
   difference_type?: DifferenceType;
@@ -37,6 +40,7 @@ export type AnalysisSettingsForStatsEngineInit = {
   one_sided_intervals?: boolean;
   use_covariate_as_response?: boolean;
   post_stratification_enabled?: boolean;
+  max_strata?: number | null;
 };
 
 export class AnalysisSettingsForStatsEngine {
@@ -47,6 +51,7 @@ export class AnalysisSettingsForStatsEngine {
   dimension: string;
   stats_engine: StatsEngine;
   p_value_corrected: boolean;
+  p_value_correction: PValueCorrection | null;
   sequential_testing_enabled: boolean;
   sequential_tuning_parameter: number;
   difference_type: DifferenceType;
@@ -59,6 +64,7 @@ export class AnalysisSettingsForStatsEngine {
   one_sided_intervals: boolean;
   use_covariate_as_response: boolean;
   post_stratification_enabled: boolean;
+  max_strata: number | null;
 
   constructor(args: AnalysisSettingsForStatsEngineInit) {
     this.var_names = args.var_names;
@@ -68,6 +74,7 @@ export class AnalysisSettingsForStatsEngine {
     this.dimension = args.dimension ?? "";
     this.stats_engine = args.stats_engine ?? "bayesian";
     this.p_value_corrected = args.p_value_corrected ?? false;
+    this.p_value_correction = args.p_value_correction ?? null;
     this.sequential_testing_enabled = args.sequential_testing_enabled ?? false;
     this.sequential_tuning_parameter = args.sequential_tuning_parameter ?? 5000;
     this.difference_type = args.difference_type ?? "relative";
@@ -81,6 +88,7 @@ export class AnalysisSettingsForStatsEngine {
     this.use_covariate_as_response = args.use_covariate_as_response ?? false;
     this.post_stratification_enabled =
       args.post_stratification_enabled ?? false;
+    this.max_strata = args.max_strata ?? null;
   }
 }
 
@@ -99,6 +107,7 @@ export type BanditSettingsForStatsEngineInit = {
   bandit_weights_seed?: number;
   weight_by_period?: boolean;
   top_two?: boolean;
+  best_arm_method?: BestArmMethod;
 };
 
 export class BanditSettingsForStatsEngine {
@@ -110,6 +119,7 @@ export class BanditSettingsForStatsEngine {
   bandit_weights_seed: number;
   weight_by_period: boolean;
   top_two: boolean;
+  best_arm_method: BestArmMethod;
 
   constructor(args: BanditSettingsForStatsEngineInit) {
     this.var_names = args.var_names;
@@ -121,6 +131,7 @@ export class BanditSettingsForStatsEngine {
       args.bandit_weights_seed ?? DEFAULT_BANDIT_WEIGHTS_SEED;
     this.weight_by_period = args.weight_by_period ?? true;
     this.top_two = args.top_two ?? false;
+    this.best_arm_method = args.best_arm_method ?? "monte_carlo";
   }
 }
 
@@ -256,6 +267,7 @@ export function getBanditSettings(
     decision_metric: raw["decision_metric"] as string | undefined,
     weight_by_period: raw["weight_by_period"] as boolean | undefined,
     top_two: raw["top_two"] as boolean | undefined,
+    best_arm_method: raw["best_arm_method"] as BestArmMethod | undefined,
     bandit_weights_seed: readSeed(raw),
   });
 }
@@ -275,6 +287,7 @@ export function getContextualBanditSettings(
     decision_metric: raw["decision_metric"] as string | undefined,
     weight_by_period: raw["weight_by_period"] as boolean | undefined,
     top_two: raw["top_two"] as boolean | undefined,
+    best_arm_method: raw["best_arm_method"] as BestArmMethod | undefined,
     attributes: (raw["attributes"] as string[]) ?? [],
     max_leaves: raw["max_leaves"] as number | undefined,
     current_contextual_weights: raw["current_contextual_weights"] as
@@ -1,16 +1,24 @@
 from abc import abstractmethod, ABC
-from dataclasses import field
-from typing import List, Optional
+from dataclasses import asdict, field, replace
+from typing import Any, Dict, List, Literal, Optional, Sequence, Tuple, Union
 
 import numpy as np
 import random
 from pydantic.dataclasses import dataclass
+from scipy.special import log_ndtr
 
 from gbstats.models.results import ResponseCI, BanditResult, SingleVariationResult
 from gbstats.models.statistics import (
+    BanditPeriodDataCuped,
+    BanditPeriodDataRatio,
+    BanditPeriodDataSampleMean,
+    BanditStatistic,
+    ProportionStatistic,
     SampleMeanStatistic,
     RatioStatistic,
     RegressionAdjustedStatistic,
+    sample_covariance,
+    sample_variance,
 )
 from gbstats.utils import (
     variance_of_ratios,
@@ -26,6 +34,7 @@ class BanditConfig(BayesianConfig):
     prior_distribution: GaussianPrior = field(default_factory=GaussianPrior)
     min_variation_weight: float = 0.01
     weight_by_period: bool = True
+    best_arm_method: Literal["monte_carlo", "quadrature"] = "monte_carlo"
 
 
 @dataclass
@@ -60,6 +69,53 @@ def get_error_bandit_result(
     )
 
 
+# Gauss-Legendre panels one posterior stddev wide, out to QUADRATURE_WIDTH stddevs
+# on either side of every arm's posterior mean
+QUADRATURE_WIDTH = 8
+QUADRATURE_NODES, QUADRATURE_WEIGHTS = np.polynomial.legendre.leggauss(8)
+
+
+def rank_probabilities(
+    mean: np.ndarray, stddev: np.ndarray, inverse: bool = False
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Probabilities that each independent normal arm is the best, and the
+    proportion of top-two placements, by numerical integration.
+
+    P(arm i is best) = int phi_i(x) prod_{j != i} Phi_j(x) dx. Nodes are placed
+    at the scale of every arm, so a narrow posterior's step in Phi_j is
+    resolved even when the integrating arm is much wider. The second return
+    value matches Bandits.top_two_weights: (P(best) + P(second best)) / 2.
+    """
+    if inverse:
+        mean = -mean
+    if len(mean) < 2:
+        return np.ones(len(mean)), np.ones(len(mean))
+    offsets = np.arange(-QUADRATURE_WIDTH, QUADRATURE_WIDTH + 1)
+    breaks = np.unique((mean[:, None] + stddev[:, None] * offsets).ravel())
+    half_widths = np.diff(breaks) / 2
+    centers = breaks[:-1] + half_widths
+    x = (centers[:, None] + half_widths[:, None] * QUADRATURE_NODES).ravel()
+    weights = (half_widths[:, None] * QUADRATURE_WEIGHTS).ravel()
+
+    z = (x - mean[:, None]) / stddev[:, None]
+    log_pdf = -0.5 * z**2 - np.log(np.sqrt(2 * np.pi) * stddev)[:, None]
+    log_cdf = log_ndtr(z)
+    log_sf = log_ndtr(-z)
+    # log of phi_i(x) prod_{j != i} Phi_j(x)
+    log_best = log_pdf + np.sum(log_cdf, axis=0) - log_cdf
+    best = np.exp(log_best) @ weights
+    # arm i is second when exactly one other arm m lies above x; looping over
+    # m keeps memory at one (arms, nodes) array
+    second = np.zeros(len(mean))
+    for m in range(len(mean)):
+        second_below_m = np.exp(log_best - log_cdf[m] + log_sf[m]) @ weights
+        second_below_m[m] = 0
+        second += second_below_m
+    best = best / np.sum(best)
+    top_two = (best + second / np.sum(second)) / 2
+    return best, top_two
+
+
 class Bandits(ABC):
     def __init__(
         self,
@@ -151,28 +207,46 @@ class Bandits(ABC):
     def addback(self) -> float:
         return 0
 
-    # function that computes thompson sampling variation weights
-    def compute_result(self) -> BanditResponse:
-        seed = (
+    def draw_seed(self) -> int:
+        return (
             self.bandit_weights_seed
             if self.bandit_weights_seed
             else random.randint(0, 1000000)
         )
-        rng = np.random.default_rng(seed=seed)
-        y = rng.multivariate_normal(
-            mean=self.posterior_mean,
-            cov=np.diag(self.posterior_variance),
-            size=self.n_samples,
+
+    @property
+    def uses_quadrature(self) -> bool:
+        posterior_stddev = np.sqrt(self.posterior_variance)
+        return self.config.best_arm_method == "quadrature" and bool(
+            np.all(np.isfinite(posterior_stddev) & (posterior_stddev > 0))
         )
-        if self.inverse:
-            best_rows = np.min(y, axis=1)
-        else:
-            best_rows = np.max(y, axis=1)
-        best_arm_probabilities = np.mean((y == best_rows[:, np.newaxis]), axis=0)
-        if self.config.top_two:
-            p = self.top_two_weights(y, self.inverse)
+
+    # function that computes thompson sampling variation weights
+    def compute_result(self) -> BanditResponse:
+        seed = self.draw_seed()
+        if self.uses_quadrature:
+            best_arm_probabilities, top_two_probabilities = rank_probabilities(
+                self.posterior_mean, np.sqrt(self.posterior_variance), self.inverse
+            )
+            if self.config.top_two:
+                p = top_two_probabilities
+            else:
+                p = best_arm_probabilities.copy()
         else:
-            p = best_arm_probabilities.copy()
+            rng = np.random.default_rng(seed=seed)
+            y = self.sample_posterior(rng)
+            best_arm_probabilities = self.best_arm_probabilities_from_samples(
+                y, self.inverse
+            )
+            if self.config.top_two:
+                p = self.top_two_weights(y, self.inverse)
+            else:
+                p = best_arm_probabilities.copy()
+        return self.build_response(seed, best_arm_probabilities, p)
+
+    def build_response(
+        self, seed: int, best_arm_probabilities: np.ndarray, p: np.ndarray
+    ) -> BanditResponse:
         update_message = "successfully updated"
         # Apply the per-variation minimum weight as an additive floor on the
         # probability simplex rather than clipping and renormalizing. Clipping
@@ -211,6 +285,20 @@ class Bandits(ABC):
             enough_units=enough_units,
         )
 
+    # The posterior is independent across variations, so draws are scaled standard
+    # normals; multivariate_normal would decompose the diagonal covariance first
+    def sample_posterior(self, rng: np.random.Generator) -> np.ndarray:
+        z = rng.standard_normal(size=(self.n_samples, self.num_variations))
+        return self.posterior_mean + np.sqrt(self.posterior_variance) * z
+
+    @staticmethod
+    def best_arm_probabilities_from_samples(
+        y: np.ndarray, inverse: bool = False
+    ) -> np.ndarray:
+        """Proportion of rows (draws) in which each column is the best arm"""
+        best = np.argmin(y, axis=1) if inverse else np.argmax(y, axis=1)
+        return np.bincount(best, minlength=y.shape[1]) / y.shape[0]
+
     # function that takes weights for largest realization and turns into top two weights
     @staticmethod
     def top_two_weights(y: np.ndarray, inverse=False) -> np.ndarray:
@@ -220,34 +308,13 @@ class Bandits(ABC):
         Returns:
         A NumPy array of proportions, one for each column.
         """
-        # g indices of sorted elements in each row
-        sorted_indices = np.argsort(y, axis=1)
-        if inverse:
-            # counts for number of times each variation was the smallest
-            unique_0, counts_0 = np.unique(
-                sorted_indices[:, 1][:, np.newaxis], return_counts=True
-            )
-            # counts for number of times each variation was the second smallest
-            unique_1, counts_1 = np.unique(
-                sorted_indices[:, 2][:, np.newaxis], return_counts=True
-            )
-        else:
-            # counts for number of times each variation was the largest
-            unique_0, counts_0 = np.unique(
-                sorted_indices[:, -1][:, np.newaxis], return_counts=True
-            )
-            # counts for number of times each variation was the second largest
-            unique_1, counts_1 = np.unique(
-                sorted_indices[:, -2][:, np.newaxis], return_counts=True
-            )
-        # put inside dicts and loop over count to ensure arms that are never the biggest are included
-        dict_0 = dict(zip(unique_0, counts_0))
-        dict_1 = dict(zip(unique_1, counts_1))
         n_variations = y.shape[1]
-        final_counts = np.zeros((n_variations,))
-        for i in range(n_variations):
-            final_counts[i] = dict_0.get(i, 0) + dict_1.get(i, 0)
-        return final_counts / sum(final_counts)
+        if n_variations < 2:
+            return Bandits.best_arm_probabilities_from_samples(y, inverse)
+        # the first two columns hold the best and second best arm of each row
+        top_two = np.argpartition(y if inverse else -y, 1, axis=1)[:, :2]
+        counts = np.bincount(top_two.ravel(), minlength=n_variations)
+        return counts / np.sum(counts)
 
     @staticmethod
     def sum_from_moments(n, mn) -> float:
@@ -427,3 +494,265 @@ class BanditsCuped(Bandits):
             + self.theta**2 * self.variation_variances_pre
             - 2 * self.theta * self.variation_covariances
         )
+
+
+# Bounds the (bandits, samples, variations) draw array built per chunk
+BATCH_MAX_DRAWS = 2**22
+
+
+def compute_bandit_responses(bandits: Sequence[Bandits]) -> List[BanditResponse]:
+    """Thompson sampling weights for many bandits in one pass.
+
+    Bandits that share a seed, a number of variations and a sample count use
+    the same standard normal draws, so they are sampled together and each
+    response equals that bandit's compute_result().
+    """
+    seeds = [b.draw_seed() for b in bandits]
+    responses: List[Optional[BanditResponse]] = [None] * len(bandits)
+    groups: Dict[Tuple[int, int, int], List[int]] = {}
+    for i, b in enumerate(bandits):
+        if b.uses_quadrature:
+            responses[i] = b.compute_result()
+        else:
+            key = (seeds[i], b.num_variations, b.n_samples)
+            groups.setdefault(key, []).append(i)
+
+    for (seed, num_variations, n_samples), indices in groups.items():
+        rng = np.random.default_rng(seed=seed)
+        z = rng.standard_normal(size=(n_samples, num_variations))
+        chunk_size = max(1, BATCH_MAX_DRAWS // z.size)
+        for start in range(0, len(indices), chunk_size):
+            chunk = [bandits[i] for i in indices[start : start + chunk_size]]
+            # flip inverse bandits so the best arm is always the largest draw
+            sign = np.array([-1.0 if b.inverse else 1.0 for b in chunk])[:, None]
+            shift = sign * np.array([b.posterior_mean for b in chunk])
+            scale = sign * np.sqrt(np.array([b.posterior_variance for b in chunk]))
+            y = scale[:, None, :] * z
+            y += shift[:, None, :]
+            cells = len(chunk) * num_variations
+            offsets = num_variations * np.arange(len(chunk))[:, None]
+            best = np.argmax(y, axis=2)
+            best_counts = np.bincount((best + offsets).ravel(), minlength=cells)
+            best_arm_probabilities = (
+                best_counts.reshape(len(chunk), num_variations) / n_samples
+            )
+            if num_variations > 1:
+                # the second best arm is the best once the best draw is removed
+                np.put_along_axis(y, best[:, :, None], -np.inf, axis=2)
+                second = np.argmax(y, axis=2)
+                second_counts = np.bincount((second + offsets).ravel(), minlength=cells)
+                top_two_weights = (best_counts + second_counts).reshape(
+                    len(chunk), num_variations
+                ) / (2 * n_samples)
+            else:
+                top_two_weights = best_arm_probabilities
+            for j, b in enumerate(chunk):
+                p = (
+                    top_two_weights[j]
+                    if b.config.top_two
+                    else best_arm_probabilities[j]
+                )
+                responses[indices[start + j]] = b.build_response(
+                    seed, best_arm_probabilities[j], p.copy()
+                )
+    return responses  # type: ignore
+
+
+BanditPeriodData = Union[
+    BanditPeriodDataSampleMean, BanditPeriodDataRatio, BanditPeriodDataCuped
+]
+
+
+def _period_components(
+    stat: BanditStatistic,
+) -> Tuple[List[Union[SampleMeanStatistic, ProportionStatistic]], float]:
+    """The count statistics a bandit statistic is built from, and the sum of
+    products between them (0 for a single component)."""
+    if isinstance(stat, RatioStatistic):
+        return [stat.m_statistic, stat.d_statistic], stat.m_d_sum_of_products
+    if isinstance(stat, RegressionAdjustedStatistic):
+        components = [stat.post_statistic, stat.pre_statistic]
+        return components, stat.post_pre_sum_of_products
+    return [stat], 0
+
+
+@dataclass
+class BanditState:
+    """Period-weighted cumulative statistics of a bandit, updated one period at a time.
+
+    Mirrors the cumulative bandit query (bandit-statistics-cte.ts): period p
+    is weighted by its share of users, w_p = N_p / N, so an arm's mean is
+    sum_p w_p * mean_p and the variance of that mean sum_p w_p^2 * var_p / n_p.
+    CUPED theta is pooled as sum_p w_p^2 * cov_p / sum_p w_p^2 * pre_var_p.
+    As N grows with every period, the state keeps the additive sums of
+    N_p * mean_p and N_p^2 * cov_p / n_p, so update() is O(variations). It can
+    be stored with to_dict() and restored with from_dict() between reweights.
+    """
+
+    statistic_type: Literal["sample_mean", "ratio", "regression_adjusted"]
+    current_weights: List[float]
+    num_periods: int = 0
+    # N, the users of all variations over all periods
+    total_users: float = 0
+    # n, the users of each variation over all periods
+    users: List[int] = field(default_factory=list)
+    # per variation and component: sum_p N_p * mean_p
+    weighted_means: List[List[float]] = field(default_factory=list)
+    # per variation and pair of components: sum_p N_p^2 * cov_p / n_p
+    weighted_covariances: List[List[List[float]]] = field(default_factory=list)
+    # sum_p N_p^2 * cov_p and sum_p N_p^2 * pre_var_p, pooled over variations
+    theta_covariance: float = 0
+    theta_pre_variance: float = 0
+
+    @classmethod
+    def from_period(cls, period: BanditPeriodData) -> "BanditState":
+        stat = period.stats[0]
+        if isinstance(stat, RatioStatistic):
+            statistic_type = "ratio"
+        elif isinstance(stat, RegressionAdjustedStatistic):
+            statistic_type = "regression_adjusted"
+        else:
+            statistic_type = "sample_mean"
+        num_components = len(_period_components(stat)[0])
+        num_variations = len(period.stats)
+        empty = cls(
+            statistic_type=statistic_type,  # type: ignore
+            current_weights=period.weights,
+            users=[0] * num_variations,
+            weighted_means=[[0.0] * num_components for _ in range(num_variations)],
+            weighted_covariances=[
+                [[0.0] * num_components for _ in range(num_components)]
+                for _ in range(num_variations)
+            ],
+        )
+        return empty.update(period)
+
+    def update(self, period: BanditPeriodData) -> "BanditState":
+        if len(period.stats) != len(self.users):
+            raise ValueError(
+                f"Period has {len(period.stats)} variations, state has {len(self.users)}."
+            )
+        period_users = sum(stat.n for stat in period.stats)
+        users = list(self.users)
+        weighted_means = [list(means) for means in self.weighted_means]
+        weighted_covariances = [
+            [list(row) for row in covariances]
+            for covariances in self.weighted_covariances
+        ]
+        for i, stat in enumerate(period.stats):
+            users[i] += stat.n
+            if stat.n == 0:
+                continue
+            components, sum_of_products = _period_components(stat)
+            for j, a in enumerate(components):
+                weighted_means[i][j] += period_users * a.sum / stat.n
+                if stat.n <= 1:
+                    continue
+                for k, b in enumerate(components):
+                    products = a.sum_squares if j == k else sum_of_products
+                    weighted_covariances[i][j][k] += (
+                        period_users**2
+                        * sample_covariance(stat.n, a.sum, b.sum, products)
+                        / stat.n
+                    )
+        theta_covariance = self.theta_covariance
+        theta_pre_variance = self.theta_pre_variance
+        if self.statistic_type == "regression_adjusted" and period_users > 1:
+            # theta pools the period over all variations
+            post = sum(s.post_statistic.sum for s in period.stats)  # type: ignore
+            pre = sum(s.pre_statistic.sum for s in period.stats)  # type: ignore
+            pre_squares = sum(
+                s.pre_statistic.sum_squares for s in period.stats  # type: ignore
+            )
+            products = sum(
+                s.post_pre_sum_of_products for s in period.stats  # type: ignore
+            )
+            theta_covariance += period_users**2 * sample_covariance(
+                period_users, pre, post, products
+            )
+            theta_pre_variance += period_users**2 * sample_variance(
+                period_users, pre, pre_squares
+            )
+        return replace(
+            self,
+            current_weights=period.weights,
+            num_periods=self.num_periods + 1,
+            total_users=self.total_users + period_users,
+            users=users,
+            weighted_means=weighted_means,
+            weighted_covariances=weighted_covariances,
+            theta_covariance=theta_covariance,
+            theta_pre_variance=theta_pre_variance,
+        )
+
+    @property
+    def stats(self) -> List[BanditStatistic]:
+        """Cumulative statistics as returned by the cumulative bandit query"""
+        stats: List[BanditStatistic] = []
+        for n, weighted_means, weighted_covariances in zip(
+            self.users, self.weighted_means, self.weighted_covariances
+        ):
+            means = [
+                m / self.total_users if self.total_users else 0 for m in weighted_means
+            ]
+            # variance of the weighted mean, sum_p w_p^2 * cov_p / n_p
+            covariances = [
+                [c / self.total_users**2 if self.total_users else 0 for c in row]
+                for row in weighted_covariances
+            ]
+            components = [
+                SampleMeanStatistic(
+                    n=n,
+                    sum=n * means[j],
+                    sum_squares=n * (covariances[j][j] * (n - 1) + means[j] ** 2),
+                )
+                for j in range(len(means))
+            ]
+            if self.statistic_type == "sample_mean":
+                stats.append(components[0])
+                continue
+            sum_of_products = n * ((n - 1) * covariances[0][1] + means[0] * means[1])
+            if self.statistic_type == "ratio":
+                stats.append(
+                    RatioStatistic(
+                        n=n,
+                        m_statistic=components[0],
+                        d_statistic=components[1],
+                        m_d_sum_of_products=sum_of_products,
+                    )
+                )
+            else:
+                stats.append(
+                    RegressionAdjustedStatistic(
+                        n=n,
+                        post_statistic=components[0],
+                        pre_statistic=components[1],
+                        post_pre_sum_of_products=sum_of_products,
+                        theta=self.theta,
+                    )
+                )
+        return stats
+
+    @property
+    def theta(self) -> float:
+        if self.theta_pre_variance <= 0:
+            return 0
+        return self.theta_covariance / self.theta_pre_variance
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BanditState":
+        return cls(**data)
+
+    def bandit(self, config: BanditConfig) -> Bandits:
+        stats = self.stats
+        if self.statistic_type == "ratio":
+            return BanditsRatio(stats, self.current_weights, config)  # type: ignore
+        elif self.statistic_type == "regression_adjusted":
+            return BanditsCuped(stats, self.current_weights, config)  # type: ignore
+        return BanditsSimple(stats, self.current_weights, config)  # type: ignore
+
+    def compute_result(self, config: BanditConfig) -> BanditResponse:
+        return self.bandit(config).compute_result()
@@ -0,0 +1,385 @@
+"""Vectorized simulation studies.
+
+SimulationStudy builds statistic objects and runs the tests one replicate at a
+time. BatchSimulationStudy instead draws the sufficient statistics of every
+replicate as arrays from a numpy Generator and evaluates the tests with array
+kernels that mirror the test classes element by element.
+
+Replicates are simulated in fixed-size chunks, each with its own stream
+spawned from `np.random.SeedSequence(seed)`. The chunk layout only depends on
+the seed, `n_sim` and `chunk_size`, so results are bit-for-bit the same
+whether the chunks run serially or across any number of worker processes.
+
+Like simulation.py, this file is used for internal testing only.
+"""
+
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Mapping, Optional, Tuple, Type, Union
+
+import numpy as np
+
+from gbstats.bayesian.tests import EffectBayesianABTest, EffectBayesianConfig
+from gbstats.devtools.simulation import SimulationMetrics
+from gbstats.devtools.sufficient_statistics import SufficientMoments
+from gbstats.frequentist.quantiles import norm_ppf, sequential_rho, t_ppf
+from gbstats.frequentist.tests import (
+    FrequentistConfig,
+    SequentialConfig,
+    SequentialTwoSidedTTest,
+    TwoSidedTTest,
+    sequential_interval_halfwidth,
+)
+from gbstats.models.statistics import ProportionStatistic, SampleMeanStatistic
+from gbstats.models.tests import BaseABTest, BaseConfig
+
+DEFAULT_CHUNK_SIZE = 10_000
+
+# point estimates, standard errors, interval limits and estimands,
+# each of shape (n_sim, n_tests)
+SimulationArrays = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+@dataclass
+class MeanStatisticArrays:
+    """Sufficient statistics of one arm across replicates.
+
+    The array analogue of SampleMeanStatistic, or of ProportionStatistic when
+    `proportion` is set; element i holds replicate i.
+    """
+
+    n: np.ndarray
+    sum: np.ndarray
+    sum_squares: np.ndarray
+    proportion: bool = False
+
+    @classmethod
+    def from_units(
+        cls, y: np.ndarray, proportion: bool = False
+    ) -> "MeanStatisticArrays":
+        """Reduces unit-level outcomes of shape (n_sim, n) to sufficient
+        statistics."""
+        total = y.sum(axis=1)
+        return cls(
+            n=np.full(y.shape[0], y.shape[1]),
+            sum=total,
+            sum_squares=total if proportion else (y**2).sum(axis=1),
+            proportion=proportion,
+        )
+
+    @classmethod
+    def from_moments(
+        cls, moments: SufficientMoments, component: int = 0, proportion: bool = False
+    ) -> "MeanStatisticArrays":
+        """Statistics of one outcome column, e.g. of normal_moments."""
+        return cls(
+            n=np.full(moments.size, moments.n),
+            sum=moments.sums[:, component],
+            sum_squares=moments.cross_products[:, component, component],
+            proportion=proportion,
+        )
+
+    @property
+    def mean(self) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self.n == 0, 0.0, self.sum / self.n)
+
+    @property
+    def variance(self) -> np.ndarray:
+        if self.proportion:
+            return self.mean * (1 - self.mean)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(
+                self.n <= 1,
+                0.0,
+                (self.sum_squares - self.sum**2 / self.n) / (self.n - 1),
+            )
+
+    def to_statistics(self) -> List[Union[SampleMeanStatistic, ProportionStatistic]]:
+        if self.proportion:
+            return [
+                ProportionStatistic(n=int(n), sum=float(s))
+                for n, s in zip(self.n, self.sum)
+            ]
+        return [
+            SampleMeanStatistic(n=int(n), sum=float(s), sum_squares=float(ss))
+            for n, s, ss in zip(self.n, self.sum, self.sum_squares)
+        ]
+
+
+@dataclass
+class BatchTestResult:
+    expected: np.ndarray
+    stddev: np.ndarray
+    ci_lower: np.ndarray
+    ci_upper: np.ndarray
+
+    @classmethod
+    def from_interval(
+        cls,
+        expected: np.ndarray,
+        stddev: np.ndarray,
+        ci_lower: np.ndarray,
+        ci_upper: np.ndarray,
+        error: np.ndarray,
+    ) -> "BatchTestResult":
+        """Replaces the replicates with an error by the tests' default output."""
+        return cls(
+            expected=np.where(error, 0.0, expected),
+            stddev=np.where(error, 0.0, stddev),
+            ci_lower=np.where(error, 0.0, ci_lower),
+            ci_upper=np.where(error, 0.0, ci_upper),
+        )
+
+
+def batch_effect_moments(
+    stat_a: MeanStatisticArrays, stat_b: MeanStatisticArrays, relative: bool
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Point estimates, standard errors and error flags of EffectMoments."""
+    mean_a, mean_b = stat_a.mean, stat_b.mean
+    var_a, var_b = stat_a.variance, stat_b.variance
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if relative:
+            variance = np.where(
+                mean_a == 0,
+                0.0,
+                (var_b / stat_b.n) / mean_a**2
+                + (var_a / stat_a.n) * mean_b**2 / mean_a**4,
+            )
+            point_estimate = (mean_b - mean_a) / np.abs(mean_a)
+        else:
+            variance = var_b / stat_b.n + var_a / stat_a.n
+            point_estimate = mean_b - mean_a
+        error = (var_a <= 0) | (var_b <= 0) | (variance <= 0) | (mean_a == 0)
+        return point_estimate, np.sqrt(variance), error
+
+
+def welch_dof(stat_a: MeanStatisticArrays, stat_b: MeanStatisticArrays) -> np.ndarray:
+    var_a, var_b = stat_a.variance, stat_b.variance
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (var_b / stat_b.n + var_a / stat_a.n) ** 2 / (
+            var_b**2 / (stat_b.n**2 * (stat_b.n - 1))
+            + var_a**2 / (stat_a.n**2 * (stat_a.n - 1))
+        )
+
+
+def two_sided_t_test(
+    stat_a: MeanStatisticArrays,
+    stat_b: MeanStatisticArrays,
+    config: FrequentistConfig,
+) -> BatchTestResult:
+    """Vectorized TwoSidedTTest."""
+    point_estimate, standard_error, error = batch_effect_moments(
+        stat_a, stat_b, config.difference_type == "relative"
+    )
+    with np.errstate(invalid="ignore"):
+        halfwidth = t_ppf(1 - config.alpha / 2, welch_dof(stat_a, stat_b))
+    halfwidth = halfwidth * standard_error
+    return BatchTestResult.from_interval(
+        point_estimate,
+        standard_error,
+        point_estimate - halfwidth,
+        point_estimate + halfwidth,
+        error,
+    )
+
+
+def sequential_two_sided_t_test(
+    stat_a: MeanStatisticArrays,
+    stat_b: MeanStatisticArrays,
+    config: SequentialConfig,
+) -> BatchTestResult:
+    """Vectorized SequentialTwoSidedTTest."""
+    point_estimate, standard_error, error = batch_effect_moments(
+        stat_a, stat_b, config.difference_type == "relative"
+    )
+    rho = config.rho
+    if rho is None:
+        rho = sequential_rho(
+            config.alpha, config.sequential_tuning_parameter, two_sided=True
+        )
+    n = stat_a.n + stat_b.n
+    with np.errstate(invalid="ignore"):
+        halfwidth = sequential_interval_halfwidth(
+            standard_error**2 * n,
+            n,
+            config.sequential_tuning_parameter,
+            config.alpha,
+            rho,
+        )
+    return BatchTestResult.from_interval(
+        point_estimate,
+        standard_error,
+        point_estimate - halfwidth,
+        point_estimate + halfwidth,
+        error,
+    )
+
+
+def effect_bayesian_test(
+    stat_a: MeanStatisticArrays,
+    stat_b: MeanStatisticArrays,
+    config: EffectBayesianConfig,
+) -> BatchTestResult:
+    """Vectorized EffectBayesianABTest."""
+    relative = config.difference_type == "relative"
+    data_mean, standard_error, error = batch_effect_moments(stat_a, stat_b, relative)
+    prior = config.prior_effect
+    prior_mean = np.full_like(data_mean, prior.mean)
+    prior_variance = np.full_like(data_mean, prior.variance)
+    if not relative and config.prior_type == "relative":
+        # like EffectBayesianABTest, only relative priors are rescaled
+        mean_a = stat_a.mean
+        if prior.proper:
+            error = error | (mean_a == 0)
+        prior_mean = prior.mean * np.abs(mean_a)
+        prior_variance = prior.variance * mean_a**2
+    data_variance = standard_error**2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        prior_precision = 1 / prior_variance if prior.proper else 0.0
+        has_data = data_variance != 0
+        post_prec = np.where(has_data, 1 / data_variance, 0.0) + prior_precision
+        if prior.proper:
+            mean_diff = np.where(
+                has_data,
+                (data_mean / data_variance + prior_mean / prior_variance) / post_prec,
+                prior_mean,
+            )
+        else:
+            mean_diff = np.where(has_data, data_mean, 0.0)
+        error = error | (post_prec == 0)
+        std_diff = np.sqrt(1 / post_prec)
+        # matches gaussian_credible_interval, which is NaN unless std_diff > 0
+        defined = std_diff > 0
+        ci_lower = np.where(
+            defined, norm_ppf(config.alpha / 2) * std_diff + mean_diff, np.nan
+        )
+        ci_upper = np.where(
+            defined, norm_ppf(1 - config.alpha / 2) * std_diff + mean_diff, np.nan
+        )
+    return BatchTestResult.from_interval(mean_diff, std_diff, ci_lower, ci_upper, error)
+
+
+BatchKernel = Callable[
+    [MeanStatisticArrays, MeanStatisticArrays, BaseConfig], BatchTestResult
+]
+
+BATCH_KERNELS: Dict[Type[BaseABTest], BatchKernel] = {
+    TwoSidedTTest: two_sided_t_test,  # type: ignore
+    SequentialTwoSidedTTest: sequential_two_sided_t_test,  # type: ignore
+    EffectBayesianABTest: effect_bayesian_test,  # type: ignore
+}
+
+
+def batch_kernel(test: Type[BaseABTest], config: BaseConfig) -> BatchKernel:
+    if test not in BATCH_KERNELS:
+        raise ValueError(
+            f"no batch kernel for {test.__name__}; supported tests are "
+            + ", ".join(t.__name__ for t in BATCH_KERNELS)
+        )
+    if config.difference_type == "scaled" or config.post_stratify:
+        raise ValueError(
+            "batch kernels support relative and absolute effects without post-stratification"
+        )
+    return BATCH_KERNELS[test]
+
+
+class BatchSimulationStudy(SimulationMetrics, ABC):
+    """Vectorized counterpart of SimulationStudy.
+
+    Subclasses implement `generate_data`, which draws all replicates at once
+    from the Generator it is given.
+    """
+
+    def __init__(
+        self,
+        test_dict: Mapping[str, Tuple[Type[BaseABTest], BaseConfig]],
+        data_params: Dict,
+        seed: int,
+        n_sim: int = 100,
+        alpha: float = 0.05,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ):
+        if n_sim < 1 or chunk_size < 1:
+            raise ValueError("n_sim and chunk_size must be positive")
+        self.n_sim = n_sim
+        self.alpha = alpha
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.test_names = list(test_dict.keys())
+        self.tests = list([v[0] for v in test_dict.values()])
+        self.configs = list([v[1] for v in test_dict.values()])
+        self.kernels = [
+            batch_kernel(test, config) for test, config in zip(self.tests, self.configs)
+        ]
+        self.n_tests = len(self.tests)
+        self.data_params = data_params
+
+    def run_sim(self, n_workers: Optional[int] = 1):
+        """Simulates all replicates, running the chunks across `n_workers`
+        processes (all available cores if None)."""
+        chunks = self.chunks()
+        if (n_workers is None or n_workers > 1) and len(chunks) > 1:
+            with ProcessPoolExecutor(
+                max_workers=n_workers,
+                initializer=_set_worker_study,
+                initargs=(self,),
+            ) as executor:
+                parts = list(executor.map(_run_worker_chunk, chunks))
+        else:
+            parts = [self.run_chunk(chunk) for chunk in chunks]
+        # merged in chunk order, whichever worker ran each chunk
+        self.pt, self.se, self.lower_limit, self.upper_limit, self.theta = (
+            np.concatenate(arrays) for arrays in zip(*parts)
+        )
+
+    def chunks(self) -> List[Tuple[np.random.SeedSequence, int]]:
+        """Independent seed sequences and sizes of the chunks of replicates."""
+        sizes = [
+            min(self.chunk_size, self.n_sim - start)
+            for start in range(0, self.n_sim, self.chunk_size)
+        ]
+        return list(zip(np.random.SeedSequence(self.seed).spawn(len(sizes)), sizes))
+
+    def run_chunk(self, chunk: Tuple[np.random.SeedSequence, int]) -> SimulationArrays:
+        seed_sequence, n_sim = chunk
+        return self.simulate(np.random.default_rng(seed_sequence), n_sim)
+
+    def simulate(self, rng: np.random.Generator, n_sim: int) -> SimulationArrays:
+        """Simulates `n_sim` replicates drawn from `rng`."""
+        stat_a, stat_b, estimand = self.generate_data(rng, n_sim)
+        results = [
+            kernel(stat_a, stat_b, config)
+            for kernel, config in zip(self.kernels, self.configs)
+        ]
+        theta = np.broadcast_to(
+            np.asarray(estimand, dtype=float).reshape(-1, 1), (n_sim, self.n_tests)
+        )
+        return (
+            np.column_stack([r.expected for r in results]),
+            np.column_stack([r.stddev for r in results]),
+            np.column_stack([r.ci_lower for r in results]),
+            np.column_stack([r.ci_upper for r in results]),
+            np.array(theta),
+        )
+
+    @abstractmethod
+    def generate_data(
+        self, rng: np.random.Generator, n_sim: int
+    ) -> Tuple[MeanStatisticArrays, MeanStatisticArrays, Union[float, np.ndarray]]:
+        pass
+
+
+# each worker process keeps its own copy of the study, sent once
+_worker_study: Optional[BatchSimulationStudy] = None
+
+
+def _set_worker_study(study: BatchSimulationStudy) -> None:
+    global _worker_study
+    _worker_study = study
+
+
+def _run_worker_chunk(chunk: Tuple[np.random.SeedSequence, int]) -> SimulationArrays:
+    assert _worker_study is not None
+    return _worker_study.run_chunk(chunk)
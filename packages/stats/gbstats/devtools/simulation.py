@@ -18,6 +18,11 @@ from gbstats.models.tests import (
     BaseABTest,
     BaseConfig,
 )
+from gbstats.devtools.sufficient_statistics import (
+    STATISTIC_COMPONENTS,
+    statistic_from_moments,
+    unit_moments,
+)
 
 ##############################################
 # this file is used for internal testing only.
@@ -25,7 +30,45 @@ from gbstats.models.tests import (
 ###############################################
 
 
-class SimulationStudy(ABC):
+class SimulationMetrics:
+    """Summaries of simulated results stored as (n_sim, n_tests) arrays.
+
+    Each summary is a reduction over the replicates, with one value per test.
+    """
+
+    pt: np.ndarray
+    theta: np.ndarray
+    lower_limit: np.ndarray
+    upper_limit: np.ndarray
+
+    @property
+    def coverage(self) -> np.ndarray:
+        """computes coverage."""
+        return np.mean(
+            (self.lower_limit <= self.theta) & (self.upper_limit >= self.theta),
+            axis=0,
+        )
+
+    @property
+    def reject(self) -> np.ndarray:
+        return 1.0 - np.mean(
+            (self.lower_limit < 0.0) & (self.upper_limit > 0.0), axis=0
+        )
+
+    @property
+    def mse(self) -> np.ndarray:
+        return np.mean((self.pt - self.theta) ** 2, axis=0)
+
+    @property
+    def bias(self) -> np.ndarray:
+        return np.mean(self.pt - self.theta, axis=0)
+
+    @property
+    def variance(self) -> np.ndarray:
+        return np.var(self.pt, axis=0)
+
+
+class SimulationStudy(SimulationMetrics, ABC):
     def __init__(
         self,
         test_dict: Mapping[str, Tuple[Type[BaseABTest], BaseConfig]],
@@ -74,40 +117,6 @@ class SimulationStudy(ABC):
     def generate_data(self) -> Tuple[TestStatistic, TestStatistic, float]:
         pass
 
-    @property
-    def coverage(self):
-        """computes coverage."""
-        return [
-            np.mean(
-                (self.lower_limit[:, j] <= self.theta[:, j])
-                * (self.upper_limit[:, j] >= self.theta[:, j])
-            )
-            for j in range(self.n_tests)
-        ]
-
-    @property
-    def reject(self):
-        return [
-            1.0
-            - np.mean((self.lower_limit[:, j] < 0.0) * (self.upper_limit[:, j] > 0.0))
-            for j in range(self.n_tests)
-        ]
-
-    @property
-    def mse(self):
-        return [
-            np.mean((self.pt[:, j] - self.theta[:, j]) ** 2)
-            for j in range(self.n_tests)
-        ]
-
-    @property
-    def bias(self):
-        return [np.mean(self.pt[:, j] - self.theta[:, j]) for j in range(self.n_tests)]
-
-    @property
-    def variance(self):
-        return [np.var(self.pt[:, j]) for j in range(self.n_tests)]
-
 
 def bernoulli_standard_error(nu, n):
     return np.sqrt(nu * (1 - nu)) / np.sqrt(n)
@@ -148,100 +157,21 @@ class CreateStatistic:
         ), "if x is specified, it must have the same shape as y"
 
     def create_statistic(self) -> TestStatistic:
-        if self.statistic_type == "sample_mean":
-            return SampleMeanStatistic(
-                n=self.n,
-                sum=float(np.sum(self.y)),
-                sum_squares=float(np.sum(self.y**2)),
-            )
-        elif self.statistic_type == "proportion":
-            return ProportionStatistic(n=self.n, sum=float(np.sum(self.y)))
-        elif self.statistic_type == "ratio":
-            if self.x is None:
-                raise ValueError("x must be provided for ratio statistic")
-            m_statistic = SampleMeanStatistic(
-                n=self.n,
-                sum=float(np.sum(self.y)),
-                sum_squares=float(np.sum(self.y**2)),
-            )
-            d_statistic = SampleMeanStatistic(
-                n=self.n,
-                sum=float(np.sum(self.x)),
-                sum_squares=float(np.sum(self.x**2)),
-            )
-            m_d_sum_of_products = float(np.sum(self.y * self.x))
-            return RatioStatistic(
-                n=len(self.y),
-                m_statistic=m_statistic,
-                d_statistic=d_statistic,
-                m_d_sum_of_products=m_d_sum_of_products,
-            )
-        elif self.statistic_type == "regression_adjusted":
-            if self.x is None:
-                raise ValueError("x must be provided for regression statistic")
-            post_statistic = SampleMeanStatistic(
-                n=self.n,
-                sum=float(np.sum(self.y)),
-                sum_squares=float(np.sum(self.y**2)),
-            )
-            pre_statistic = SampleMeanStatistic(
-                n=self.n,
-                sum=float(np.sum(self.x)),
-                sum_squares=float(np.sum(self.x**2)),
-            )
-            post_pre_sum_of_products = float(np.sum(self.y * self.x))
-            stat = RegressionAdjustedStatistic(
-                n=post_statistic.n,
-                post_statistic=post_statistic,
-                pre_statistic=pre_statistic,
-                post_pre_sum_of_products=post_pre_sum_of_products,
-                theta=None,
-            )
-            return stat
-        elif self.statistic_type == "regression_adjusted_ratio":
-            if self.x is None:
-                raise ValueError(
-                    "x must be provided for regression adjusted ratio statistic"
-                )
-            m_statistic_post = SampleMeanStatistic(
-                n=self.n,
-                sum=float(np.sum(self.y[:, 0])),
-                sum_squares=float(np.sum(self.y[:, 0] ** 2)),
-            )
-            d_statistic_post = SampleMeanStatistic(
-                n=self.n,
-                sum=float(np.sum(self.y[:, 1])),
-                sum_squares=float(np.sum(self.y[:, 1] ** 2)),
-            )
-            m_statistic_pre = SampleMeanStatistic(
-                n=self.n,
-                sum=float(np.sum(self.x[:, 0])),
-                sum_squares=float(np.sum(self.x[:, 0] ** 2)),
-            )
-            d_statistic_pre = SampleMeanStatistic(
-                n=self.n,
-                sum=float(np.sum(self.x[:, 1])),
-                sum_squares=float(np.sum(self.x[:, 1] ** 2)),
-            )
-            m_post_m_pre_sum_of_products = float(np.sum(self.y[:, 0] * self.x[:, 0]))
-            d_post_d_pre_sum_of_products = float(np.sum(self.y[:, 1] * self.x[:, 1]))
-            m_pre_d_pre_sum_of_products = float(np.sum(self.x[:, 0] * self.x[:, 1]))
-            m_post_d_post_sum_of_products = float(np.sum(self.y[:, 0] * self.y[:, 1]))
-            m_post_d_pre_sum_of_products = float(np.sum(self.y[:, 0] * self.x[:, 1]))
-            m_pre_d_post_sum_of_products = float(np.sum(self.x[:, 0] * self.y[:, 1]))
-            return RegressionAdjustedRatioStatistic(
-                n=self.n,
-                m_statistic_post=m_statistic_post,
-                d_statistic_post=d_statistic_post,
-                m_statistic_pre=m_statistic_pre,
-                d_statistic_pre=d_statistic_pre,
-                m_post_m_pre_sum_of_products=m_post_m_pre_sum_of_products,
-                d_post_d_pre_sum_of_products=d_post_d_pre_sum_of_products,
-                m_pre_d_pre_sum_of_products=m_pre_d_pre_sum_of_products,
-                m_post_d_post_sum_of_products=m_post_d_post_sum_of_products,
-                m_post_d_pre_sum_of_products=m_post_d_pre_sum_of_products,
-                m_pre_d_post_sum_of_products=m_pre_d_post_sum_of_products,
-                theta=None,
+        if self.statistic_type in STATISTIC_COMPONENTS:
+            units = self.y.reshape(self.n, -1)
+            if self.statistic_type not in ["sample_mean", "proportion"]:
+                if self.x is None:
+                    raise ValueError(
+                        f"x must be provided for {self.statistic_type} statistic"
+                    )
+                units = np.column_stack([units, self.x.reshape(self.n, -1)])
+            # a single pass over the units for every sum and cross-product
+            moments = unit_moments(units)
+            return statistic_from_moments(
+                self.statistic_type,
+                self.n,
+                moments.sums[0],
+                moments.cross_products[0],
             )
         else:
             if not self.nu:
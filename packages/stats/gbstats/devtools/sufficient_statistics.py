@@ -0,0 +1,207 @@
+"""Sufficient statistics for simulations, without unit-level arrays.
+
+Every statistic used in the simulations is a function of the number of
+units, the sums of the outcomes and the sums of their cross-products. This
+file draws those directly, in memory that does not grow with the number of
+units:
+
+- `multivariate_normal_moments` and `bernoulli_moments` sample them exactly,
+  from the joint normal / Wishart and binomial distributions;
+- `streaming_moments` accumulates them over chunks of units for any other
+  outcome distribution.
+
+Like simulation.py, this file is used for internal testing only.
+"""
+
+from dataclasses import dataclass
+from typing import Callable, List
+
+import numpy as np
+
+from gbstats.models.statistics import (
+    TestStatistic,
+    SampleMeanStatistic,
+    ProportionStatistic,
+    RatioStatistic,
+    RegressionAdjustedStatistic,
+    RegressionAdjustedRatioStatistic,
+)
+
+# number of outcome columns per statistic type; ratios take the numerator
+# then the denominator, regression adjusted statistics post then pre values
+# and regression adjusted ratios [m_post, d_post, m_pre, d_pre]
+STATISTIC_COMPONENTS = {
+    "sample_mean": 1,
+    "proportion": 1,
+    "ratio": 2,
+    "regression_adjusted": 2,
+    "regression_adjusted_ratio": 4,
+}
+
+
+@dataclass
+class SufficientMoments:
+    """Sums and cross-products of d outcomes over n units, per replicate.
+
+    `sums` has shape (size, d) and `cross_products` (size, d, d), where
+    cross_products[r, i, j] is the sum over units of y_i * y_j.
+    """
+
+    n: int
+    sums: np.ndarray
+    cross_products: np.ndarray
+
+    @property
+    def size(self) -> int:
+        return self.sums.shape[0]
+
+    def to_statistics(self, statistic_type: str) -> List[TestStatistic]:
+        return [
+            statistic_from_moments(
+                statistic_type, self.n, self.sums[r], self.cross_products[r]
+            )
+            for r in range(self.size)
+        ]
+
+
+def statistic_from_moments(
+    statistic_type: str, n: int, sums: np.ndarray, cross_products: np.ndarray
+) -> TestStatistic:
+    """Builds the statistic of one replicate; columns as in STATISTIC_COMPONENTS."""
+    if statistic_type not in STATISTIC_COMPONENTS:
+        raise ValueError(f"statistic_type {statistic_type} has no moment form")
+    if len(sums) != STATISTIC_COMPONENTS[statistic_type]:
+        raise ValueError(
+            f"{statistic_type} statistic needs {STATISTIC_COMPONENTS[statistic_type]} outcome columns, got {len(sums)}"
+        )
+    s = [float(v) for v in sums]
+    c = [[float(v) for v in row] for row in cross_products]
+
+    def mean_statistic(i: int) -> SampleMeanStatistic:
+        return SampleMeanStatistic(n=n, sum=s[i], sum_squares=c[i][i])
+
+    if statistic_type == "sample_mean":
+        return mean_statistic(0)
+    elif statistic_type == "proportion":
+        return ProportionStatistic(n=n, sum=s[0])
+    elif statistic_type == "ratio":
+        return RatioStatistic(
+            n=n,
+            m_statistic=mean_statistic(0),
+            d_statistic=mean_statistic(1),
+            m_d_sum_of_products=c[0][1],
+        )
+    elif statistic_type == "regression_adjusted":
+        return RegressionAdjustedStatistic(
+            n=n,
+            post_statistic=mean_statistic(0),
+            pre_statistic=mean_statistic(1),
+            post_pre_sum_of_products=c[0][1],
+            theta=None,
+        )
+    else:
+        return RegressionAdjustedRatioStatistic(
+            n=n,
+            m_statistic_post=mean_statistic(0),
+            d_statistic_post=mean_statistic(1),
+            m_statistic_pre=mean_statistic(2),
+            d_statistic_pre=mean_statistic(3),
+            m_post_m_pre_sum_of_products=c[0][2],
+            d_post_d_pre_sum_of_products=c[1][3],
+            m_pre_d_pre_sum_of_products=c[2][3],
+            m_post_d_post_sum_of_products=c[0][1],
+            m_post_d_pre_sum_of_products=c[0][3],
+            m_pre_d_post_sum_of_products=c[2][1],
+            theta=None,
+        )
+
+
+def unit_moments(units: np.ndarray) -> SufficientMoments:
+    """Moments of one replicate from unit-level outcomes of shape (n, d)."""
+    units = units.reshape(units.shape[0], -1)
+    return SufficientMoments(
+        n=units.shape[0],
+        sums=units.sum(axis=0)[np.newaxis],
+        cross_products=(units.T @ units)[np.newaxis],
+    )
+
+
+def multivariate_normal_moments(
+    rng: np.random.Generator,
+    n: int,
+    mean: np.ndarray,
+    cov: np.ndarray,
+    size: int = 1,
+) -> SufficientMoments:
+    """Exact moments of n iid N(mean, cov) units, per replicate.
+
+    The sums are N(n * mean, n * cov) and, independently, the scatter matrix
+    around the sample mean is Wishart(n - 1, cov), drawn with the Bartlett
+    decomposition.
+    """
+    mean = np.atleast_1d(np.asarray(mean, dtype=float))
+    cov = np.atleast_2d(np.asarray(cov, dtype=float))
+    d = len(mean)
+    if n <= d:
+        raise ValueError("n must exceed the number of outcome columns")
+    chol = np.linalg.cholesky(cov)
+    sums = n * mean + np.sqrt(n) * rng.standard_normal((size, d)) @ chol.T
+    # Bartlett: A is lower triangular with chi(n - 1 - i) on the diagonal
+    bartlett = np.tril(rng.standard_normal((size, d, d)), k=-1)
+    diagonal = np.sqrt(rng.chisquare(n - 1 - np.arange(d), size=(size, d)))
+    bartlett[:, np.arange(d), np.arange(d)] = diagonal
+    factor = chol @ bartlett
+    scatter = factor @ np.swapaxes(factor, 1, 2)
+    return SufficientMoments(
+        n=n,
+        sums=sums,
+        cross_products=scatter + sums[:, :, np.newaxis] * sums[:, np.newaxis, :] / n,
+    )
+
+
+def normal_moments(
+    rng: np.random.Generator, n: int, mean: float, sd: float, size: int = 1
+) -> SufficientMoments:
+    """Exact moments of n iid N(mean, sd**2) units, per replicate."""
+    return multivariate_normal_moments(
+        rng, n, np.array([mean]), np.array([[sd**2]]), size
+    )
+
+
+def bernoulli_moments(
+    rng: np.random.Generator, n: int, p: float, size: int = 1
+) -> SufficientMoments:
+    """Exact moments of n iid Bernoulli(p) units, per replicate."""
+    sums = rng.binomial(n, p, size=(size, 1)).astype(float)
+    return SufficientMoments(
+        n=n, sums=sums, cross_products=sums[:, :, np.newaxis].copy()
+    )
+
+
+def streaming_moments(
+    rng: np.random.Generator,
+    sampler: Callable[[np.random.Generator, int, int], np.ndarray],
+    n: int,
+    size: int = 1,
+    chunk_size: int = 100_000,
+) -> SufficientMoments:
+    """Moments of n units accumulated over chunks of at most `chunk_size`.
+
+    `sampler(rng, size, m)` returns m units for each replicate, with shape
+    (size, m) or (size, m, d). Memory is bounded by one chunk.
+    """
+    if n < 1 or chunk_size < 1:
+        raise ValueError("n and chunk_size must be positive")
+    moments = None
+    for start in range(0, n, chunk_size):
+        units = sampler(rng, size, min(chunk_size, n - start))
+        units = units.reshape(size, units.shape[1], -1)
+        chunk_sums = units.sum(axis=1)
+        chunk_cross_products = np.swapaxes(units, 1, 2) @ units
+        if moments is None:
+            moments = SufficientMoments(n, chunk_sums, chunk_cross_products)
+        else:
+            moments.sums += chunk_sums
+            moments.cross_products += chunk_cross_products
+    assert moments is not None
+    return moments
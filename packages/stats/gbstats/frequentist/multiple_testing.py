@@ -0,0 +1,59 @@
+from typing import Tuple
+
+import numpy as np
+
+from gbstats.frequentist.quantiles import norm_ppf
+from gbstats.models.settings import PValueCorrection
+
+
+def holm_bonferroni(p_values: np.ndarray) -> np.ndarray:
+    m = len(p_values)
+    order = np.argsort(p_values, kind="stable")
+    adjusted = np.minimum(p_values[order] * (m - np.arange(m)), 1)
+    result = np.empty(m)
+    result[order] = np.maximum.accumulate(adjusted)
+    return result
+
+
+def benjamini_hochberg(p_values: np.ndarray) -> np.ndarray:
+    m = len(p_values)
+    order = np.argsort(p_values, kind="stable")
+    adjusted = np.minimum(p_values[order] * m / np.arange(1, m + 1), 1)
+    result = np.empty(m)
+    result[order] = np.minimum.accumulate(adjusted[::-1])[::-1]
+    return result
+
+
+def adjust_p_values(p_values: np.ndarray, method: PValueCorrection) -> np.ndarray:
+    if len(p_values) == 0:
+        return np.array(p_values, dtype=float)
+    if method == "holm-bonferroni":
+        return holm_bonferroni(p_values)
+    elif method == "benjamini-hochberg":
+        return benjamini_hochberg(p_values)
+    raise ValueError(f"Unknown p-value correction: {method}")
+
+
+def adjusted_confidence_intervals(
+    p_adjusted: np.ndarray,
+    lift: np.ndarray,
+    ci_lower: np.ndarray,
+    ci_upper: np.ndarray,
+    alpha: float,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Widens each interval to match its adjusted p-value.
+
+    The interval is centered on the lift with the standard error implied by
+    the adjusted p-value. It only replaces the original interval when it is
+    wider on both sides, and is unbounded when the adjusted p-value is 1.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stddev = np.abs(lift / norm_ppf(1 - p_adjusted / 2))
+        width = norm_ppf(1 - alpha / 2) * stddev
+    lower, upper = lift - width, lift + width
+    wider = (lift != 0) & (lower < ci_lower) & (upper > ci_upper)
+    unbounded = p_adjusted > 0.999999
+    return (
+        np.where(unbounded, -np.inf, np.where(wider, lower, ci_lower)),
+        np.where(unbounded, np.inf, np.where(wider, upper, ci_upper)),
+    )
@@ -0,0 +1,73 @@
+"""Memoized quantiles shared by the tests and power calculations.
+
+A single analysis evaluates the same handful of quantiles many times: every
+metric and variation asks for the same normal critical value and sequential
+rho, and the same t quantile is recomputed whenever a test is re-run on the
+same statistics (e.g. for supplemental results). Scalar lookups go through
+bounded LRU caches; array arguments bypass the caches and are computed
+directly.
+
+Keys are the exact arguments, so cached values are identical to the scipy
+results. The Welch-Satterthwaite degrees of freedom are deliberately not
+rounded into buckets, as that would move confidence intervals.
+"""
+
+from functools import lru_cache
+from typing import Union
+
+import numpy as np
+from scipy.stats import norm, t
+
+QUANTILE_CACHE_SIZE = 4096
+
+
+def _sequential_rho(alpha, sequential_tuning_parameter, two_sided=True):
+    # eq 161 in https://arxiv.org/pdf/2103.06476v7.pdf
+    alpha_arg = alpha if two_sided else 2 * alpha
+    return np.sqrt(
+        (-2 * np.log(alpha_arg) + np.log(-2 * np.log(alpha_arg) + 1))
+        / sequential_tuning_parameter
+    )
+
+
+_cached_sequential_rho = lru_cache(maxsize=QUANTILE_CACHE_SIZE)(_sequential_rho)
+
+
+@lru_cache(maxsize=QUANTILE_CACHE_SIZE)
+def _cached_t_ppf(q: float, dof: float) -> float:
+    return float(t.ppf(q, dof))
+
+
+@lru_cache(maxsize=QUANTILE_CACHE_SIZE)
+def _cached_norm_ppf(q: float) -> float:
+    return float(norm.ppf(q))
+
+
+def _is_scalar(*args) -> bool:
+    return all(np.ndim(arg) == 0 for arg in args)
+
+
+def sequential_rho(alpha, sequential_tuning_parameter, two_sided=True) -> float:
+    if _is_scalar(alpha, sequential_tuning_parameter):
+        return _cached_sequential_rho(
+            float(alpha), float(sequential_tuning_parameter), bool(two_sided)
+        )
+    return _sequential_rho(alpha, sequential_tuning_parameter, two_sided)
+
+
+def t_ppf(q, dof) -> Union[float, np.ndarray]:
+    if _is_scalar(q, dof):
+        return _cached_t_ppf(float(q), float(dof))
+    return t.ppf(q, dof)
+
+
+def norm_ppf(q) -> Union[float, np.ndarray]:
+    if _is_scalar(q):
+        return _cached_norm_ppf(float(q))
+    return norm.ppf(q)
+
+
+def clear_quantile_caches() -> None:
+    _cached_sequential_rho.cache_clear()
+    _cached_t_ppf.cache_clear()
+    _cached_norm_ppf.cache_clear()
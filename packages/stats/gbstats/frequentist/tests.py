@@ -6,6 +6,7 @@ import numpy as np
 from pydantic.dataclasses import dataclass
 from scipy.stats import t
 
+from gbstats.frequentist.quantiles import sequential_rho, t_ppf
 from gbstats.messages import (
     ZERO_SCALED_VARIATION_MESSAGE,
     NO_UNITS_IN_VARIATION_MESSAGE,
@@ -203,7 +204,7 @@ class TwoSidedTTest(TTest):
     @property
     def confidence_interval(self) -> Tuple[float, float]:
         halfwidth: float = (
-            float(t.ppf(1 - self.alpha / 2, self.dof))
+            float(t_ppf(1 - self.alpha / 2, self.dof))
             * self.moments_result.standard_error
         )
         return two_sided_confidence_interval(
@@ -219,7 +220,7 @@ class OneSidedTreatmentGreaterTTest(TTest):
     @property
     def confidence_interval(self) -> ResponseCI:
         halfwidth: float = (
-            float(t.ppf(1 - self.alpha, self.dof)) * self.moments_result.standard_error
+            float(t_ppf(1 - self.alpha, self.dof)) * self.moments_result.standard_error
         )
         return one_sided_confidence_interval(
             self.moments_result.point_estimate, halfwidth, lesser=False
@@ -234,22 +235,13 @@ class OneSidedTreatmentLesserTTest(TTest):
     @property
     def confidence_interval(self) -> ResponseCI:
         halfwidth: float = (
-            float(t.ppf(1 - self.alpha, self.dof)) * self.moments_result.standard_error
+            float(t_ppf(1 - self.alpha, self.dof)) * self.moments_result.standard_error
         )
         return one_sided_confidence_interval(
             self.moments_result.point_estimate, halfwidth, lesser=True
         )
 
 
-def sequential_rho(alpha, sequential_tuning_parameter, two_sided=True) -> float:
-    # eq 161 in https://arxiv.org/pdf/2103.06476v7.pdf
-    alpha_arg = alpha if two_sided else 2 * alpha
-    return np.sqrt(
-        (-2 * np.log(alpha_arg) + np.log(-2 * np.log(alpha_arg) + 1))
-        / sequential_tuning_parameter
-    )
-
-
 def sequential_interval_halfwidth(
     s2, n, sequential_tuning_parameter, alpha, rho=None
 ) -> float:
@@ -1,11 +1,24 @@
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass
 import dataclasses
 import re
 import traceback
 import copy
-from typing import Any, Dict, List, Optional, Set, Tuple, Union
+import math
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+    cast,
+)
 
-import pandas as pd
+import numpy as np
 
 from gbstats.bayesian.tests import (
     BayesianTestResult,
@@ -14,16 +27,10 @@ from gbstats.bayesian.tests import (
     GaussianPrior,
 )
 
-from gbstats.bayesian.bandits import (
-    BanditsSimple,
-    BanditsRatio,
-    BanditsCuped,
-    BanditConfig,
-    get_error_bandit_result,
-)
-
 from gbstats.power.midexperimentpower import (
+    AdditionalSampleSizeNeededResult,
     MidExperimentPower,
+    MidExperimentPowerBatch,
     MidExperimentPowerConfig,
 )
 
@@ -40,6 +47,10 @@ from gbstats.frequentist.tests import (
     SequentialOneSidedTreatmentGreaterTTest,
     FrequentistTestResult,
 )
+from gbstats.frequentist.multiple_testing import (
+    adjust_p_values,
+    adjusted_confidence_intervals,
+)
 
 from gbstats.models.results import (
     BaselineResponseWithSupplementalResults,
@@ -59,6 +70,7 @@ from gbstats.models.results import (
     BanditResult,
     SingleVariationResult,
     PowerResponse,
+    response_fields,
 )
 from gbstats.models.settings import (
     AnalysisSettingsForStatsEngine,
@@ -81,11 +93,22 @@ from gbstats.models.statistics import (
     SampleMeanStatistic,
     TestStatistic,
     BanditStatistic,
+    CupedContext,
 )
-from gbstats.utils import check_srm
+from gbstats.utils import check_srm_bulk
 
 from gbstats.models.tests import EffectMomentsResult
 
+if TYPE_CHECKING:
+    # Bandits are imported lazily, only experiments with bandit settings need them
+    from gbstats.bayesian.bandits import (
+        Bandits,
+        BanditResponse,
+        BanditsSimple,
+        BanditsRatio,
+        BanditsCuped,
+    )
+    import pandas as pd
 
 SUM_COLS = [
     "users",
@@ -136,6 +159,9 @@ BANDIT_DIMENSION = {
     "value": "All",
 }
 
+# One dict per dimension/strata combo with a column for each variation's sums
+MetricRows = List[Dict[str, Any]]
+
 StatisticalTests = Union[
     EffectBayesianABTest,
     SequentialTwoSidedTTest,
@@ -147,13 +173,23 @@ StatisticalTests = Union[
 ]
 
 
+# The engine works on plain row dicts; DataFrames (e.g. from generated
+# notebooks) are still accepted and converted on the way in
+def to_records(
+    rows: Union[ExperimentMetricQueryResponseRows, "pd.DataFrame"]
+) -> ExperimentMetricQueryResponseRows:
+    if hasattr(rows, "to_dict"):
+        return rows.to_dict("records")  # type: ignore
+    return rows  # type: ignore
+
+
 # Looks for any variation ids that are not in the provided map
 def detect_unknown_variations(
     rows, var_ids: Set[str], ignore_ids: Set[str] = {"__multiple__"}
 ) -> Set[str]:
     unknown_var_ids = []
-    for row in rows.itertuples(index=False):
-        id = str(row.variation)
+    for row in to_records(rows):
+        id = str(row["variation"])
         if id not in ignore_ids and id not in var_ids:
             unknown_var_ids.append(id)
     return set(unknown_var_ids)
@@ -178,47 +214,71 @@ def get_dimension_column_name(dimension: str) -> str:
 @dataclass
 class InitialMetricDataStrata:
     total_units: int
-    data: Dict[str, Dict[str, Any]]
+    data: Dict[int, Dict[str, Any]]
 
 
 @dataclass
 class DimensionMetricData:
     dimension: str
     total_units: int
-    data: pd.DataFrame
+    data: MetricRows
+    # shared by every pass over this data, keyed by statistic type and
+    # whether the covariate is used as the response; not an init field, so
+    # copies with other rows (e.g. uncapped) start empty
+    cuped_contexts: Dict[Tuple[str, bool], CupedContext] = dataclasses.field(
+        default_factory=dict, init=False, compare=False, repr=False
+    )
+
+
+def get_row_value(row: Mapping[str, Any], col: str) -> Any:
+    value = row.get(col, 0)
+    # SQL nulls arrive as None, treat them like missing numbers
+    return math.nan if value is None else value
+
 
+def get_strata_value(value: Any) -> Any:
+    # nulls and NaNs all belong to one stratum; NaN != NaN would split them
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
 
-# Transform raw SQL result for metrics into a dataframe per dimension level
+
+# Transform raw SQL result for metrics into rows per dimension level
 def get_metric_dfs(
-    rows: pd.DataFrame,
+    rows: Union[ExperimentMetricQueryResponseRows, "pd.DataFrame"],
     var_id_map: VarIdMap,
     var_names: List[str],
     dimension: Optional[str] = None,
     post_stratify: bool = False,
 ) -> List[DimensionMetricData]:
-    dfc = rows.copy()
+    records = to_records(rows)
     dimensions: Dict[str, InitialMetricDataStrata] = {}
     dimension_column_name = (
         "" if not dimension else get_dimension_column_name(dimension)
     )
 
     if post_stratify:
-        # if post-stratifying, then we need to create a strata column
+        # if post-stratifying, then we need a strata key per row
         # to ensure data is not collapsed across strata
-        precomputed_dimension_df = dfc.filter(like="dim_exp_")
-        dfc["strata"] = precomputed_dimension_df.astype(str).agg("_".join, axis=1)
+        columns = dict.fromkeys(col for row in records for col in row)
+        strata_columns = [col for col in columns if "dim_exp_" in col]
     else:
         # if not post-stratifying, then all rows are in the same strata
         # and we will collapse all data into one row per dimension
-        dfc["strata"] = ""
+        strata_columns = []
+    # Strata are integer codes, numbered in order of appearance, for each
+    # distinct combination of the strata columns
+    strata_codes: Dict[Tuple[Any, ...], int] = {}
 
     # Each row in the raw SQL result is a dimension/variation combo
     # We want to end up with one row per dimension/strata
-    for row in dfc.itertuples(index=False):
+    for row in records:
         # if not found, try to find a column with "dimension" for backwards compatibility
         # fall back to one unnamed dimension if even that column is not found
-        dim = getattr(row, dimension_column_name, getattr(row, "dimension", ""))
-        strata = getattr(row, "strata", "")
+        # dimension values are strings, though the row type allows numbers
+        dim = cast(str, row.get(dimension_column_name, row.get("dimension", "")))
+        strata_key = tuple(get_strata_value(row.get(col)) for col in strata_columns)
+        strata = strata_codes.setdefault(strata_key, len(strata_codes))
 
         # If this is the first time we're seeing this dimension-strata combo, create an empty dict
         if dim not in dimensions:
@@ -242,34 +302,36 @@ def get_metric_dfs(
                     dimensions[dim].data[strata][f"{prefix}_{col}"] = 0
 
         # Add this SQL result row into the dimension dict if we recognize the variation
-        key = str(row.variation)
+        key = str(row["variation"])
         if key in var_id_map:
             i = var_id_map[key]
-            dimensions[dim].total_units += getattr(row, "users", 0)
+            dimensions[dim].total_units += get_row_value(row, "users")
             prefix = f"v{i}" if i > 0 else "baseline"
 
             # Sum here in case multiple rows per dimension
             for col in SUM_COLS:
-                # Special handling for count, if missing returns a method, so override with user value
-                if col == "count" and callable(getattr(row, col)):
-                    dimensions[dim].data[strata][f"{prefix}_count"] += getattr(
-                        row, "users", 0
+                # Special handling for count, if missing use the user value
+                if col == "count" and "count" not in row:
+                    dimensions[dim].data[strata][f"{prefix}_count"] += get_row_value(
+                        row, "users"
                     )
                 else:
-                    dimensions[dim].data[strata][f"{prefix}_{col}"] += getattr(
-                        row, col, 0
+                    dimensions[dim].data[strata][f"{prefix}_{col}"] += get_row_value(
+                        row, col
                     )
             for col in NON_SUMMABLE_COLS:
                 if dimensions[dim].data[strata][f"{prefix}_{col}"] != 0:
                     raise ValueError(
                         f"ImplementationError: Non-summable column {col} already has a value for dimension {dim}/{strata}"
                     )
-                dimensions[dim].data[strata][f"{prefix}_{col}"] = getattr(row, col, 0)
+                dimensions[dim].data[strata][f"{prefix}_{col}"] = get_row_value(
+                    row, col
+                )
     return [
         DimensionMetricData(
             dimension=dimension,
             total_units=dimension_data.total_units,
-            data=pd.DataFrame([s for s in dimension_data.data.values()]),
+            data=list(dimension_data.data.values()),
         )
         for dimension, dimension_data in dimensions.items()
     ]
@@ -297,19 +359,20 @@ def reduce_dimensionality(
         elif keep_other:
             current = new_metric_data[max - 1]
             current.dimension = "(other)"
-            current.data["dimension"] = "(other)"
-            dimension.data["dimension"] = "(other)"
+            for row in current.data + dimension.data:
+                row["dimension"] = "(other)"
             current.total_units += dimension.total_units
-            for v in range(num_variations):
-                prefix = f"v{v}" if v > 0 else "baseline"
-                if combine_strata:
-                    for row in dimension.data.itertuples(index=False):
+            if combine_strata:
+                for v in range(num_variations):
+                    prefix = f"v{v}" if v > 0 else "baseline"
+                    for row in dimension.data:
                         for col in SUM_COLS:
-                            current.data[f"{prefix}_{col}"] += getattr(
-                                row, f"{prefix}_{col}", 0
-                            )
-                else:
-                    current.data = pd.concat([current.data, dimension.data])
+                            for current_row in current.data:
+                                current_row[f"{prefix}_{col}"] += row.get(
+                                    f"{prefix}_{col}", 0
+                                )
+            else:
+                current.data = current.data + dimension.data
     # TODO: test that dimension with 21 values collapses correctly
     return new_metric_data
 
@@ -328,6 +391,7 @@ def get_configured_test(
         "phase_length_days": analysis.phase_length_days,
         "difference_type": analysis.difference_type,
         "post_stratify": post_stratify,
+        "max_strata": analysis.max_strata,
     }
     if analysis.use_covariate_as_response:
         num_variations = len(analysis.var_names)
@@ -412,6 +476,42 @@ def run_mid_experiment_power(
     metric: MetricSettingsForStatsEngine,
     analysis: AnalysisSettingsForStatsEngine,
 ) -> PowerResponse:
+    return run_mid_experiment_powers(
+        total_users, num_variations, [(effect_moments, res)], metric, analysis
+    )[0]
+
+
+def run_mid_experiment_powers(
+    total_users: int,
+    num_variations: int,
+    tests: List[
+        Tuple[EffectMomentsResult, Union[BayesianTestResult, FrequentistTestResult]]
+    ],
+    metric: MetricSettingsForStatsEngine,
+    analysis: AnalysisSettingsForStatsEngine,
+) -> List[PowerResponse]:
+    """Mid-experiment power for several variations, solved in one batch"""
+    mid_experiment_powers = [
+        create_mid_experiment_power(
+            total_users, num_variations, effect_moments, res, metric, analysis
+        )
+        for effect_moments, res in tests
+    ]
+    results = MidExperimentPowerBatch(mid_experiment_powers).calculate_sample_sizes()
+    return [
+        power_response(mid_experiment_power, result, metric)
+        for mid_experiment_power, result in zip(mid_experiment_powers, results)
+    ]
+
+
+def create_mid_experiment_power(
+    total_users: int,
+    num_variations: int,
+    effect_moments: EffectMomentsResult,
+    res: Union[BayesianTestResult, FrequentistTestResult],
+    metric: MetricSettingsForStatsEngine,
+    analysis: AnalysisSettingsForStatsEngine,
+) -> MidExperimentPower:
     config = BaseConfig(
         difference_type=analysis.difference_type,
         traffic_percentage=analysis.traffic_percentage,
@@ -440,14 +540,19 @@ def run_mid_experiment_power(
         sequential=analysis.sequential_testing_enabled,
         sequential_tuning_parameter=analysis.sequential_tuning_parameter,
     )
-    mid_experiment_power = MidExperimentPower(
+    return MidExperimentPower(
         effect_moments=effect_moments,
         test_result=res,
         config=config,
         power_config=power_config,
     )
-    mid_experiment_power_result = mid_experiment_power.calculate_sample_size()
 
+
+def power_response(
+    mid_experiment_power: MidExperimentPower,
+    mid_experiment_power_result: AdditionalSampleSizeNeededResult,
+    metric: MetricSettingsForStatsEngine,
+) -> PowerResponse:
     return PowerResponse(
         status=mid_experiment_power_result.update_message,
         errorMessage=mid_experiment_power_result.error,
@@ -586,27 +691,81 @@ def get_pre_exposure_statistics(
     return pre_stat_a, pre_stat_b
 
 
+# Replace regression adjusted statistics with their theta-adjusted versions
+def apply_cuped_contexts(
+    metric_data: List[DimensionMetricData],
+    dimension_stats: List[List[List[Tuple[TestStatistic, TestStatistic]]]],
+    metric: MetricSettingsForStatsEngine,
+    analysis: AnalysisSettingsForStatsEngine,
+) -> None:
+    if metric.statistic_type not in [
+        "mean_ra",
+        "ratio_ra",
+    ] or test_post_strat_eligible(metric, analysis):
+        # stratified data is left to the tests, which adjust each stratum
+        return
+    # theta for every variation from one context per dimension
+    key = (metric.statistic_type, analysis.use_covariate_as_response)
+    for mdat, variation_stats in zip(metric_data, dimension_stats):
+        if not variation_stats or any(len(stats) != 1 for stats in variation_stats):
+            continue
+        if key not in mdat.cuped_contexts:
+            mdat.cuped_contexts[key] = CupedContext(
+                variation_stats[0][0][0],
+                [stats[0][1] for stats in variation_stats],
+            )
+        context = mdat.cuped_contexts[key]
+        variation_stats[:] = [
+            [context.adjusted_statistics(i)] for i in range(len(variation_stats))
+        ]
+
+
 # Run A/B test analysis for each variation and dimension
 def analyze_metric_df(
     metric_data: List[DimensionMetricData],
     num_variations: int,
     metric: MetricSettingsForStatsEngine,
     analysis: AnalysisSettingsForStatsEngine,
+    with_supplemental_results: bool = False,
+    srm_p_values: Optional[List[float]] = None,
 ) -> List[DimensionResponseIndividual]:
+    # The core analysis builds the final response classes up front, so
+    # supplemental results can be attached without rebuilding each variation
+    if with_supplemental_results:
+        baseline_class: Type[BaselineResponse] = BaselineResponseWithSupplementalResults
+        bayesian_class: Type[BayesianVariationResponseIndividual] = (
+            BayesianVariationResponse
+        )
+        frequentist_class: Type[FrequentistVariationResponseIndividual] = (
+            FrequentistVariationResponse
+        )
+    else:
+        baseline_class = BaselineResponse
+        bayesian_class = BayesianVariationResponseIndividual
+        frequentist_class = FrequentistVariationResponseIndividual
+
+    def supplemental_fields() -> Dict[str, Any]:
+        if with_supplemental_results:
+            return {"supplementalResults": SupplementalResults()}
+        return {}
+
+    # SRM only depends on the users, so passes over the same data can share it
+    if srm_p_values is None:
+        srm_p_values = get_srm_p_values(metric_data, num_variations, analysis)
+    if len(srm_p_values) != len(metric_data):
+        raise ValueError(
+            f"Expected one SRM p-value per dimension, got {len(srm_p_values)} for {len(metric_data)} dimensions"
+        )
 
-    def analyze_dimension(
-        dimensionData: DimensionMetricData,
-    ) -> DimensionResponseIndividual:
-        d = dimensionData.data
-        variation_data = []
-        baseline_stat: Optional[TestStatistic] = None
-
-        # Loop through each non-baseline variation and run an analysis
+    def variation_statistics(
+        d: MetricRows,
+    ) -> List[List[Tuple[TestStatistic, TestStatistic]]]:
+        # (control, variation) statistics for each non-baseline variation,
+        # one pair per row (should be one row for non-post-stratified tests)
+        variation_stats = []
         for i in range(1, num_variations):
-            control_stats = []
-            variation_stats = []
-            # get one statistic per row (should be one row for non-post-stratified tests)
-            for _, row in d.iterrows():
+            stats = []
+            for row in d:
                 stat_control = variation_statistic_from_metric_row(
                     row, "baseline", metric
                 )
@@ -617,11 +776,25 @@ def analyze_metric_df(
                     stat_control, stat_variation = get_pre_exposure_statistics(
                         stat_control, stat_variation
                     )
-                control_stats.append(stat_control)
-                variation_stats.append(stat_variation)
+                stats.append((stat_control, stat_variation))
+            variation_stats.append(stats)
+        return variation_stats
 
-            stats = list(zip(control_stats, variation_stats))
+    dimension_stats = [variation_statistics(mdat.data) for mdat in metric_data]
+    apply_cuped_contexts(metric_data, dimension_stats, metric, analysis)
 
+    def analyze_dimension(
+        dimensionData: DimensionMetricData,
+        srm_p: float,
+        variation_stats: List[List[Tuple[TestStatistic, TestStatistic]]],
+    ) -> DimensionResponseIndividual:
+        d = dimensionData.data
+        variation_data = []
+        baseline_stat: Optional[TestStatistic] = None
+        variation_tests = []
+
+        # Loop through each non-baseline variation and run an analysis
+        for stats in variation_stats:
             # TODO(post-stratification): throw error if post-stratify is false and there are 2+ rows?
             post_stratify = test_post_strat_eligible(metric, analysis)
             test = get_configured_test(
@@ -632,82 +805,80 @@ def analyze_metric_df(
                 post_stratify=post_stratify,
             )
             res = test.compute_result()
-            realized_settings = test.realized_settings
             baseline_stat = test.stat_a  # Capture for baseline response
+            variation_tests.append((test, res))
 
-            power_response: Optional[PowerResponse] = None
-            if decision_making_conditions(metric, analysis):
-                power_response = run_mid_experiment_power(
-                    dimensionData.total_units,
-                    num_variations,
-                    test.moments_result,
-                    res,
-                    metric,
-                    analysis,
-                )
+        # power for all variations is solved together
+        power_responses: List[Optional[PowerResponse]] = [None] * len(variation_tests)
+        if variation_tests and decision_making_conditions(metric, analysis):
+            power_responses = run_mid_experiment_powers(  # type: ignore
+                dimensionData.total_units,
+                num_variations,
+                [(test.moments_result, res) for test, res in variation_tests],
+                metric,
+                analysis,
+            )
 
-            metric_response = get_metric_response(
+        for i, (test, res), power_response in zip(
+            range(1, num_variations), variation_tests, power_responses
+        ):
+            realized_settings = test.realized_settings
+            metric_response_fields = get_metric_response_fields(
                 d,
                 test.stat_b,
                 i,
                 metric.statistic_type in ["quantile_event", "quantile_unit"],
             )
-            # Create base variation response first
-            base_variation_response = BaselineResponse(
-                **asdict(metric_response),
-            )
-            # Safely build specific response type from base response
+            # Build the specific response type in one go from the base fields
             if isinstance(res, BayesianTestResult):
-                variation_response = BayesianVariationResponseIndividual(
-                    **asdict(base_variation_response),
-                    **asdict(res),
+                variation_response = bayesian_class(
+                    **metric_response_fields,
+                    **response_fields(res),
                     realizedSettings=realized_settings,
                     power=(
                         power_response
                         if isinstance(power_response, PowerResponse)
                         else None
                     ),
+                    **supplemental_fields(),
                 )
                 variation_data.append(variation_response)
             elif isinstance(res, FrequentistTestResult):
-                variation_response = FrequentistVariationResponseIndividual(
-                    **asdict(base_variation_response),
-                    **asdict(res),
+                variation_response = frequentist_class(
+                    **metric_response_fields,
+                    **response_fields(res),
                     realizedSettings=realized_settings,
                     power=(
                         power_response
                         if isinstance(power_response, PowerResponse)
                         else None
                     ),
+                    **supplemental_fields(),
                 )
                 variation_data.append(variation_response)
             else:
                 raise ValueError(f"Unexpected test result type: {type(res)}")
 
-        # TODO check front-end SRM matches this SRM
-        srm_p = check_srm(
-            [d["baseline_users"].sum()]
-            + [d[f"v{i}_users"].sum() for i in range(1, num_variations)],
-            analysis.weights,
-        )
-
         # insert baseline data in the appropriate position, uses test from last variation
         # but should be the same for the baseline (stat_a is the control/baseline statistic)
         if baseline_stat is None:
             # Edge case: no treatment variations, compute baseline stat directly
             control_stats = []
-            for _, row in d.iterrows():
+            for row in d:
                 control_stats.append(
                     variation_statistic_from_metric_row(row, "baseline", metric)
                 )
             stats = list(zip(control_stats, control_stats))
             stat_a_summed, _ = sum_stats(stats)
             baseline_stat = stat_a_summed
-        baseline_data = get_metric_response(
-            d,
-            baseline_stat,
-            0,
-            metric.statistic_type in ["quantile_event", "quantile_unit"],
+        baseline_data = baseline_class(
+            **get_metric_response_fields(
+                d,
+                baseline_stat,
+                0,
+                metric.statistic_type in ["quantile_event", "quantile_unit"],
+            ),
+            **supplemental_fields(),
         )
         variation_data.insert(analysis.baseline_index, baseline_data)
 
@@ -715,35 +886,69 @@ def analyze_metric_df(
             dimension=dimensionData.dimension, srm=srm_p, variations=variation_data
         )
 
-    return [analyze_dimension(mdat) for mdat in metric_data]
+    return [
+        analyze_dimension(mdat, srm_p, variation_stats)
+        for mdat, srm_p, variation_stats in zip(
+            metric_data, srm_p_values, dimension_stats
+        )
+    ]
+
+
+# TODO check front-end SRM matches this SRM
+def get_srm_p_values(
+    metric_data: List[DimensionMetricData],
+    num_variations: int,
+    analysis: AnalysisSettingsForStatsEngine,
+) -> List[float]:
+    if not metric_data:
+        return []
+    users = [
+        [sum_column(d.data, "baseline_users")]
+        + [sum_column(d.data, f"v{i}_users") for i in range(1, num_variations)]
+        for d in metric_data
+    ]
+    return list(check_srm_bulk(users, analysis.weights))
+
+
+def sum_column(metric_rows: MetricRows, col: str) -> float:
+    return sum(row[col] for row in metric_rows)
 
 
 def get_metric_response(
-    metric_row: pd.DataFrame, statistic: TestStatistic, v: int, is_quantile: bool
+    metric_rows: MetricRows, statistic: TestStatistic, v: int, is_quantile: bool
 ) -> BaselineResponse:
+    return BaselineResponse(
+        **get_metric_response_fields(metric_rows, statistic, v, is_quantile)
+    )
+
+
+def get_metric_response_fields(
+    metric_rows: MetricRows, statistic: TestStatistic, v: int, is_quantile: bool
+) -> Dict[str, Any]:
     prefix = f"v{v}" if v > 0 else "baseline"
 
-    count = metric_row[f"{prefix}_count"].sum()
+    count = sum_column(metric_rows, f"{prefix}_count")
     if is_quantile:
         # replace count with quantile_n for quantile metrics
-        count = metric_row[f"{prefix}_quantile_n"].sum()
+        count = sum_column(metric_rows, f"{prefix}_quantile_n")
+    users = sum_column(metric_rows, f"{prefix}_users")
     stats = MetricStats(
-        users=metric_row[f"{prefix}_users"].sum(),
-        count=count,
+        users=int(users),
+        count=int(count),
         stddev=statistic.stddev,
         mean=statistic.unadjusted_mean,
     )
-    return BaselineResponse(
+    return dict(
         cr=statistic.unadjusted_mean,
-        value=metric_row[f"{prefix}_main_sum"].sum(),
-        users=metric_row[f"{prefix}_users"].sum(),
-        denominator=metric_row[f"{prefix}_denominator_sum"].sum(),
+        value=sum_column(metric_rows, f"{prefix}_main_sum"),
+        users=users,
+        denominator=sum_column(metric_rows, f"{prefix}_denominator_sum"),
         stats=stats,
     )
 
 
 def variation_statistic_from_metric_row(
-    row: pd.Series,
+    row: Mapping[str, Any],
     prefix: str,
     metric: MetricSettingsForStatsEngine,
 ) -> TestStatistic:
@@ -844,7 +1049,7 @@ def variation_statistic_from_metric_row(
         # Theta will be overriden with correct value later for A/B tests, needs to be passed in for bandits
         theta = None
         if metric.keep_theta:
-            theta = row[f"{prefix}_theta"] if f"{prefix}_theta" in row.index else 0
+            theta = row[f"{prefix}_theta"] if f"{prefix}_theta" in row else 0
         return RegressionAdjustedStatistic(
             post_statistic=post_statistic,
             pre_statistic=pre_statistic,
@@ -857,7 +1062,7 @@ def variation_statistic_from_metric_row(
 
 
 def base_statistic_from_metric_row(
-    row: pd.Series,
+    row: Mapping[str, Any],
     prefix: str,
     component: str,
     metric_type: Optional[MetricType],
@@ -881,7 +1086,7 @@ def base_statistic_from_metric_row(
 
 # Run a specific analysis given data and configuration settings
 def process_analysis(
-    rows: pd.DataFrame,
+    rows: Union[ExperimentMetricQueryResponseRows, "pd.DataFrame"],
     var_id_map: VarIdMap,
     metric: MetricSettingsForStatsEngine,
     analysis: AnalysisSettingsForStatsEngine,
@@ -925,31 +1130,30 @@ def process_analysis(
     return result
 
 
-def replace_with_uncapped(df: pd.DataFrame) -> pd.DataFrame:
+def replace_with_uncapped(metric_rows: MetricRows) -> MetricRows:
     """
     Replaces values in columns with their counterparts ending in '_uncapped'.
 
     Args:
-        df: Input pandas DataFrame.
+        metric_rows: Input rows, one dict per dimension/strata.
 
     Returns:
-        A DataFrame with updated values and '_uncapped' columns removed.
+        New rows with the uncapped values in place of the capped ones.
     """
-    # Create a copy to avoid SettingWithCopy warnings or mutating the original
-    df = df.copy()
-
-    # Identify all columns that end with the suffix
-    uncapped_cols = [col for col in df.columns if col.endswith("_uncapped")]
-
-    for uncapped_col in uncapped_cols:
-        # Determine the target column name (e.g., 'foo_capped' -> 'foo')
-        original_col = uncapped_col.replace("_uncapped", "")
-
-        # Check if the original column exists before trying to replace it
-        if original_col in df.columns:
-            df[original_col] = df[uncapped_col]
+    result = []
+    for row in metric_rows:
+        # Copy to avoid mutating the rows shared with the other analyses
+        row = dict(row)
+        for uncapped_col in [col for col in row if col.endswith("_uncapped")]:
+            # Determine the target column name (e.g., 'foo_capped' -> 'foo')
+            original_col = uncapped_col.replace("_uncapped", "")
+
+            # Check if the original column exists before trying to replace it
+            if original_col in row:
+                row[original_col] = row[uncapped_col]
+        result.append(row)
 
-    return df
+    return result
 
 
 def create_core_and_supplemental_results(
@@ -958,12 +1162,14 @@ def create_core_and_supplemental_results(
     metric: MetricSettingsForStatsEngine,
     analysis: AnalysisSettingsForStatsEngine,
 ) -> List[DimensionResponse]:
-
+    srm_p_values = get_srm_p_values(reduced_metric_data, num_variations, analysis)
     core_result = analyze_metric_df(
         metric_data=reduced_metric_data,
         num_variations=num_variations,
         metric=metric,
         analysis=analysis,
+        with_supplemental_results=True,
+        srm_p_values=srm_p_values,
     )
 
     cuped_adjusted = metric.statistic_type in ["ratio_ra", "mean_ra"]
@@ -981,6 +1187,7 @@ def create_core_and_supplemental_results(
             num_variations=num_variations,
             metric=metric_cuped_unadjusted,
             analysis=analysis,
+            srm_p_values=srm_p_values,
         )
         if post_stratify:
             analysis_unstratified = dataclasses.replace(
@@ -991,12 +1198,14 @@ def create_core_and_supplemental_results(
                 num_variations=num_variations,
                 metric=metric,
                 analysis=analysis_unstratified,
+                srm_p_values=srm_p_values,
             )
             result_no_variance_reduction = analyze_metric_df(
                 metric_data=reduced_metric_data,
                 num_variations=num_variations,
                 metric=metric_cuped_unadjusted,
                 analysis=analysis_unstratified,
+                srm_p_values=srm_p_values,
             )
         else:
             result_unstratified = None
@@ -1013,18 +1222,21 @@ def create_core_and_supplemental_results(
                 num_variations=num_variations,
                 metric=metric,
                 analysis=analysis_unstratified,
+                srm_p_values=srm_p_values,
             )
         else:
             result_unstratified = None
     if compute_uncapped_metric:
-        reduced_metric_data_uncapped = copy.deepcopy(reduced_metric_data)
-        for d in reduced_metric_data_uncapped:
-            d.data = replace_with_uncapped(d.data)
+        reduced_metric_data_uncapped = [
+            dataclasses.replace(d, data=replace_with_uncapped(d.data))
+            for d in reduced_metric_data
+        ]
         result_uncapped = analyze_metric_df(
             metric_data=reduced_metric_data_uncapped,
             num_variations=num_variations,
             metric=metric,
             analysis=analysis,
+            srm_p_values=srm_p_values,
         )
     else:
         result_uncapped = None
@@ -1035,6 +1247,7 @@ def create_core_and_supplemental_results(
             num_variations=num_variations,
             metric=metric_flat_prior,
             analysis=analysis,
+            srm_p_values=srm_p_values,
         )
     else:
         result_flat_prior = None
@@ -1080,20 +1293,32 @@ def combine_core_and_supplemental_results(
 
             if not (is_frequentist or is_bayesian or is_baseline):
                 continue
+            # Reuse responses already built with supplemental results
+            if isinstance(
+                variation,
+                (
+                    BayesianVariationResponse,
+                    FrequentistVariationResponse,
+                    BaselineResponseWithSupplementalResults,
+                ),
+            ):
+                variation_response = variation
+                if variation_response.supplementalResults is None:
+                    variation_response.supplementalResults = SupplementalResults()
             # Create the variation response object
-            if is_bayesian:
+            elif is_bayesian:
                 variation_response = BayesianVariationResponse(
-                    **asdict(variation),
+                    **response_fields(variation),
                     supplementalResults=SupplementalResults(),
                 )
             elif is_frequentist:
                 variation_response = FrequentistVariationResponse(
-                    **asdict(variation),
+                    **response_fields(variation),
                     supplementalResults=SupplementalResults(),
                 )
             else:
                 variation_response = BaselineResponseWithSupplementalResults(
-                    **asdict(variation),
+                    **response_fields(variation),
                     supplementalResults=SupplementalResults(),
                 )
 
@@ -1106,7 +1331,7 @@ def combine_core_and_supplemental_results(
                     and supplemental_result[dim_i].variations[variation_i] is not None
                 ):
                     setattr(
-                        variation_response.supplementalResults,
+                        variation_response.supplementalResults,  # type: ignore
                         attribute_name,
                         supplemental_result[dim_i].variations[variation_i],
                     )
@@ -1128,6 +1353,34 @@ def get_var_id_map(var_ids: List[str]) -> VarIdMap:
     return {v: i for i, v in enumerate(var_ids)}
 
 
+# Positions in analyses that process_single_metric returns results for, in order
+def get_analyzed_indices(
+    rows: ExperimentMetricQueryResponseRows,
+    metric: MetricSettingsForStatsEngine,
+    analyses: List[AnalysisSettingsForStatsEngine],
+) -> List[int]:
+    if len(rows) == 0:
+        return list(range(len(analyses)))
+    rows = to_records(rows)
+    indices = []
+    for i, a in enumerate(analyses):
+        # skip pre-computed dimension reaggregation for quantile metrics
+        attempted_quantile_dimension_reaggregation = a.dimension.startswith(
+            "precomputed:"
+        ) and metric.statistic_type in ["quantile_event", "quantile_unit"]
+        attempted_quantile_overall_reaggregation = (
+            a.dimension == ""
+            and metric.statistic_type in ["quantile_event", "quantile_unit"]
+            and any("dim_exp" in row for row in rows)
+        )
+        if not (
+            attempted_quantile_dimension_reaggregation
+            or attempted_quantile_overall_reaggregation
+        ):
+            indices.append(i)
+    return indices
+
+
 def process_single_metric(
     rows: ExperimentMetricQueryResponseRows,
     metric: MetricSettingsForStatsEngine,
@@ -1146,33 +1399,20 @@ def process_single_metric(
                 for _ in analyses
             ],
         )
-    pdrows = pd.DataFrame(rows)
+    rows = to_records(rows)
 
     # TODO validate data in rows matches metric settings
 
     # Detect any variations that are not in the returned metric rows
     all_var_ids: Set[str] = set([v for a in analyses for v in a.var_ids])
-    unknown_var_ids = detect_unknown_variations(rows=pdrows, var_ids=all_var_ids)
+    unknown_var_ids = detect_unknown_variations(rows=rows, var_ids=all_var_ids)
 
     results: List[List[DimensionResponse]] = []
-    for a in analyses:
-        # skip pre-computed dimension reaggregation for quantile metrics
-        attempted_quantile_dimension_reaggregation = a.dimension.startswith(
-            "precomputed:"
-        ) and metric.statistic_type in ["quantile_event", "quantile_unit"]
-        attempted_quantile_overall_reaggregation = (
-            a.dimension == ""
-            and metric.statistic_type in ["quantile_event", "quantile_unit"]
-            and pdrows.columns.__contains__("dim_exp")
-        )
-        if (
-            attempted_quantile_dimension_reaggregation
-            or attempted_quantile_overall_reaggregation
-        ):
-            continue
+    for i in get_analyzed_indices(rows, metric, analyses):
+        a = analyses[i]
         results.append(
             process_analysis(
-                rows=pdrows,
+                rows=rows,
                 var_id_map=get_var_id_map(a.var_ids),
                 metric=metric,
                 analysis=a,
@@ -1192,7 +1432,7 @@ def process_single_metric(
 
 
 def create_bandit_statistics(
-    metric_data: pd.Series,
+    metric_data: Mapping[str, Any],
     metric: MetricSettingsForStatsEngine,
     num_variations: int,
 ) -> List[BanditStatistic]:
@@ -1223,22 +1463,40 @@ def preprocess_bandits(
     bandit_settings: BanditSettingsForStatsEngine,
     alpha: float,
     dimension: str,
-) -> Union[BanditsSimple, BanditsCuped, BanditsRatio]:
+) -> Union["BanditsSimple", "BanditsCuped", "BanditsRatio"]:
     if len(rows) == 0:
         bandit_stats = {}
     else:
-        pdrows = pd.DataFrame(rows)
-        pdrows = pdrows.loc[pdrows[BANDIT_DIMENSION["column"]] == dimension]
+        rows = to_records(rows)
+        dimension_rows = [
+            row for row in rows if row[BANDIT_DIMENSION["column"]] == dimension
+        ]
         metric_data = get_metric_dfs(
-            rows=pdrows,
+            rows=dimension_rows,
             var_id_map=get_var_id_map(bandit_settings.var_ids),
             var_names=bandit_settings.var_names,
             dimension=dimension,
         )
         # Bandit analyses only have one dimension and one row as period reduction is done in SQL
         bandit_stats = create_bandit_statistics(
-            metric_data[0].data.iloc[0], metric, len(bandit_settings.var_names)
+            metric_data[0].data[0], metric, len(bandit_settings.var_names)
         )
+    return create_bandit(bandit_stats, metric, bandit_settings, alpha)  # type: ignore
+
+
+def create_bandit(
+    bandit_stats: List[BanditStatistic],
+    metric: MetricSettingsForStatsEngine,
+    bandit_settings: BanditSettingsForStatsEngine,
+    alpha: float,
+) -> Union["BanditsSimple", "BanditsCuped", "BanditsRatio"]:
+    from gbstats.bayesian.bandits import (
+        BanditsSimple,
+        BanditsRatio,
+        BanditsCuped,
+        BanditConfig,
+    )
+
     bandit_prior = GaussianPrior(mean=0, variance=float(1e4), proper=True)
     bandit_config = BanditConfig(
         prior_distribution=bandit_prior,
@@ -1246,6 +1504,7 @@ def preprocess_bandits(
         weight_by_period=bandit_settings.weight_by_period,
         top_two=bandit_settings.top_two,
         min_variation_weight=bandit_settings.min_variation_weight,
+        best_arm_method=bandit_settings.best_arm_method,
         alpha=alpha,
         inverse=metric.inverse,
     )
@@ -1263,7 +1522,8 @@ def get_bandit_result(
     settings: AnalysisSettingsForStatsEngine,
     bandit_settings: BanditSettingsForStatsEngine,
 ) -> BanditResult:
-    single_variation_results = None
+    from gbstats.bayesian.bandits import get_error_bandit_result
+
     # "All" is a special dimension that gbstats can handle if there is no dimension
     # column specified
     b = preprocess_bandits(
@@ -1278,60 +1538,121 @@ def get_bandit_result(
                 reweight=bandit_settings.reweight,
                 current_weights=bandit_settings.current_weights,
             )
-        bandit_result = b.compute_result()
-        if bandit_result.ci:
-            single_variation_results = [
-                SingleVariationResult(n, mn, ci)
-                for n, mn, ci in zip(
-                    b.variation_counts,
-                    b.posterior_mean,
-                    bandit_result.ci,
-                )
-            ]
-            if not bandit_result.enough_units:
-                return get_error_bandit_result(
-                    single_variation_results=single_variation_results,
-                    update_message=bandit_result.bandit_update_message,
-                    error="",
-                    reweight=bandit_settings.reweight,
-                    current_weights=bandit_settings.current_weights,
-                )
-            if (
-                bandit_result.bandit_update_message == "successfully updated"
-                and bandit_result.bandit_weights
-            ):
-                weights_were_updated = (
-                    bandit_settings.current_weights != bandit_result.bandit_weights
-                    and bandit_settings.reweight
-                )
-                return BanditResult(
-                    singleVariationResults=single_variation_results,
-                    currentWeights=bandit_settings.current_weights,
-                    updatedWeights=(
-                        bandit_result.bandit_weights
-                        if bandit_settings.reweight
-                        else bandit_settings.current_weights
-                    ),
-                    bestArmProbabilities=bandit_result.best_arm_probabilities,
-                    seed=bandit_result.seed,
-                    updateMessage=bandit_result.bandit_update_message,
-                    error="",
-                    reweight=bandit_settings.reweight,
-                    weightsWereUpdated=weights_were_updated,
-                )
+        return bandit_result_from_response(b, b.compute_result(), bandit_settings)
+    return get_error_bandit_result(
+        single_variation_results=None,
+        update_message="not updated",
+        error="no data froms sql query matches dimension",
+        reweight=bandit_settings.reweight,
+        current_weights=bandit_settings.current_weights,
+    )
+
+
+@dataclass
+class BanditExperimentStatistics:
+    """Per-variation statistics of one bandit experiment's decision metric"""
+
+    stats: List[BanditStatistic]
+    metric: MetricSettingsForStatsEngine
+    bandit_settings: BanditSettingsForStatsEngine
+
+
+def get_bandit_results(
+    experiments: List[BanditExperimentStatistics], alpha: float = 0.05
+) -> List[BanditResult]:
+    """Reweight many bandit experiments at once.
+
+    Skips the per-experiment query row processing of get_bandit_result, and
+    samples all posteriors together; each result matches get_bandit_result
+    for the same statistics and seed.
+    """
+    from gbstats.bayesian.bandits import (
+        compute_bandit_responses,
+        get_error_bandit_result,
+    )
+
+    results: List[Optional[BanditResult]] = [None] * len(experiments)
+    bandits = []
+    indices = []
+    for i, e in enumerate(experiments):
+        if not e.stats or any(value is None for value in e.stats):
+            results[i] = get_error_bandit_result(
+                single_variation_results=None,
+                update_message="not updated",
+                error="not all statistics are instance of type BanditStatistic",
+                reweight=e.bandit_settings.reweight,
+                current_weights=e.bandit_settings.current_weights,
+            )
         else:
-            error_message = (
-                bandit_result.bandit_update_message
-                if bandit_result.bandit_update_message
-                else "unknown error in get_bandit_result"
+            bandits.append(create_bandit(e.stats, e.metric, e.bandit_settings, alpha))
+            indices.append(i)
+    for i, b, response in zip(indices, bandits, compute_bandit_responses(bandits)):
+        results[i] = bandit_result_from_response(
+            b, response, experiments[i].bandit_settings
+        )
+    return results  # type: ignore
+
+
+def bandit_result_from_response(
+    b: "Bandits",
+    bandit_result: "BanditResponse",
+    bandit_settings: BanditSettingsForStatsEngine,
+) -> BanditResult:
+    from gbstats.bayesian.bandits import get_error_bandit_result
+
+    if bandit_result.ci:
+        single_variation_results = [
+            SingleVariationResult(n, mn, ci)
+            for n, mn, ci in zip(
+                b.variation_counts,
+                b.posterior_mean,
+                bandit_result.ci,
             )
+        ]
+        if not bandit_result.enough_units:
             return get_error_bandit_result(
-                single_variation_results=None,
-                update_message="not updated",
-                error=error_message,
+                single_variation_results=single_variation_results,
+                update_message=bandit_result.bandit_update_message,
+                error="",
                 reweight=bandit_settings.reweight,
                 current_weights=bandit_settings.current_weights,
             )
+        if (
+            bandit_result.bandit_update_message == "successfully updated"
+            and bandit_result.bandit_weights
+        ):
+            weights_were_updated = (
+                bandit_settings.current_weights != bandit_result.bandit_weights
+                and bandit_settings.reweight
+            )
+            return BanditResult(
+                singleVariationResults=single_variation_results,
+                currentWeights=bandit_settings.current_weights,
+                updatedWeights=(
+                    bandit_result.bandit_weights
+                    if bandit_settings.reweight
+                    else bandit_settings.current_weights
+                ),
+                bestArmProbabilities=bandit_result.best_arm_probabilities,
+                seed=bandit_result.seed,
+                updateMessage=bandit_result.bandit_update_message,
+                error="",
+                reweight=bandit_settings.reweight,
+                weightsWereUpdated=weights_were_updated,
+            )
+    else:
+        error_message = (
+            bandit_result.bandit_update_message
+            if bandit_result.bandit_update_message
+            else "unknown error in get_bandit_result"
+        )
+        return get_error_bandit_result(
+            single_variation_results=None,
+            update_message="not updated",
+            error=error_message,
+            reweight=bandit_settings.reweight,
+            current_weights=bandit_settings.current_weights,
+        )
     return get_error_bandit_result(
         single_variation_results=None,
         update_message="not updated",
@@ -1371,11 +1692,67 @@ def process_data_dict(data: Dict[str, Any]) -> DataForStatsEngine:
     )
 
 
+def apply_p_value_corrections(
+    results: List[ExperimentMetricAnalysis],
+    analysis_indices: List[List[int]],
+    analyses: List[AnalysisSettingsForStatsEngine],
+    metrics: Dict[str, MetricSettingsForStatsEngine],
+) -> None:
+    """Sets pValueAdjusted and ciAdjusted in place on the goal metric results
+    of frequentist analyses with a p_value_correction, correcting across all
+    goal metrics, dimensions and variations of each analysis.
+
+    analysis_indices holds, for each result, the position in analyses of each
+    of its analyses, as some analyses are skipped for some metrics."""
+    # results of each goal metric keyed by analysis position
+    goal_results = [
+        dict(zip(indices, r.analyses))
+        for r, indices in zip(results, analysis_indices)
+        if r.metric in metrics
+        and "goal" in (metrics[r.metric].business_metric_type or [])
+    ]
+    for i, analysis in enumerate(analyses):
+        if analysis.stats_engine != "frequentist" or not analysis.p_value_correction:
+            continue
+        responses = [
+            v
+            for r in goal_results
+            if i in r
+            for dimension in r[i].dimensions
+            for v in dimension.variations
+            if isinstance(v, FrequentistVariationResponse) and v.pValue is not None
+        ]
+        if not responses:
+            continue
+        p_adjusted = adjust_p_values(
+            np.array([v.pValue for v in responses], dtype=float),
+            analysis.p_value_correction,
+        )
+        ci = np.array(
+            [[np.nan if c is None else c for c in v.ci] for v in responses],
+            dtype=float,
+        )
+        lower, upper = adjusted_confidence_intervals(
+            p_adjusted,
+            np.array([v.uplift.mean for v in responses], dtype=float),
+            ci[:, 0],
+            ci[:, 1],
+            analysis.alpha,
+        )
+        for v, p, lo, hi in zip(responses, p_adjusted, lower, upper):
+            v.pValueAdjusted = float(p)
+            v.ciAdjusted = (
+                None if v.ci[0] is None else float(lo),
+                None if v.ci[1] is None else float(hi),
+            )
+
+
 def process_experiment_results(
     data: Dict[str, Any]
 ) -> Tuple[List[ExperimentMetricAnalysis], Optional[BanditResult]]:
     d = process_data_dict(data)
     results: List[ExperimentMetricAnalysis] = []
+    analysis_indices: List[List[int]] = []
     bandit_result: Optional[BanditResult] = None
     for query_result in d.query_results:
         for i, metric in enumerate(query_result.metrics):
@@ -1383,6 +1760,9 @@ def process_experiment_results(
                 this_metric = d.metrics[metric]
                 rows = filter_query_rows(query_result.rows, i)
                 if len(rows):
+                    analysis_indices.append(
+                        get_analyzed_indices(rows, this_metric, d.analyses)
+                    )
                     if d.bandit_settings:
                         metric_settings_bandit = copy.deepcopy(this_metric)
                         # when using multi-period data, binomial is no longer iid and variance is wrong
@@ -1422,6 +1802,8 @@ def process_experiment_results(
                         )
 
     if d.bandit_settings and bandit_result is None:
+        from gbstats.bayesian.bandits import get_error_bandit_result
+
         bandit_result = get_error_bandit_result(
             single_variation_results=None,
             update_message="not updated",
@@ -1429,6 +1811,7 @@ def process_experiment_results(
             reweight=d.bandit_settings.reweight,
             current_weights=d.bandit_settings.current_weights,
         )
+    apply_p_value_corrections(results, analysis_indices, d.analyses, d.metrics)
     return results, bandit_result
 
 
@@ -0,0 +1,1931 @@
+import dataclasses
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+from pydantic.dataclasses import dataclass
+
+import numpy as np
+from functools import cached_property
+from gbstats.models.results import EffectMomentsResult
+from gbstats.messages import (
+    ZERO_NEGATIVE_VARIANCE_MESSAGE,
+    BASELINE_VARIATION_ZERO_MESSAGE,
+)
+from gbstats.models.statistics import (
+    ProportionStatistic,
+    SampleMeanStatistic,
+    RegressionAdjustedStatistic,
+    RegressionAdjustedRatioStatistic,
+    RatioStatistic,
+    SummableStatistic,
+    TestStatistic,
+    create_theta_adjusted_statistics,
+    proportion_covariance,
+    proportion_variance,
+    regression_adjusted_ratio_gradient,
+    regression_adjusted_variance,
+    sample_covariance,
+    sample_variance,
+)
+from gbstats.models.tests import EffectMoments, EffectMomentsConfig, sum_stats
+from gbstats.utils import (
+    multinomial_covariance,
+    invert_symmetric_matrix,
+    stacked_cholesky_gram,
+    delta_method_ratio_variance,
+)
+
+
+@dataclass
+class StrataResultCount:
+    n: int
+    effect: float
+    control_mean: float
+    effect_cov: float
+    control_mean_cov: float
+    effect_control_mean_cov: float
+    error_message: Optional[str]
+
+
+@dataclass
+class StrataResultRatio:
+    n: int
+    numerator_effect: float
+    numerator_control_mean: float
+    denominator_effect: float
+    denominator_control_mean: float
+    numerator_effect_cov: float
+    numerator_control_mean_cov: float
+    denominator_effect_cov: float
+    denominator_control_mean_cov: float
+    numerator_effect_numerator_control_mean_cov: float
+    numerator_effect_denominator_effect_cov: float
+    numerator_effect_denominator_control_mean_cov: float
+    numerator_control_mean_denominator_effect_cov: float
+    numerator_control_mean_denominator_control_mean_cov: float
+    denominator_effect_denominator_control_mean_cov: float
+    error_message: Optional[str]
+
+
+@dataclasses.dataclass
+class StrataMoments:
+    """
+    Strata results stacked over cells.
+    n: number of units in each cell.
+    alpha: num_cells x len(alpha) array; each row is the control mean and the
+        effect (numerator then denominator for ratio metrics).
+    alpha_cov: num_cells x len(alpha) x len(alpha) array of cell covariances.
+    """
+
+    n: np.ndarray
+    alpha: np.ndarray
+    alpha_cov: np.ndarray
+    error_message: Optional[str] = None
+
+    @property
+    def len_alpha(self) -> int:
+        return self.alpha.shape[1]
+
+    @staticmethod
+    def _default_output(error_message: Optional[str] = None) -> "StrataMoments":
+        return StrataMoments(
+            n=np.zeros((0,), dtype=int),
+            alpha=np.zeros((0, 0)),
+            alpha_cov=np.zeros((0, 0, 0)),
+            error_message=error_message,
+        )
+
+    @staticmethod
+    def from_strata_results(
+        strata_results: Sequence[Union[StrataResultCount, StrataResultRatio]]
+    ) -> "StrataMoments":
+        n = np.array([stat.n for stat in strata_results])
+        if isinstance(strata_results[0], StrataResultRatio):
+            ratio_results = [
+                stat for stat in strata_results if isinstance(stat, StrataResultRatio)
+            ]
+            return StrataMoments(
+                n=n,
+                alpha=np.array(
+                    [
+                        [
+                            stat.numerator_control_mean,
+                            stat.numerator_effect,
+                            stat.denominator_control_mean,
+                            stat.denominator_effect,
+                        ]
+                        for stat in ratio_results
+                    ]
+                ),
+                alpha_cov=np.array(
+                    [
+                        PostStratificationSummaryRatio.cell_covariance_ratio(stat)
+                        for stat in ratio_results
+                    ]
+                ),
+            )
+        count_results = [
+            stat for stat in strata_results if isinstance(stat, StrataResultCount)
+        ]
+        return StrataMoments(
+            n=n,
+            alpha=np.array(
+                [[stat.control_mean, stat.effect] for stat in count_results]
+            ),
+            alpha_cov=np.array(
+                [
+                    PostStratificationSummary.cell_covariance_count(stat)
+                    for stat in count_results
+                ]
+            ),
+        )
+
+
+COUNT_CONTRAST_MATRIX = np.array([[0, 1], [1, -1]])
+RATIO_CONTRAST_MATRIX = np.array(
+    [[0, 0, 1, 0], [1, 0, -1, 0], [0, 0, 0, 1], [0, 1, 0, -1]]
+)
+
+
+class CreateStrataResultBase(ABC):
+    def __init__(self, stat_a: TestStatistic, stat_b: TestStatistic):
+        self.stat_a = stat_a
+        self.stat_b = stat_b
+
+    @property
+    def n_a(self) -> int:
+        return self.stat_a.n
+
+    @property
+    def n_b(self) -> int:
+        return self.stat_b.n
+
+    @property
+    def n(self) -> int:
+        return self.n_a + self.n_b
+
+    def _has_zero_variance(self) -> bool:
+        """Check if any variance is 0 or negative"""
+        return self.stat_a._has_zero_variance or self.stat_b._has_zero_variance
+
+    @property
+    @abstractmethod
+    def len_alpha(self) -> int:
+        """
+        Number of alpha parameters
+        # 1 for count
+        # 2 for count CUPED
+        # 2 for ratio
+        # 4 for ratio CUPED
+        """
+        pass
+
+    @property
+    @abstractmethod
+    def contrast_matrix(self) -> np.ndarray:
+        pass
+
+    @staticmethod
+    def mean(contrast_matrix: np.ndarray, regression_coefs: np.ndarray) -> np.ndarray:
+        return contrast_matrix.dot(regression_coefs).ravel()
+
+    @abstractmethod
+    def compute_result(self) -> Union[StrataResultCount, StrataResultRatio]:
+        pass
+
+
+def merge_batched_and_cell_results(
+    cells: Sequence[CreateStrataResultBase],
+    batched: np.ndarray,
+    batched_moments: Optional[StrataMoments],
+) -> StrataMoments:
+    """Combine the cells solved together with the ones that need the per-cell
+    path (fallbacks and errors), keeping the original cell order."""
+    cell_results = []
+    for cell, is_batched in zip(cells, batched):
+        if not is_batched:
+            cell_result = cell.compute_result()
+            if cell_result.error_message is not None:
+                return StrataMoments._default_output(cell_result.error_message)
+            cell_results.append(cell_result)
+    if batched_moments is None:
+        return StrataMoments.from_strata_results(cell_results)
+    if not cell_results:
+        return batched_moments
+    cell_moments = StrataMoments.from_strata_results(cell_results)
+    len_alpha = batched_moments.len_alpha
+    n = np.empty(len(cells), dtype=batched_moments.n.dtype)
+    alpha = np.empty((len(cells), len_alpha))
+    alpha_cov = np.empty((len(cells), len_alpha, len_alpha))
+    for merged, batched_value, cell_value in [
+        (n, batched_moments.n, cell_moments.n),
+        (alpha, batched_moments.alpha, cell_moments.alpha),
+        (alpha_cov, batched_moments.alpha_cov, cell_moments.alpha_cov),
+    ]:
+        merged[batched] = batched_value
+        merged[~batched] = cell_value
+    return StrataMoments(n=n, alpha=alpha, alpha_cov=alpha_cov)
+
+
+# Algorithm 1 for count metrics
+class CreateStrataResult(CreateStrataResultBase):
+    def __init__(
+        self,
+        stat_a: Union[ProportionStatistic, SampleMeanStatistic],
+        stat_b: Union[ProportionStatistic, SampleMeanStatistic],
+    ):
+        self.stat_a = stat_a
+        self.stat_b = stat_b
+
+    @property
+    def len_alpha(self) -> int:
+        return 1
+
+    @staticmethod
+    def compute_regression_coefs_covariance(
+        len_alpha: int,
+        n: int,
+        n_a: int,
+        n_b: int,
+        lambda_a: np.ndarray,
+        lambda_b: np.ndarray,
+    ) -> np.ndarray:
+        nrow_v = 2 * len_alpha
+        v = np.zeros((nrow_v, nrow_v))
+        v[0:len_alpha, 0:len_alpha] = lambda_b * n / n_b
+        v[len_alpha : (2 * len_alpha), len_alpha : (2 * len_alpha)] = lambda_a * n / n_a
+        return v
+
+    @property
+    def lambda_a(self) -> np.ndarray:
+        return np.array([self.stat_a.variance])
+
+    @property
+    def lambda_b(self) -> np.ndarray:
+        return np.array([self.stat_b.variance])
+
+    @property
+    def contrast_matrix(self) -> np.ndarray:
+        return COUNT_CONTRAST_MATRIX
+
+    @staticmethod
+    def covariance_unadjusted(
+        contrast_matrix: np.ndarray, regression_coefs_covariance: np.ndarray
+    ) -> np.ndarray:
+        return contrast_matrix.dot(regression_coefs_covariance).dot(contrast_matrix.T)
+
+    @staticmethod
+    def _default_output(
+        error_message: Optional[str] = None,
+    ) -> StrataResultCount:
+        """Return uninformative output when AB test analysis can't be performed
+        adequately
+        """
+        return StrataResultCount(
+            n=0,
+            effect=0,
+            control_mean=0,
+            effect_cov=0,
+            control_mean_cov=0,
+            effect_control_mean_cov=0,
+            error_message=error_message,
+        )
+
+    @staticmethod
+    def stacked_moments(
+        contrast_matrix: np.ndarray,
+        regression_coefs: np.ndarray,
+        n_a: np.ndarray,
+        n_b: np.ndarray,
+        lambda_a: np.ndarray,
+        lambda_b: np.ndarray,
+    ) -> StrataMoments:
+        """Algorithm 1 for all cells at once.
+        regression_coefs is num_cells x 2 len(alpha), lambda_a and lambda_b are
+        num_cells x len(alpha) x len(alpha).
+        """
+        len_alpha = lambda_a.shape[1]
+        n = n_a + n_b
+        v = np.zeros((len(n), 2 * len_alpha, 2 * len_alpha))
+        v[:, 0:len_alpha, 0:len_alpha] = (
+            lambda_b * n[:, None, None] / n_b[:, None, None]
+        )
+        v[:, len_alpha:, len_alpha:] = lambda_a * n[:, None, None] / n_a[:, None, None]
+        return StrataMoments(
+            n=n,
+            alpha=np.einsum("ij,cj->ci", contrast_matrix, regression_coefs),
+            alpha_cov=np.einsum("ij,cjk,lk->cil", contrast_matrix, v, contrast_matrix),
+        )
+
+    @staticmethod
+    def compute_moments(
+        stats: Sequence[
+            Tuple[
+                Union[ProportionStatistic, SampleMeanStatistic],
+                Union[ProportionStatistic, SampleMeanStatistic],
+            ]
+        ]
+    ) -> StrataMoments:
+        if any(
+            stat_a._has_zero_variance or stat_b._has_zero_variance
+            for stat_a, stat_b in stats
+        ):
+            return StrataMoments._default_output(ZERO_NEGATIVE_VARIANCE_MESSAGE)
+        return CreateStrataResult.stacked_moments(
+            COUNT_CONTRAST_MATRIX,
+            regression_coefs=np.array(
+                [[stat_b.mean, stat_a.mean] for stat_a, stat_b in stats]
+            ),
+            n_a=np.array([stat_a.n for stat_a, _ in stats]),
+            n_b=np.array([stat_b.n for _, stat_b in stats]),
+            lambda_a=np.array([[[stat_a.variance]] for stat_a, _ in stats]),
+            lambda_b=np.array([[[stat_b.variance]] for _, stat_b in stats]),
+        )
+
+    def compute_result(self) -> StrataResultCount:
+        if self._has_zero_variance():
+            return self._default_output(error_message=ZERO_NEGATIVE_VARIANCE_MESSAGE)
+        regression_coefs = np.array([self.stat_b.mean, self.stat_a.mean])
+        regression_coefs_covariance = (
+            CreateStrataResult.compute_regression_coefs_covariance(
+                self.len_alpha, self.n, self.n_a, self.n_b, self.lambda_a, self.lambda_b
+            )
+        )
+        mean = self.mean(self.contrast_matrix, regression_coefs)
+        covariance = self.covariance_unadjusted(
+            self.contrast_matrix, regression_coefs_covariance
+        )
+        return StrataResultCount(
+            n=self.n,
+            effect=mean[1],
+            effect_cov=covariance[1, 1],
+            control_mean=mean[0],
+            control_mean_cov=covariance[0, 0],
+            effect_control_mean_cov=covariance[0, 1],
+            error_message=None,
+        )
+
+
+# Regression version of Algorithm 1 for count metrics
+class CreateStrataResultRegressionAdjusted(CreateStrataResultBase):
+    def __init__(
+        self,
+        stat_a: RegressionAdjustedStatistic,
+        stat_b: RegressionAdjustedStatistic,
+    ):
+        self.stat_a = stat_a
+        self.stat_b = stat_b
+
+    @property
+    def len_alpha(self) -> int:
+        return 2
+
+    @property
+    def len_gamma(self) -> int:
+        return 3
+
+    @property
+    def xtx(self) -> np.ndarray:
+        xtx = np.zeros((self.len_gamma, self.len_gamma))
+        xtx[0, 0] = self.n_a + self.n_b
+        xtx[1, 1] = self.n_b
+        xtx[2, 2] = (
+            self.stat_a.pre_statistic.sum_squares
+            + self.stat_b.pre_statistic.sum_squares
+        )
+        xtx[0, 1] = xtx[1, 0] = xtx[1, 1]
+        xtx[0, 2] = xtx[2, 0] = (
+            self.stat_a.pre_statistic.sum + self.stat_b.pre_statistic.sum
+        )
+        xtx[1, 2] = xtx[2, 1] = self.stat_b.pre_statistic.sum
+        return xtx
+
+    @property
+    def baseline_mean(self) -> float:
+        statistic_pre = self.stat_a.pre_statistic + self.stat_b.pre_statistic
+        return statistic_pre.mean
+
+    @property
+    def baseline_variance(self) -> float:
+        statistic_pre = self.stat_a.pre_statistic + self.stat_b.pre_statistic
+        return statistic_pre.variance
+
+    @staticmethod
+    def contrast_matrix_estimated_mean(
+        contrast_matrix: np.ndarray, i: int
+    ) -> np.ndarray:
+        return np.expand_dims(contrast_matrix[i, :], axis=1)
+
+    @staticmethod
+    def contrast_matrix_covariance(
+        len_gamma: int, n: int, baseline_variance: float, i: int, j: int
+    ) -> np.ndarray:
+        v = np.zeros((len_gamma, len_gamma))
+        if i == 0 and j == 0:
+            v[2, 2] = baseline_variance / n
+        return v
+
+    @staticmethod
+    def contrast_matrix_second_moment(
+        contrast_matrix: np.ndarray,
+        len_gamma: int,
+        n: int,
+        baseline_variance: float,
+        i: int,
+        j: int,
+    ) -> np.ndarray:
+        m_i = CreateStrataResultRegressionAdjusted.contrast_matrix_estimated_mean(
+            contrast_matrix, i
+        )
+        m_j = CreateStrataResultRegressionAdjusted.contrast_matrix_estimated_mean(
+            contrast_matrix, j
+        )
+        return CreateStrataResultRegressionAdjusted.contrast_matrix_covariance(
+            len_gamma, n, baseline_variance, i, j
+        ) + m_i.dot(m_j.T)
+
+    @property
+    def contrast_matrix(self) -> np.ndarray:
+        m = np.zeros((2, 3))
+        m[0, :] = [1, 0, self.baseline_mean]
+        m[1, :] = [0, 1, 0]
+        return m
+
+    @staticmethod
+    def create_coef_covariance(sigma: np.ndarray, xtx_inv: np.ndarray) -> np.ndarray:
+        return np.kron(sigma, xtx_inv)
+
+    @staticmethod
+    def covariance_adjusted(
+        n: int,
+        coef_covariance: np.ndarray,
+        contrast_matrix: np.ndarray,
+        regression_coefs: np.ndarray,
+        baseline_variance: float,
+    ) -> np.ndarray:
+        len_alpha = contrast_matrix.shape[0]
+        len_gamma = regression_coefs.shape[0]
+        v_alpha = np.zeros((len_alpha, len_alpha))
+        for i in range(len_alpha):
+            for j in range(i + 1):
+                sum_1 = sum(
+                    np.diag(
+                        coef_covariance.dot(
+                            CreateStrataResultRegressionAdjusted.contrast_matrix_second_moment(
+                                contrast_matrix, len_gamma, n, baseline_variance, i, j
+                            )
+                        )
+                    )
+                )
+                coefs = np.expand_dims(regression_coefs, axis=1)
+                sum_2 = sum(
+                    np.diag(
+                        coefs.dot(coefs.T).dot(
+                            CreateStrataResultRegressionAdjusted.contrast_matrix_covariance(
+                                len_gamma, n, baseline_variance, i, j
+                            )
+                        )
+                    )
+                )
+                v_alpha[i, j] = sum_1 + sum_2
+                v_alpha[j, i] = v_alpha[i, j]
+        return float(n) * v_alpha
+
+    def _baseline_covariance_zero(self) -> bool:
+        return (
+            self.stat_a.pre_statistic.variance <= 0
+            or self.stat_b.pre_statistic.variance <= 0
+        )
+
+    @staticmethod
+    def solve_stacked(
+        cells: Sequence["CreateStrataResultRegressionAdjusted"],
+    ) -> Optional[StrataMoments]:
+        """Fit the regressions of all cells together.
+
+        Every quantity needed is a quadratic form in inv(xtx), so they are read
+        off one Gram matrix of the Cholesky-solved right-hand sides
+        [xty, contrast_matrix.T, e_2] instead of inverting xtx and forming
+        the Kronecker product of the coefficient covariance. Returns None if
+        any xtx is not positive-definite.
+        """
+
+        def stacked(values) -> np.ndarray:
+            return np.array(list(values), dtype=float)
+
+        n_a = np.array([cell.n_a for cell in cells])
+        n_b = np.array([cell.n_b for cell in cells])
+        n = n_a + n_b
+        pre_a = [cell.stat_a.pre_statistic for cell in cells]
+        pre_b = [cell.stat_b.pre_statistic for cell in cells]
+        pre_n = stacked(a.n + b.n for a, b in zip(pre_a, pre_b))
+        pre_sum_b = stacked(b.sum for b in pre_b)
+        pre_sum = stacked(a.sum for a in pre_a) + pre_sum_b
+        pre_sum_squares = stacked(
+            a.sum_squares + b.sum_squares for a, b in zip(pre_a, pre_b)
+        )
+        post_sum_b = stacked(cell.stat_b.post_statistic.sum for cell in cells)
+        post_sum = (
+            stacked(cell.stat_a.post_statistic.sum for cell in cells) + post_sum_b
+        )
+        post_sum_squares = stacked(
+            cell.stat_a.post_statistic.sum_squares
+            + cell.stat_b.post_statistic.sum_squares
+            for cell in cells
+        )
+        post_pre_sum_of_products = stacked(
+            cell.stat_a.post_pre_sum_of_products + cell.stat_b.post_pre_sum_of_products
+            for cell in cells
+        )
+        baseline_mean = pre_sum / pre_n
+        baseline_variance = (pre_sum_squares - pre_sum**2 / pre_n) / (pre_n - 1)
+
+        xtx = np.zeros((len(cells), 3, 3))
+        xtx[:, 0, 0] = n
+        xtx[:, 1, 1] = n_b
+        xtx[:, 2, 2] = pre_sum_squares
+        xtx[:, 0, 1] = xtx[:, 1, 0] = n_b
+        xtx[:, 0, 2] = xtx[:, 2, 0] = pre_sum
+        xtx[:, 1, 2] = xtx[:, 2, 1] = pre_sum_b
+        rhs = np.zeros((len(cells), 3, 4))
+        rhs[:, :, 0] = np.stack([post_sum, post_sum_b, post_pre_sum_of_products], 1)
+        # contrast_matrix.T
+        rhs[:, 0, 1] = 1
+        rhs[:, 2, 1] = baseline_mean
+        rhs[:, 1, 2] = 1
+        rhs[:, 2, 3] = 1
+        gram = stacked_cholesky_gram(xtx, rhs)
+        if gram is None:
+            return None
+
+        sigma = (post_sum_squares - gram[:, 0, 0]) / (n - 3)
+        gamma_pre = gram[:, 3, 0]
+        coef_covariance_pre = sigma * gram[:, 3, 3]
+        v_alpha = sigma[:, None, None] * gram[:, 1:3, 1:3]
+        v_alpha[:, 0, 0] += (coef_covariance_pre + gamma_pre**2) * baseline_variance / n
+        return StrataMoments(
+            n=n,
+            alpha=gram[:, 1:3, 0],
+            alpha_cov=n[:, None, None] * v_alpha,
+        )
+
+    @staticmethod
+    def compute_moments(
+        stats: Sequence[Tuple[RegressionAdjustedStatistic, RegressionAdjustedStatistic]]
+    ) -> StrataMoments:
+        cells = [
+            CreateStrataResultRegressionAdjusted(stat_a, stat_b)
+            for stat_a, stat_b in stats
+        ]
+        # cells that error or fall back to the unadjusted estimate go one at a time
+        batched = np.array(
+            [
+                not cell._has_zero_variance() and not cell._baseline_covariance_zero()
+                for cell in cells
+            ]
+        )
+        batched_moments = None
+        if batched.any():
+            batched_moments = CreateStrataResultRegressionAdjusted.solve_stacked(
+                [cell for cell, is_batched in zip(cells, batched) if is_batched]
+            )
+            if batched_moments is None:
+                batched[:] = False
+        return merge_batched_and_cell_results(cells, batched, batched_moments)
+
+    def compute_result(self) -> StrataResultCount:
+        if self._has_zero_variance():
+            return CreateStrataResult._default_output(
+                error_message=ZERO_NEGATIVE_VARIANCE_MESSAGE
+            )
+        if self._baseline_covariance_zero():
+            stat_a = SampleMeanStatistic(
+                n=self.stat_a.n,
+                sum=self.stat_a.post_statistic.sum,
+                sum_squares=self.stat_a.post_statistic.sum_squares,
+            )
+            stat_b = SampleMeanStatistic(
+                n=self.stat_b.n,
+                sum=self.stat_b.post_statistic.sum,
+                sum_squares=self.stat_b.post_statistic.sum_squares,
+            )
+            return CreateStrataResult(stat_a, stat_b).compute_result()
+
+        xtx_inv_result = invert_symmetric_matrix(self.xtx)
+        if xtx_inv_result.success and xtx_inv_result.inverse is not None:
+            xtx_inv = xtx_inv_result.inverse
+        else:
+            return CreateStrataResult._default_output(
+                error_message=xtx_inv_result.error
+            )
+
+        xty = np.array(
+            [
+                self.stat_a.post_statistic.sum + self.stat_b.post_statistic.sum,
+                self.stat_b.post_statistic.sum,
+                self.stat_a.post_pre_sum_of_products
+                + self.stat_b.post_pre_sum_of_products,
+            ]
+        )
+        regression_coefs = xtx_inv.dot(xty)
+        # covariance matrix, 1 x 1 in this case
+        resids_part_1 = (
+            self.stat_a.post_statistic.sum_squares
+            + self.stat_b.post_statistic.sum_squares
+        )
+        resids_part_2 = -xty.T.dot(xtx_inv).dot(xty)
+        sigma = np.array((resids_part_1 + resids_part_2) / (self.n - 3))
+        coef_covariance = self.create_coef_covariance(sigma, xtx_inv)
+        mean = self.mean(self.contrast_matrix, regression_coefs)
+        covariance = self.covariance_adjusted(
+            self.n,
+            coef_covariance,
+            self.contrast_matrix,
+            regression_coefs,
+            self.baseline_variance,
+        )
+        return StrataResultCount(
+            n=self.n,
+            effect=mean[1],
+            effect_cov=covariance[1, 1],
+            control_mean=mean[0],
+            control_mean_cov=covariance[0, 0],
+            effect_control_mean_cov=covariance[0, 1],
+            error_message=None,
+        )
+
+
+# Algorithm 1 for ratio metrics
+class CreateStrataResultRatio(CreateStrataResultBase):
+    def __init__(
+        self,
+        stat_a: RatioStatistic,
+        stat_b: RatioStatistic,
+    ):
+        self.stat_a = stat_a
+        self.stat_b = stat_b
+
+    @property
+    def len_alpha(self) -> int:
+        return 2
+
+    @property
+    def lambda_a(self) -> np.ndarray:
+        return np.array(
+            [
+                self.stat_a.m_statistic.variance,
+                self.stat_a.covariance,
+                self.stat_a.covariance,
+                self.stat_a.d_statistic.variance,
+            ]
+        ).reshape(self.len_alpha, self.len_alpha)
+
+    @property
+    def lambda_b(self) -> np.ndarray:
+        return np.array(
+            [
+                self.stat_b.m_statistic.variance,
+                self.stat_b.covariance,
+                self.stat_b.covariance,
+                self.stat_b.d_statistic.variance,
+            ]
+        ).reshape(self.len_alpha, self.len_alpha)
+
+    @property
+    def contrast_matrix(self) -> np.ndarray:
+        return RATIO_CONTRAST_MATRIX
+
+    @staticmethod
+    def _default_output(
+        error_message: Optional[str] = None,
+    ) -> StrataResultRatio:
+        """Return uninformative output when AB test analysis can't be performed
+        adequately
+        """
+        return StrataResultRatio(
+            n=0,
+            numerator_effect=0,
+            numerator_control_mean=0,
+            denominator_effect=0,
+            denominator_control_mean=0,
+            numerator_effect_cov=0,
+            numerator_control_mean_cov=0,
+            denominator_effect_cov=0,
+            denominator_control_mean_cov=0,
+            numerator_effect_numerator_control_mean_cov=0,
+            numerator_effect_denominator_effect_cov=0,
+            numerator_effect_denominator_control_mean_cov=0,
+            numerator_control_mean_denominator_effect_cov=0,
+            numerator_control_mean_denominator_control_mean_cov=0,
+            denominator_effect_denominator_control_mean_cov=0,
+            error_message=error_message,
+        )
+
+    @staticmethod
+    def get_result_object(
+        n: int, mean: np.ndarray, covariance: np.ndarray
+    ) -> StrataResultRatio:
+        return StrataResultRatio(
+            n=n,
+            numerator_control_mean=mean[0],
+            numerator_effect=mean[1],
+            denominator_control_mean=mean[2],
+            denominator_effect=mean[3],
+            numerator_control_mean_cov=covariance[0, 0],
+            numerator_effect_cov=covariance[1, 1],
+            denominator_control_mean_cov=covariance[2, 2],
+            denominator_effect_cov=covariance[3, 3],
+            numerator_effect_numerator_control_mean_cov=covariance[1, 0],
+            numerator_effect_denominator_control_mean_cov=covariance[1, 2],
+            numerator_effect_denominator_effect_cov=covariance[1, 3],
+            numerator_control_mean_denominator_effect_cov=covariance[0, 3],
+            numerator_control_mean_denominator_control_mean_cov=covariance[0, 2],
+            denominator_effect_denominator_control_mean_cov=covariance[2, 3],
+            error_message=None,
+        )
+
+    @staticmethod
+    def lambda_stacked(stats: Sequence[RatioStatistic]) -> np.ndarray:
+        return np.array(
+            [
+                [
+                    [stat.m_statistic.variance, stat.covariance],
+                    [stat.covariance, stat.d_statistic.variance],
+                ]
+                for stat in stats
+            ]
+        )
+
+    @staticmethod
+    def compute_moments(
+        stats: Sequence[Tuple[RatioStatistic, RatioStatistic]]
+    ) -> StrataMoments:
+        if any(
+            stat_a._has_zero_variance or stat_b._has_zero_variance
+            for stat_a, stat_b in stats
+        ):
+            return StrataMoments._default_output(ZERO_NEGATIVE_VARIANCE_MESSAGE)
+        stats_a = [stat_a for stat_a, _ in stats]
+        stats_b = [stat_b for _, stat_b in stats]
+        return CreateStrataResult.stacked_moments(
+            RATIO_CONTRAST_MATRIX,
+            regression_coefs=np.array(
+                [
+                    [
+                        stat_b.m_statistic.mean,
+                        stat_b.d_statistic.mean,
+                        stat_a.m_statistic.mean,
+                        stat_a.d_statistic.mean,
+                    ]
+                    for stat_a, stat_b in stats
+                ]
+            ),
+            n_a=np.array([stat.n for stat in stats_a]),
+            n_b=np.array([stat.n for stat in stats_b]),
+            lambda_a=CreateStrataResultRatio.lambda_stacked(stats_a),
+            lambda_b=CreateStrataResultRatio.lambda_stacked(stats_b),
+        )
+
+    def compute_result(self) -> StrataResultRatio:
+        if self._has_zero_variance():
+            return self._default_output(error_message=ZERO_NEGATIVE_VARIANCE_MESSAGE)
+
+        regression_coefs = np.array(
+            [
+                self.stat_b.m_statistic.mean,
+                self.stat_b.d_statistic.mean,
+                self.stat_a.m_statistic.mean,
+                self.stat_a.d_statistic.mean,
+            ]
+        )
+        regression_coefs_covariance = (
+            CreateStrataResult.compute_regression_coefs_covariance(
+                self.len_alpha, self.n, self.n_a, self.n_b, self.lambda_a, self.lambda_b
+            )
+        )
+        mean = self.mean(self.contrast_matrix, regression_coefs)
+        covariance = CreateStrataResult.covariance_unadjusted(
+            self.contrast_matrix, regression_coefs_covariance
+        )
+        return self.get_result_object(self.n, mean, covariance)
+
+
+# Regression version of Algorithm 1 for ratio metrics
+class CreateStrataResultRegressionAdjustedRatio(CreateStrataResultBase):
+    def __init__(
+        self,
+        stat_a: RegressionAdjustedRatioStatistic,
+        stat_b: RegressionAdjustedRatioStatistic,
+    ):
+        self.stat_a = stat_a
+        self.stat_b = stat_b
+
+    @property
+    def len_alpha(self) -> int:
+        return 4
+
+    @property
+    def len_gamma(self) -> int:
+        return 8
+
+    @property
+    def xtx(self) -> np.ndarray:
+        xtx = np.zeros((4, 4))
+        xtx[0, 0] = self.n_a + self.n_b
+        xtx[1, 1] = self.n_b
+        xtx[2, 2] = (
+            self.stat_a.m_statistic_pre.sum_squares
+            + self.stat_b.m_statistic_pre.sum_squares
+        )
+        xtx[3, 3] = (
+            self.stat_a.d_statistic_pre.sum_squares
+            + self.stat_b.d_statistic_pre.sum_squares
+        )
+        xtx[0, 1] = xtx[1, 0] = xtx[1, 1]
+        xtx[0, 2] = xtx[2, 0] = (
+            self.stat_a.m_statistic_pre.sum + self.stat_b.m_statistic_pre.sum
+        )
+        xtx[0, 3] = xtx[3, 0] = (
+            self.stat_a.d_statistic_pre.sum + self.stat_b.d_statistic_pre.sum
+        )
+        xtx[1, 2] = xtx[2, 1] = self.stat_b.m_statistic_pre.sum
+        xtx[1, 3] = xtx[3, 1] = self.stat_b.d_statistic_pre.sum
+        xtx[2, 3] = xtx[3, 2] = (
+            self.stat_a.m_pre_d_pre_sum_of_products
+            + self.stat_b.m_pre_d_pre_sum_of_products
+        )
+        return xtx
+
+    @property
+    def xty_numerator(self) -> np.ndarray:
+        xty = np.zeros((4, 1))
+        xty[0] = self.stat_a.m_statistic_post.sum + self.stat_b.m_statistic_post.sum
+        xty[1] = self.stat_b.m_statistic_post.sum
+        xty[2] = (
+            self.stat_a.m_post_m_pre_sum_of_products
+            + self.stat_b.m_post_m_pre_sum_of_products
+        )
+        xty[3] = (
+            self.stat_a.m_post_d_pre_sum_of_products
+            + self.stat_b.m_post_d_pre_sum_of_products
+        )
+        return xty
+
+    @property
+    def xty_denominator(self) -> np.ndarray:
+        xty = np.zeros((4, 1))
+        xty[0] = self.stat_a.d_statistic_post.sum + self.stat_b.d_statistic_post.sum
+        xty[1] = self.stat_b.d_statistic_post.sum
+        xty[2] = (
+            self.stat_a.m_pre_d_post_sum_of_products
+            + self.stat_b.m_pre_d_post_sum_of_products
+        )
+        xty[3] = (
+            self.stat_a.d_post_d_pre_sum_of_products
+            + self.stat_b.d_post_d_pre_sum_of_products
+        )
+        return xty
+
+    @staticmethod
+    def compute_sigma(
+        stat_a: RegressionAdjustedRatioStatistic,
+        stat_b: RegressionAdjustedRatioStatistic,
+        xty_numerator: np.ndarray,
+        xty_denominator: np.ndarray,
+        xtx: np.ndarray,
+        xtx_inv: np.ndarray,
+        n: int,
+    ) -> np.ndarray:
+        n = stat_a.n + stat_b.n
+        gammahat_numerator = xtx_inv.dot(xty_numerator)
+        gammahat_denominator = xtx_inv.dot(xty_denominator)
+        resids_part_1 = (
+            stat_a.m_statistic_post.sum_squares + stat_b.m_statistic_post.sum_squares
+        )
+        resids_part_2 = -xty_numerator.T.dot(xtx_inv).dot(xty_numerator)
+        sigma_1_1 = (resids_part_1 + resids_part_2) / (n - 6)
+
+        resids_part_1 = (
+            stat_a.d_statistic_post.sum_squares + stat_b.d_statistic_post.sum_squares
+        )
+        resids_part_2 = -xty_denominator.T.dot(xtx_inv).dot(xty_denominator)
+        sigma_2_2 = (resids_part_1 + resids_part_2) / (n - 6)
+        resids_part_1 = (
+            stat_a.m_post_d_post_sum_of_products + stat_b.m_post_d_post_sum_of_products
+        )
+        resids_part_2 = -xty_numerator.T.dot(gammahat_denominator)
+        resids_part_3 = -xty_denominator.T.dot(gammahat_numerator)
+        resids_part_4 = gammahat_numerator.T.dot(xtx).dot(gammahat_denominator)
+        sigma_1_2 = (resids_part_1 + resids_part_2 + resids_part_3 + resids_part_4) / (
+            n - 6
+        )
+        return np.array([[sigma_1_1, sigma_1_2], [sigma_1_2, sigma_2_2]]).reshape(2, 2)
+
+    @property
+    def baseline_mean_numerator(self) -> float:
+        m_statistic_pre = self.stat_a.m_statistic_pre + self.stat_b.m_statistic_pre
+        return m_statistic_pre.mean
+
+    @property
+    def baseline_mean_denominator(self) -> float:
+        d_statistic_pre = self.stat_a.d_statistic_pre + self.stat_b.d_statistic_pre
+        return d_statistic_pre.mean
+
+    @property
+    def baseline_variance_numerator(self) -> float:
+        m_statistic_pre = self.stat_a.m_statistic_pre + self.stat_b.m_statistic_pre
+        return m_statistic_pre.variance
+
+    @property
+    def baseline_variance_denominator(self) -> float:
+        d_statistic_pre = self.stat_a.d_statistic_pre + self.stat_b.d_statistic_pre
+        return d_statistic_pre.variance
+
+    @property
+    def baseline_covariance(self) -> float:
+        stat_combined = self.stat_a + self.stat_b
+        return stat_combined.cov_m_pre_d_pre
+
+    @property
+    def contrast_matrix(self) -> np.ndarray:
+        m = np.zeros((4, 8))
+        m[0, :] = [
+            1,
+            0,
+            self.baseline_mean_numerator,
+            self.baseline_mean_denominator,
+            0,
+            0,
+            0,
+            0,
+        ]
+        m[1, :] = [0, 1, 0, 0, 0, 0, 0, 0]
+        m[2, :] = [
+            0,
+            0,
+            0,
+            0,
+            1,
+            0,
+            self.baseline_mean_numerator,
+            self.baseline_mean_denominator,
+        ]
+        m[3, :] = [0, 0, 0, 0, 0, 1, 0, 0]
+        return m
+
+    def contrast_matrix_covariance(self, i: int, j: int) -> np.ndarray:
+        v = np.zeros((self.len_gamma, self.len_gamma))
+        if i == 0 and j == 0:
+            v[2, 2] = self.baseline_variance_numerator / self.n
+            v[3, 3] = self.baseline_variance_denominator / self.n
+            v[2, 3] = v[3, 2] = self.baseline_covariance / self.n
+
+        if i == 2 and j == 2:
+            v[6, 6] = self.baseline_variance_numerator / self.n
+            v[7, 7] = self.baseline_variance_denominator / self.n
+            v[6, 7] = v[7, 6] = self.baseline_covariance / self.n
+
+        if i == 0 and j == 2:
+            v[2, 6] = self.baseline_variance_numerator / self.n
+            v[3, 7] = self.baseline_variance_denominator / self.n
+            v[2, 7] = v[3, 6] = self.baseline_covariance / self.n
+
+        if i == 2 and j == 0:
+            v[6, 2] = self.baseline_variance_numerator / self.n
+            v[7, 3] = self.baseline_variance_denominator / self.n
+            v[7, 2] = v[6, 3] = self.baseline_covariance / self.n
+
+        return v
+
+    def _baseline_covariance_zero(self) -> bool:
+        m_check = (
+            self.stat_a.m_statistic_pre.variance <= 0
+            or self.stat_b.m_statistic_pre.variance <= 0
+        )
+        d_check = (
+            self.stat_a.d_statistic_pre.variance <= 0
+            or self.stat_b.d_statistic_pre.variance <= 0
+        )
+        return m_check or d_check
+
+    def contrast_matrix_second_moment(self, i: int, j: int) -> np.ndarray:
+        m_i = CreateStrataResultRegressionAdjusted.contrast_matrix_estimated_mean(
+            self.contrast_matrix, i
+        )
+        m_j = CreateStrataResultRegressionAdjusted.contrast_matrix_estimated_mean(
+            self.contrast_matrix, j
+        )
+        return self.contrast_matrix_covariance(i, j) + m_i.dot(m_j.T)
+
+    def covariance(
+        self, regression_coefs: np.ndarray, coef_covariance: np.ndarray
+    ) -> np.ndarray:
+        v_alpha = np.zeros((self.len_alpha, self.len_alpha))
+        for i in range(self.len_alpha):
+            for j in range(i + 1):
+                sum_1 = sum(
+                    np.diag(
+                        coef_covariance.dot(self.contrast_matrix_second_moment(i, j))
+                    )
+                )
+                sum_2 = sum(
+                    np.diag(
+                        regression_coefs.dot(regression_coefs.T).dot(
+                            self.contrast_matrix_covariance(i, j)
+                        )
+                    )
+                )
+                v_alpha[i, j] = sum_1 + sum_2
+                v_alpha[j, i] = v_alpha[i, j]
+        return float(self.n) * v_alpha
+
+    @staticmethod
+    def solve_stacked(
+        cells: Sequence["CreateStrataResultRegressionAdjustedRatio"],
+    ) -> Optional[StrataMoments]:
+        """Fit the numerator and denominator regressions of all cells together.
+
+        As for count metrics, the coefficients, residual covariance and
+        contrasts are quadratic forms in inv(xtx), read off the Gram matrix of
+        the Cholesky-solved right-hand sides
+        [xty_numerator, xty_denominator, m.T, e_2, e_3], where m is the 2 x 4
+        block of the contrast matrix. Returns None if any xtx is not
+        positive-definite.
+        """
+
+        def stacked(values) -> np.ndarray:
+            return np.array(list(values), dtype=float)
+
+        def summed(attribute: str) -> np.ndarray:
+            return stacked(
+                getattr(cell.stat_a, attribute) + getattr(cell.stat_b, attribute)
+                for cell in cells
+            )
+
+        n_a = np.array([cell.n_a for cell in cells])
+        n_b = np.array([cell.n_b for cell in cells])
+        n = n_a + n_b
+        m_pre = [
+            cell.stat_a.m_statistic_pre + cell.stat_b.m_statistic_pre for cell in cells
+        ]
+        d_pre = [
+            cell.stat_a.d_statistic_pre + cell.stat_b.d_statistic_pre for cell in cells
+        ]
+        m_pre_n = stacked(stat.n for stat in m_pre)
+        d_pre_n = stacked(stat.n for stat in d_pre)
+        m_pre_sum = stacked(stat.sum for stat in m_pre)
+        d_pre_sum = stacked(stat.sum for stat in d_pre)
+        m_pre_sum_squares = stacked(stat.sum_squares for stat in m_pre)
+        d_pre_sum_squares = stacked(stat.sum_squares for stat in d_pre)
+        m_pre_d_pre = summed("m_pre_d_pre_sum_of_products")
+        m_post_sum = stacked(
+            cell.stat_a.m_statistic_post.sum + cell.stat_b.m_statistic_post.sum
+            for cell in cells
+        )
+        d_post_sum = stacked(
+            cell.stat_a.d_statistic_post.sum + cell.stat_b.d_statistic_post.sum
+            for cell in cells
+        )
+        m_post_sum_squares = stacked(
+            cell.stat_a.m_statistic_post.sum_squares
+            + cell.stat_b.m_statistic_post.sum_squares
+            for cell in cells
+        )
+        d_post_sum_squares = stacked(
+            cell.stat_a.d_statistic_post.sum_squares
+            + cell.stat_b.d_statistic_post.sum_squares
+            for cell in cells
+        )
+
+        baseline_mean_numerator = m_pre_sum / m_pre_n
+        baseline_mean_denominator = d_pre_sum / d_pre_n
+        baseline_variance = np.zeros((len(cells), 2, 2))
+        baseline_variance[:, 0, 0] = (m_pre_sum_squares - m_pre_sum**2 / m_pre_n) / (
+            m_pre_n - 1
+        )
+        baseline_variance[:, 1, 1] = (d_pre_sum_squares - d_pre_sum**2 / d_pre_n) / (
+            d_pre_n - 1
+        )
+        baseline_variance[:, 0, 1] = baseline_variance[:, 1, 0] = (
+            m_pre_d_pre - m_pre_sum * d_pre_sum / n
+        ) / (n - 1)
+        baseline_variance /= n[:, None, None]
+
+        xtx = np.zeros((len(cells), 4, 4))
+        xtx[:, 0, 0] = n
+        xtx[:, 1, 1] = n_b
+        xtx[:, 2, 2] = m_pre_sum_squares
+        xtx[:, 3, 3] = d_pre_sum_squares
+        xtx[:, 0, 1] = xtx[:, 1, 0] = n_b
+        xtx[:, 0, 2] = xtx[:, 2, 0] = m_pre_sum
+        xtx[:, 0, 3] = xtx[:, 3, 0] = d_pre_sum
+        xtx[:, 1, 2] = xtx[:, 2, 1] = stacked(
+            cell.stat_b.m_statistic_pre.sum for cell in cells
+        )
+        xtx[:, 1, 3] = xtx[:, 3, 1] = stacked(
+            cell.stat_b.d_statistic_pre.sum for cell in cells
+        )
+        xtx[:, 2, 3] = xtx[:, 3, 2] = m_pre_d_pre
+        rhs = np.zeros((len(cells), 4, 6))
+        rhs[:, :, 0] = np.stack(
+            [
+                m_post_sum,
+                stacked(cell.stat_b.m_statistic_post.sum for cell in cells),
+                summed("m_post_m_pre_sum_of_products"),
+                summed("m_post_d_pre_sum_of_products"),
+            ],
+            1,
+        )
+        rhs[:, :, 1] = np.stack(
+            [
+                d_post_sum,
+                stacked(cell.stat_b.d_statistic_post.sum for cell in cells),
+                summed("m_pre_d_post_sum_of_products"),
+                summed("d_post_d_pre_sum_of_products"),
+            ],
+            1,
+        )
+        rhs[:, 0, 2] = 1
+        rhs[:, 2, 2] = baseline_mean_numerator
+        rhs[:, 3, 2] = baseline_mean_denominator
+        rhs[:, 1, 3] = 1
+        rhs[:, 2, 4] = 1
+        rhs[:, 3, 5] = 1
+        gram = stacked_cholesky_gram(xtx, rhs)
+        if gram is None:
+            return None
+
+        sigma = np.empty((len(cells), 2, 2))
+        sigma[:, 0, 0] = m_post_sum_squares - gram[:, 0, 0]
+        sigma[:, 1, 1] = d_post_sum_squares - gram[:, 1, 1]
+        sigma[:, 0, 1] = sigma[:, 1, 0] = (
+            summed("m_post_d_post_sum_of_products") - gram[:, 0, 1]
+        )
+        sigma /= (n - 6)[:, None, None]
+        # kron(sigma, m inv(xtx) m.T), as the contrast matrix is kron(I, m)
+        v_alpha = np.einsum("cij,ckl->cikjl", sigma, gram[:, 2:4, 2:4]).reshape(
+            len(cells), 4, 4
+        )
+        # the baseline means are estimated, which adds variance to the control
+        # means of the numerator (alpha index 0) and denominator (alpha index 2)
+        trace_pre = np.einsum("cij,cij->c", gram[:, 4:6, 4:6], baseline_variance)
+        gamma_pre = gram[:, 4:6, 0:2]
+        baseline_term = sigma * trace_pre[:, None, None] + np.einsum(
+            "cki,ckl,clj->cij", gamma_pre, baseline_variance, gamma_pre
+        )
+        v_alpha[:, 0::2, 0::2] += baseline_term
+        alpha = np.empty((len(cells), 4))
+        alpha[:, 0:2] = gram[:, 2:4, 0]
+        alpha[:, 2:4] = gram[:, 2:4, 1]
+        return StrataMoments(n=n, alpha=alpha, alpha_cov=n[:, None, None] * v_alpha)
+
+    @staticmethod
+    def compute_moments(
+        stats: Sequence[
+            Tuple[RegressionAdjustedRatioStatistic, RegressionAdjustedRatioStatistic]
+        ]
+    ) -> StrataMoments:
+        cells = [
+            CreateStrataResultRegressionAdjustedRatio(stat_a, stat_b)
+            for stat_a, stat_b in stats
+        ]
+        # cells that error or fall back to the unadjusted estimate go one at a time
+        batched = np.array(
+            [
+                not cell._baseline_covariance_zero() and not cell._has_zero_variance()
+                for cell in cells
+            ]
+        )
+        batched_moments = None
+        if batched.any():
+            batched_moments = CreateStrataResultRegressionAdjustedRatio.solve_stacked(
+                [cell for cell, is_batched in zip(cells, batched) if is_batched]
+            )
+            if batched_moments is None:
+                batched[:] = False
+        return merge_batched_and_cell_results(cells, batched, batched_moments)
+
+    def compute_result(self) -> StrataResultRatio:
+        if self._baseline_covariance_zero():
+            stat_a = RatioStatistic(
+                n=self.stat_a.n,
+                m_statistic=self.stat_a.m_statistic_post,
+                d_statistic=self.stat_a.d_statistic_post,
+                m_d_sum_of_products=self.stat_a.m_post_d_post_sum_of_products,
+            )
+            stat_b = RatioStatistic(
+                n=self.stat_b.n,
+                m_statistic=self.stat_b.m_statistic_post,
+                d_statistic=self.stat_b.d_statistic_post,
+                m_d_sum_of_products=self.stat_b.m_post_d_post_sum_of_products,
+            )
+            return CreateStrataResultRatio(stat_a, stat_b).compute_result()
+        else:
+            if self._has_zero_variance():
+                return CreateStrataResultRatio._default_output(
+                    error_message=ZERO_NEGATIVE_VARIANCE_MESSAGE
+                )
+
+            xtx_inv_result = invert_symmetric_matrix(self.xtx)
+            if xtx_inv_result.success and xtx_inv_result.inverse is not None:
+                xtx_inv = xtx_inv_result.inverse
+            else:
+                return CreateStrataResultRatio._default_output(
+                    error_message=xtx_inv_result.error
+                )
+            gammahat_numerator = xtx_inv.dot(self.xty_numerator)
+            gammahat_denominator = xtx_inv.dot(self.xty_denominator)
+            regression_coefs = np.concatenate(
+                (gammahat_numerator, gammahat_denominator), axis=0
+            )
+            sigma = self.compute_sigma(
+                self.stat_a,
+                self.stat_b,
+                self.xty_numerator,
+                self.xty_denominator,
+                self.xtx,
+                xtx_inv,
+                self.n,
+            )
+            coef_covariance = (
+                CreateStrataResultRegressionAdjusted.create_coef_covariance(
+                    sigma, xtx_inv
+                )
+            )
+            mean = self.mean(self.contrast_matrix, regression_coefs)
+            covariance = self.covariance(regression_coefs, coef_covariance)
+            return CreateStrataResultRatio.get_result_object(self.n, mean, covariance)
+
+
+# Algorithm 4
+class PostStratificationSummary:
+    def __init__(
+        self,
+        strata_moments: StrataMoments,
+        nu_hat: Optional[np.ndarray] = None,
+        relative: bool = True,
+    ):
+        self.strata_moments = strata_moments
+        self.nu_hat = (
+            nu_hat
+            if nu_hat is not None
+            else strata_moments.n / np.sum(strata_moments.n)
+        )
+        self.relative = relative
+
+    @property
+    def n(self) -> np.ndarray:
+        return self.strata_moments.n
+
+    @cached_property
+    def n_total(self) -> int:
+        return int(np.sum(self.n).item())
+
+    @property
+    def len_alpha(self) -> int:
+        return 2
+
+    @property
+    def num_cells(self) -> int:
+        return len(self.n)
+
+    @property
+    def alpha_matrix(self) -> np.ndarray:
+        return self.strata_moments.alpha.T
+
+    @cached_property
+    def mean(self) -> np.ndarray:
+        return np.einsum("ck,c->k", self.strata_moments.alpha, self.nu_hat)
+
+    @staticmethod
+    def cell_covariance_count(stat: StrataResultCount) -> np.ndarray:
+        return np.array(
+            [
+                [stat.control_mean_cov, stat.effect_control_mean_cov],
+                [stat.effect_control_mean_cov, stat.effect_cov],
+            ]
+        )
+
+    @staticmethod
+    def covariance_of_multinomial_weighted_means(
+        n_total: int, alpha_mean: np.ndarray, alpha_cov: np.ndarray, nu: np.ndarray
+    ) -> np.ndarray:
+        """
+        Calculate the covariance matrix of the weighted means of the alpha vectors.
+        Let n ~ Multi(nu, n_total), where nu is a vector on the unit simplex and n_total is the total number of samples.
+        Let alpha[k] | n[k] ~ N((alpha_mean[k], alpha_cov[k] / n[k]).
+        Args:
+            n_total: The total number of samples.
+            alpha_mean: len(alpha) x K matrix of the mean of the alpha vectors.
+            alpha_cov: The K x len(alpha) x len(alpha) array of the covariance matrices of the alpha vectors.
+            nu: The vector of proportions.
+        Returns:
+            The covariance matrix of the weighted means of the alpha vectors.
+        """
+        nu_cov = multinomial_covariance(nu) / n_total
+        covariance_part_1 = np.einsum("ic,cd,jd->ij", alpha_mean, nu_cov, alpha_mean)
+        covariance_part_2 = np.einsum("c,cij->ij", nu, alpha_cov) / n_total
+        return covariance_part_1 + covariance_part_2
+
+    @cached_property
+    def covariance(self) -> np.ndarray:
+        return self.covariance_of_multinomial_weighted_means(
+            self.n_total, self.alpha_matrix, self.strata_moments.alpha_cov, self.nu_hat
+        )
+
+    @cached_property
+    def nabla(self) -> np.ndarray:
+        if self.relative:
+            if self.mean[0] == 0:
+                return np.zeros((self.len_alpha,))
+            else:
+                return np.array([-self.mean[1] / self.mean[0] ** 2, 1 / self.mean[0]])
+        else:
+            return np.array([0, 1])
+
+    @cached_property
+    def point_estimate(self) -> float:
+        if self.relative:
+            if self.mean[0] == 0:
+                return 0
+            else:
+                return self.mean[1] / abs(self.mean[0])
+        else:
+            return self.mean[1]
+
+    @cached_property
+    def estimated_variance(self) -> float:
+        return float(np.einsum("i,ij,j->", self.nabla, self.covariance, self.nabla))
+
+    @cached_property
+    def unadjusted_baseline_mean(self) -> float:
+        return self.mean[0]
+
+    def _default_output(
+        self,
+        error_message: Optional[str] = None,
+    ) -> EffectMomentsResult:
+        """Return uninformative output when AB test analysis can't be performed
+        adequately
+        """
+        return EffectMomentsResult(
+            point_estimate=0,
+            standard_error=0,
+            pairwise_sample_size=0,
+            error_message=error_message,
+            post_stratification_applied=True,
+        )
+
+    def _has_zero_variance(self) -> bool:
+        """Check if any variance is 0 or negative"""
+        return self.estimated_variance <= 0
+
+    def compute_result(self) -> EffectMomentsResult:
+        if self._has_zero_variance():
+            return self._default_output(error_message=ZERO_NEGATIVE_VARIANCE_MESSAGE)
+        if self.unadjusted_baseline_mean == 0:
+            return self._default_output(error_message=BASELINE_VARIATION_ZERO_MESSAGE)
+        return EffectMomentsResult(
+            point_estimate=self.point_estimate,
+            standard_error=np.sqrt(self.estimated_variance),
+            pairwise_sample_size=self.n_total,
+            error_message=None,
+            post_stratification_applied=True,
+        )
+
+
+# Algorithm 3
+class PostStratificationSummaryRatio(PostStratificationSummary):
+    @property
+    def len_alpha(self) -> int:
+        return 4
+
+    @staticmethod
+    def cell_covariance_ratio(stat: StrataResultRatio) -> np.ndarray:
+        return np.array(
+            [
+                [
+                    stat.numerator_control_mean_cov,
+                    stat.numerator_effect_numerator_control_mean_cov,
+                    stat.numerator_control_mean_denominator_control_mean_cov,
+                    stat.numerator_control_mean_denominator_effect_cov,
+                ],
+                [
+                    stat.numerator_effect_numerator_control_mean_cov,
+                    stat.numerator_effect_cov,
+                    stat.numerator_effect_denominator_control_mean_cov,
+                    stat.numerator_effect_denominator_effect_cov,
+                ],
+                [
+                    stat.numerator_control_mean_denominator_control_mean_cov,
+                    stat.numerator_effect_denominator_control_mean_cov,
+                    stat.denominator_control_mean_cov,
+                    stat.denominator_effect_denominator_control_mean_cov,
+                ],
+                [
+                    stat.numerator_control_mean_denominator_effect_cov,
+                    stat.numerator_effect_denominator_effect_cov,
+                    stat.denominator_effect_denominator_control_mean_cov,
+                    stat.denominator_effect_cov,
+                ],
+            ]
+        )
+
+    @cached_property
+    def v_full(self) -> np.ndarray:
+        return self.strata_moments.alpha_cov / self.nu_hat[:, None, None]
+
+    @cached_property
+    def nabla(self) -> np.ndarray:
+        nabla = np.empty((self.len_alpha,))
+
+        if self.relative:
+            if self.mean[0] == 0:
+                return np.zeros((self.len_alpha,))
+            else:
+                nabla[0] = (
+                    self.mean[2] * self.point_estimate_rel_denominator
+                    - (self.mean[2] + self.mean[3]) * self.point_estimate_rel_numerator
+                ) / self.point_estimate_rel_denominator**2
+                nabla[1] = self.mean[2] / self.point_estimate_rel_denominator
+                nabla[2] = (
+                    (self.mean[0] + self.mean[1]) * self.point_estimate_rel_denominator
+                    - self.mean[0] * self.point_estimate_rel_numerator
+                ) / self.point_estimate_rel_denominator**2
+                nabla[3] = -self.point_estimate_rel_numerator / (
+                    self.mean[0] * (self.mean[2] + self.mean[3]) ** 2
+                )
+        else:
+            if self.mean[2] == 0 or self.mean[2] + self.mean[3] == 0:
+                return np.zeros((self.len_alpha,))
+            nabla[1] = 1 / (self.mean[2] + self.mean[3])
+            nabla[0] = nabla[1] - 1 / self.mean[2]
+            nabla[3] = -(self.mean[0] + self.mean[1]) / (
+                (self.mean[2] + self.mean[3]) ** 2
+            )
+            nabla[2] = nabla[3] + self.mean[0] / self.mean[2] ** 2
+        return nabla
+
+    @cached_property
+    def point_estimate_rel_numerator(self) -> float:
+        return self.mean[2] * (self.mean[0] + self.mean[1])
+
+    @cached_property
+    def point_estimate_rel_denominator(self) -> float:
+        return self.mean[0] * (self.mean[2] + self.mean[3])
+
+    @cached_property
+    def point_estimate(self) -> float:
+        if self.relative:
+            if self.point_estimate_rel_denominator == 0:
+                return 0
+            else:
+                relative_estimate = (
+                    self.point_estimate_rel_numerator
+                    / self.point_estimate_rel_denominator
+                    - 1
+                )
+                return relative_estimate * np.sign(self.unadjusted_baseline_mean)
+        else:
+            mn_trt_num = self.mean[0] + self.mean[1]
+            mn_trt_den = self.mean[2] + self.mean[3]
+            mn_ctrl_num = self.mean[0]
+            mn_ctrl_den = self.mean[2]
+            if mn_trt_den == 0 or mn_ctrl_den == 0:
+                return 0
+            else:
+                return mn_trt_num / mn_trt_den - mn_ctrl_num / mn_ctrl_den
+
+    @cached_property
+    def unadjusted_baseline_mean(self) -> float:
+        if self.mean[2] == 0:
+            return 0
+        else:
+            return self.mean[0] / self.mean[2]
+
+    @cached_property
+    def covariance_part_2(self) -> np.ndarray:
+        return np.einsum(
+            "cij,c->ij", self.strata_moments.alpha_cov, 1 / (self.n_total * self.nu_hat)
+        )
+
+
+def simplify_stats_if_baseline_variance_zero(
+    stats_init: List[Tuple[SummableStatistic, SummableStatistic]]
+) -> List[Tuple[SummableStatistic, SummableStatistic]]:
+    stat_a, stat_b = sum_stats(list(stats_init))
+    if isinstance(stat_a, RegressionAdjustedStatistic) and isinstance(
+        stat_b, RegressionAdjustedStatistic
+    ):
+        if stat_a.pre_statistic.variance <= 0 or stat_b.pre_statistic.variance <= 0:
+            stat_a = stat_a.post_statistic
+            stat_b = stat_b.post_statistic
+            fallback_reg_stats = []
+            for stat_a, stat_b in stats_init:
+                if isinstance(stat_a, RegressionAdjustedStatistic) and isinstance(
+                    stat_b, RegressionAdjustedStatistic
+                ):
+                    fallback_reg_stats.append(
+                        (stat_a.post_statistic, stat_b.post_statistic)
+                    )
+                else:
+                    raise ValueError(
+                        "A summed RegressionAdjustedStatistic must come from RegressionAdjustedStatistic instances."
+                    )
+            return fallback_reg_stats
+    if isinstance(stat_a, RegressionAdjustedRatioStatistic) and isinstance(
+        stat_b, RegressionAdjustedRatioStatistic
+    ):
+        if (
+            stat_a.m_statistic_pre.variance <= 0
+            or stat_b.m_statistic_pre.variance <= 0
+            or stat_a.d_statistic_pre.variance <= 0
+            or stat_b.d_statistic_pre.variance <= 0
+        ):
+            stat_a = stat_a.m_statistic_post
+            stat_b = stat_b.m_statistic_post
+            fallback_reg_stats = []
+            for stat_a, stat_b in stats_init:
+                if isinstance(stat_a, RegressionAdjustedRatioStatistic) and isinstance(
+                    stat_b, RegressionAdjustedRatioStatistic
+                ):
+                    stat_a_unadjusted = RatioStatistic(
+                        n=stat_a.n,
+                        m_statistic=stat_a.m_statistic_post,
+                        d_statistic=stat_a.d_statistic_post,
+                        m_d_sum_of_products=stat_a.m_post_d_post_sum_of_products,
+                    )
+                    stat_b_unadjusted = RatioStatistic(
+                        n=stat_b.n,
+                        m_statistic=stat_b.m_statistic_post,
+                        d_statistic=stat_b.d_statistic_post,
+                        m_d_sum_of_products=stat_b.m_post_d_post_sum_of_products,
+                    )
+                    fallback_reg_stats.append((stat_a_unadjusted, stat_b_unadjusted))
+                else:
+                    raise ValueError(
+                        "A summed RegressionAdjustedRatioStatistic must come from RegressionAdjustedRatioStatistic instances."
+                    )
+            return fallback_reg_stats
+    return stats_init
+
+
+COUNT_STATISTIC_TYPES = (ProportionStatistic, SampleMeanStatistic)
+
+
+def _append_statistic_columns(
+    stat: SummableStatistic, prefix: str, columns: Dict[str, List[Any]]
+) -> None:
+    if isinstance(stat, COUNT_STATISTIC_TYPES):
+        columns[prefix + "n"].append(stat.n)
+        columns[prefix + "sum"].append(stat.sum)
+        columns[prefix + "sum_squares"].append(stat.sum_squares)
+        columns[prefix + "proportion"].append(isinstance(stat, ProportionStatistic))
+        return
+    for field in dataclasses.fields(stat):
+        value = getattr(stat, field.name)
+        if isinstance(value, COUNT_STATISTIC_TYPES):
+            _append_statistic_columns(value, f"{prefix}{field.name}.", columns)
+        elif field.name == "theta":
+            columns[prefix + "theta"].append(value if value else 0)
+        else:
+            columns[prefix + field.name].append(value)
+
+
+def statistic_columns(stats: Sequence[SummableStatistic]) -> Dict[str, np.ndarray]:
+    """Sufficient statistics of a list of statistics as one array per field,
+    e.g. "n", "m_statistic.sum" or "post_pre_sum_of_products"."""
+    columns: Dict[str, List[Any]] = defaultdict(list)
+    for stat in stats:
+        _append_statistic_columns(stat, "", columns)
+    return {
+        name: np.array(values, dtype=bool if name.endswith("proportion") else float)
+        for name, values in columns.items()
+    }
+
+
+def _build_statistic(
+    template: SummableStatistic, prefix: str, total: Callable[[str], float]
+) -> SummableStatistic:
+    # mirrors the statistics' __add__: count statistics sum to SampleMeanStatistic
+    # and theta is reset
+    if isinstance(template, COUNT_STATISTIC_TYPES):
+        return SampleMeanStatistic(
+            n=int(total(prefix + "n")),
+            sum=total(prefix + "sum"),
+            sum_squares=total(prefix + "sum_squares"),
+        )
+    values: Dict[str, Any] = {}
+    for field in dataclasses.fields(template):
+        value = getattr(template, field.name)
+        if isinstance(value, COUNT_STATISTIC_TYPES):
+            values[field.name] = _build_statistic(
+                value, f"{prefix}{field.name}.", total
+            )
+        elif field.name == "theta":
+            values[field.name] = None
+        elif field.name == "n":
+            values[field.name] = int(total(prefix + "n"))
+        else:
+            values[field.name] = total(prefix + field.name)
+    return type(template)(**values)
+
+
+def sum_statistic_columns(
+    template: SummableStatistic, columns: Dict[str, np.ndarray], rows: np.ndarray
+) -> SummableStatistic:
+    """Sum of the statistics in the masked rows of `columns`, of the same type
+    as summing `template`-like statistics would return."""
+    return _build_statistic(
+        template, "", lambda name: float(np.sum(columns[name][rows]))
+    )
+
+
+def _column_mean(columns: Dict[str, np.ndarray], prefix: str) -> np.ndarray:
+    n = columns[prefix + "n"]
+    return np.divide(columns[prefix + "sum"], n, out=np.zeros(len(n)), where=n != 0)
+
+
+def _column_variance(columns: Dict[str, np.ndarray], prefix: str) -> np.ndarray:
+    n = columns[prefix + "n"]
+    variance = np.where(
+        n <= 1,
+        0,
+        sample_variance(n, columns[prefix + "sum"], columns[prefix + "sum_squares"]),
+    )
+    return np.where(
+        columns[prefix + "proportion"],
+        proportion_variance(_column_mean(columns, prefix)),
+        variance,
+    )
+
+
+def _column_covariance(
+    columns: Dict[str, np.ndarray], prefix_a: str, prefix_b: str, sum_of_products: str
+) -> np.ndarray:
+    n = columns["n"]
+    sum_a = columns[prefix_a + "sum"]
+    sum_b = columns[prefix_b + "sum"]
+    products = columns[sum_of_products]
+    covariance = np.where(
+        columns[prefix_a + "proportion"] & columns[prefix_b + "proportion"],
+        proportion_covariance(n, sum_a, sum_b, products),
+        sample_covariance(n, sum_a, sum_b, products),
+    )
+    return np.where(n <= 1, 0, covariance)
+
+
+def column_variances(stat_type: type, columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """The `variance` property of each statistic in `columns`, vectorized"""
+    n = columns["n"]
+    if issubclass(stat_type, COUNT_STATISTIC_TYPES):
+        return _column_variance(columns, "")
+    if issubclass(stat_type, RatioStatistic):
+        mean_m = _column_mean(columns, "m_statistic.")
+        mean_d = _column_mean(columns, "d_statistic.")
+        covariance = _column_covariance(
+            columns, "m_statistic.", "d_statistic.", "m_d_sum_of_products"
+        )
+        variance = delta_method_ratio_variance(
+            mean_m,
+            _column_variance(columns, "m_statistic."),
+            mean_d,
+            _column_variance(columns, "d_statistic."),
+            covariance,
+        )
+        return np.where((mean_d == 0) | (n <= 1), 0, variance)
+    theta = columns["theta"]
+    if issubclass(stat_type, RegressionAdjustedStatistic):
+        variance = regression_adjusted_variance(
+            _column_variance(columns, "post_statistic."),
+            _column_variance(columns, "pre_statistic."),
+            _column_covariance(
+                columns, "post_statistic.", "pre_statistic.", "post_pre_sum_of_products"
+            ),
+            theta,
+        )
+        return np.where(n <= 1, 0, variance)
+    if issubclass(stat_type, RegressionAdjustedRatioStatistic):
+        components = [
+            "m_statistic_post.",
+            "d_statistic_post.",
+            "m_statistic_pre.",
+            "d_statistic_pre.",
+        ]
+        sums_of_products = {
+            (0, 1): "m_post_d_post_sum_of_products",
+            (0, 2): "m_post_m_pre_sum_of_products",
+            (0, 3): "m_post_d_pre_sum_of_products",
+            (1, 2): "m_pre_d_post_sum_of_products",
+            (1, 3): "d_post_d_pre_sum_of_products",
+            (2, 3): "m_pre_d_pre_sum_of_products",
+        }
+        lambda_matrix = np.empty((len(n), 4, 4))
+        for i, component in enumerate(components):
+            lambda_matrix[:, i, i] = _column_variance(columns, component)
+        for (i, j), sum_of_products in sums_of_products.items():
+            lambda_matrix[:, i, j] = lambda_matrix[:, j, i] = _column_covariance(
+                columns, components[i], components[j], sum_of_products
+            )
+        betahat = np.stack([_column_mean(columns, c) for c in components], axis=1)
+        gradient = regression_adjusted_ratio_gradient(
+            betahat[:, 0], betahat[:, 1], betahat[:, 2], betahat[:, 3], theta
+        )
+        nabla = np.stack(gradient, axis=1)
+        variance = np.einsum("ci,cij,cj->c", nabla, lambda_matrix, nabla)
+        return np.where((betahat[:, 1] == 0) | (betahat[:, 3] == 0), 0, variance)
+    raise ValueError(f"Unsupported statistic type: {stat_type}")
+
+
+class EffectMomentsPostStratification:
+    def __init__(
+        self,
+        stats: List[Tuple[SummableStatistic, SummableStatistic]],
+        config: EffectMomentsConfig = EffectMomentsConfig(),
+    ):
+        self.stats = simplify_stats_if_baseline_variance_zero(stats)
+        self.relative = config.difference_type == "relative"
+        self.max_strata = config.max_strata
+
+    def _default_output(
+        self, error_message: Optional[str] = None
+    ) -> EffectMomentsResult:
+        """Return uninformative output when AB test analysis can't be performed adequately"""
+        return EffectMomentsResult(
+            point_estimate=0,
+            standard_error=0,
+            pairwise_sample_size=0,
+            error_message=error_message,
+            post_stratification_applied=True,
+        )
+
+    @staticmethod
+    def _has_zero_variance(stat_a: TestStatistic, stat_b: TestStatistic) -> bool:
+        """Check if any variance is 0 or negative"""
+        return stat_a._has_zero_variance or stat_b._has_zero_variance
+
+    @staticmethod
+    def is_cell_viable(stat_a: TestStatistic, stat_b: TestStatistic) -> bool:
+        if EffectMomentsPostStratification._has_zero_variance(stat_a, stat_b):
+            return False
+        # need 7 units per cell to run CUPED post-stratification on ratio metrics
+        if isinstance(stat_a, RegressionAdjustedRatioStatistic) or isinstance(
+            stat_b, RegressionAdjustedRatioStatistic
+        ):
+            if (stat_a.n + stat_b.n) <= 6:
+                return False
+        return True
+
+    @staticmethod
+    def viable_cells(
+        stat_type: type,
+        columns_a: Dict[str, np.ndarray],
+        columns_b: Dict[str, np.ndarray],
+    ) -> np.ndarray:
+        """is_cell_viable for every cell at once"""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            viable = ~(
+                (column_variances(stat_type, columns_a) <= 0)
+                | (column_variances(stat_type, columns_b) <= 0)
+            )
+        if issubclass(stat_type, RegressionAdjustedRatioStatistic):
+            viable &= (columns_a["n"] + columns_b["n"]) > 6
+        return viable
+
+    # Combine cells for analysis if there are any cells with data but without enough
+    # data to properly run a cell-level test
+    @staticmethod
+    def combine_cells_for_analysis(
+        stats: List[Tuple[SummableStatistic, SummableStatistic]],
+        max_strata: Optional[int] = None,
+    ) -> List[Tuple[SummableStatistic, SummableStatistic]]:
+        # Sort cells from largest to smallest by number of users
+        order = np.argsort(
+            [-(stat_a.n + stat_b.n) for stat_a, stat_b in stats], kind="stable"
+        )
+        sorted_cells = [stats[i] for i in order]
+        columns_a = statistic_columns([stat_a for stat_a, _ in sorted_cells])
+        columns_b = statistic_columns([stat_b for _, stat_b in sorted_cells])
+        viable = EffectMomentsPostStratification.viable_cells(
+            type(sorted_cells[0][0]), columns_a, columns_b
+        )
+        viable[0] = True
+        if max_strata is not None:
+            # keep the largest viable cells, the smallest are merged as well
+            viable &= np.cumsum(viable) <= max(max_strata, 1)
+        if viable.all():
+            return sorted_cells
+        # Combine cells that cannot compute stats independently with the largest cell
+        combined = ~viable
+        combined[0] = True
+        largest_cell = (
+            sum_statistic_columns(sorted_cells[0][0], columns_a, combined),
+            sum_statistic_columns(sorted_cells[0][1], columns_b, combined),
+        )
+        return [largest_cell] + [
+            cell for cell, is_viable in zip(sorted_cells[1:], viable[1:]) if is_viable
+        ]
+
+    def compute_result(self) -> EffectMomentsResult:
+        stat_a, stat_b = sum_stats(list(self.stats))
+        if EffectMomentsPostStratification._has_zero_variance(stat_a, stat_b):
+            return self._default_output(ZERO_NEGATIVE_VARIANCE_MESSAGE)
+        if stat_a.mean == 0:
+            return self._default_output(BASELINE_VARIATION_ZERO_MESSAGE)
+        if stat_a.unadjusted_mean == 0:
+            return self._default_output(BASELINE_VARIATION_ZERO_MESSAGE)
+
+        # if any cells have 0 users in a variation, add that cell to the cell with the largest number of users
+        cells_for_analysis = EffectMomentsPostStratification.combine_cells_for_analysis(
+            self.stats, self.max_strata
+        )
+        # if there is only one strata cell, run the regular effect moments test
+        if len(cells_for_analysis) == 1:
+            self.stat_a, self.stat_b = create_theta_adjusted_statistics(
+                cells_for_analysis[0][0], cells_for_analysis[0][1]
+            )
+            return EffectMoments(
+                [(self.stat_a, self.stat_b)],
+                EffectMomentsConfig(
+                    difference_type="relative" if self.relative else "absolute"
+                ),
+            ).compute_result()
+        strata_moments = self.compute_strata_moments(cells_for_analysis)
+        if strata_moments.error_message is not None:
+            return self._default_output(strata_moments.error_message)
+        if strata_moments.len_alpha == 4:
+            return PostStratificationSummaryRatio(
+                strata_moments, nu_hat=None, relative=self.relative
+            ).compute_result()
+        else:
+            return PostStratificationSummary(
+                strata_moments, nu_hat=None, relative=self.relative
+            ).compute_result()
+
+    def compute_strata_moments(
+        self, cells: List[Tuple[SummableStatistic, SummableStatistic]]
+    ) -> StrataMoments:
+        count_types = (ProportionStatistic, SampleMeanStatistic)
+        if all(
+            isinstance(stat_a, count_types) and isinstance(stat_b, count_types)
+            for stat_a, stat_b in cells
+        ):
+            return CreateStrataResult.compute_moments(cells)  # type: ignore
+        if all(
+            isinstance(stat_a, RatioStatistic) and isinstance(stat_b, RatioStatistic)
+            for stat_a, stat_b in cells
+        ):
+            return CreateStrataResultRatio.compute_moments(cells)  # type: ignore
+        if all(
+            isinstance(stat_a, RegressionAdjustedStatistic)
+            and isinstance(stat_b, RegressionAdjustedStatistic)
+            for stat_a, stat_b in cells
+        ):
+            return CreateStrataResultRegressionAdjusted.compute_moments(
+                cells  # type: ignore
+            )
+        if all(
+            isinstance(stat_a, RegressionAdjustedRatioStatistic)
+            and isinstance(stat_b, RegressionAdjustedRatioStatistic)
+            for stat_a, stat_b in cells
+        ):
+            return CreateStrataResultRegressionAdjustedRatio.compute_moments(
+                cells  # type: ignore
+            )
+        strata_results = []
+        for cell in cells:
+            cell_result = self.compute_strata_result(cell)
+            if cell_result.error_message is not None:
+                return StrataMoments._default_output(cell_result.error_message)
+            strata_results.append(cell_result)
+        return StrataMoments.from_strata_results(strata_results)
+
+    def compute_strata_result(
+        self, stat_pair: Tuple[TestStatistic, TestStatistic]
+    ) -> Union[StrataResultCount, StrataResultRatio]:
+        if (
+            isinstance(stat_pair[0], ProportionStatistic)
+            or isinstance(stat_pair[0], SampleMeanStatistic)
+        ) and (
+            isinstance(stat_pair[1], ProportionStatistic)
+            or isinstance(stat_pair[1], SampleMeanStatistic)
+        ):
+            return CreateStrataResult(stat_pair[0], stat_pair[1]).compute_result()
+        elif isinstance(stat_pair[0], RegressionAdjustedStatistic) and isinstance(
+            stat_pair[1], RegressionAdjustedStatistic
+        ):
+            return CreateStrataResultRegressionAdjusted(
+                stat_pair[0], stat_pair[1]
+            ).compute_result()
+        elif isinstance(stat_pair[0], RatioStatistic) and isinstance(
+            stat_pair[1], RatioStatistic
+        ):
+            return CreateStrataResultRatio(stat_pair[0], stat_pair[1]).compute_result()
+        elif isinstance(stat_pair[0], RegressionAdjustedRatioStatistic) and isinstance(
+            stat_pair[1], RegressionAdjustedRatioStatistic
+        ):
+            return CreateStrataResultRegressionAdjustedRatio(
+                stat_pair[0], stat_pair[1]
+            ).compute_result()
+        else:
+            raise ValueError("Invalid statistic pair")
@@ -1,7 +1,10 @@
-from typing import List, Literal, Optional, Tuple, Union
+from dataclasses import fields
+from typing import TYPE_CHECKING, Any, Dict, List, Literal, Optional, Tuple, Union
 
 from pydantic.dataclasses import dataclass
-import pandas as pd
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 # Internal results classes
@@ -127,6 +130,8 @@ class BayesianVariationResponseIndividual(BayesianTestResult, BaselineResponse):
 class FrequentistVariationResponseIndividual(FrequentistTestResult, BaselineResponse):
     realizedSettings: RealizedSettings
     power: Optional[PowerResponse] = None
+    pValueAdjusted: Optional[float] = None
+    ciAdjusted: Optional[ResponseCI] = None
 
 
 VariationResponseIndividual = Union[
@@ -160,6 +165,12 @@ class BaselineResponseWithSupplementalResults(BaselineResponse):
     supplementalResults: Optional[SupplementalResults] = None
 
 
+def response_fields(response: Any) -> Dict[str, Any]:
+    # Shallow alternative to dataclasses.asdict for building one response class
+    # from another: nested results are reused instead of copied and revalidated
+    return {f.name: getattr(response, f.name) for f in fields(response)}
+
+
 VariationResponse = Union[
     BayesianVariationResponse,
     FrequentistVariationResponse,
@@ -173,7 +184,9 @@ class DimensionResponseIndividual:
     srm: float
     variations: List[VariationResponseIndividual]
 
-    def to_df(self) -> pd.DataFrame:
+    def to_df(self) -> "pd.DataFrame":
+        import pandas as pd
+
         df = pd.DataFrame(self.variations)
         df["dimension"] = self.dimension
         df["srm"] = self.srm
@@ -186,7 +199,9 @@ class DimensionResponse:
     srm: float
     variations: List[VariationResponse]
 
-    def to_df(self) -> pd.DataFrame:
+    def to_df(self) -> "pd.DataFrame":
+        import pandas as pd
+
         df = pd.DataFrame(self.variations)
         df["variation"] = df.index
         df["dimension"] = self.dimension
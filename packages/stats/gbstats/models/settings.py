@@ -9,6 +9,7 @@ RegressionAdjustedStatisticType = Literal["ratio_ra", "mean_ra"]
 StatisticType = Union[UnadjustedStatisticType, RegressionAdjustedStatisticType]
 MetricType = Literal["binomial", "count", "quantile"]
 BusinessMetricType = Literal["goal", "guardrail", "secondary"]
+PValueCorrection = Literal["holm-bonferroni", "benjamini-hochberg"]
 
 
 @dataclass
@@ -20,6 +21,8 @@ class AnalysisSettingsForStatsEngine:
     dimension: str = ""
     stats_engine: StatsEngine = "bayesian"
     p_value_corrected: bool = False
+    # adjusts p-values and CIs across goal metrics, dimensions and variations
+    p_value_correction: Optional[PValueCorrection] = None
     sequential_testing_enabled: bool = False
     sequential_tuning_parameter: float = 5000
     difference_type: DifferenceType = "relative"
@@ -32,6 +35,9 @@ class AnalysisSettingsForStatsEngine:
     one_sided_intervals: bool = False
     use_covariate_as_response: bool = False
     post_stratification_enabled: bool = False
+    # cells beyond the largest max_strata are merged into the largest cell;
+    # None keeps every viable cell
+    max_strata: Optional[int] = None
 
 
 @dataclass
@@ -53,6 +59,8 @@ class BanditSettingsForStatsEngine:
     # we can delete the bottom two attributes, which are currently used in sim study testing
     weight_by_period: bool = True
     top_two: bool = False
+    # "quadrature" integrates best-arm probabilities instead of sampling them
+    best_arm_method: Literal["monte_carlo", "quadrature"] = "monte_carlo"
 
 
 ExperimentMetricQueryResponseRows = List[Dict[str, Union[str, int, float]]]
@@ -1,13 +1,59 @@
 from abc import ABC, abstractmethod
 from dataclasses import replace
-from typing import Optional, Union, List, Tuple
+from functools import cached_property
+from typing import Dict, Optional, Union, List, Sequence, Tuple
 
 import numpy as np
-import scipy.stats
 from pydantic.dataclasses import dataclass
-from gbstats.utils import variance_of_ratios
+from gbstats.frequentist.quantiles import norm_ppf
+from gbstats.utils import delta_method_ratio_variance
 
 
+def read_only(array: np.ndarray) -> np.ndarray:
+    array.flags.writeable = False
+    return array
+
+
+# Moment formulas shared by the statistics below and by the vectorized
+# per-cell versions in post_stratification.py: they take floats or arrays, and
+# the callers handle the degenerate cases (n <= 1, zero denominators).
+def sample_variance(n, total, sum_squares):
+    return (sum_squares - total**2 / n) / (n - 1)
+
+
+def proportion_variance(mean):
+    return mean * (1 - mean)
+
+
+def sample_covariance(n, sum_a, sum_b, sum_of_products):
+    return (sum_of_products - sum_a * sum_b / n) / (n - 1)
+
+
+def proportion_covariance(n, sum_a, sum_b, sum_of_products):
+    return sum_of_products / n - sum_a * sum_b / n**2
+
+
+def regression_adjusted_variance(post_variance, pre_variance, covariance, theta):
+    return post_variance + theta**2 * pre_variance - 2 * theta * covariance
+
+
+def regression_adjusted_ratio_gradient(
+    mean_m_post, mean_d_post, mean_m_pre, mean_d_pre, theta
+):
+    """Partial derivatives of the adjusted ratio w.r.t. the four means"""
+    return [
+        1 / mean_d_post,
+        -mean_m_post / mean_d_post**2,
+        -theta / mean_d_pre,
+        theta * mean_m_pre / mean_d_pre**2,
+    ]
+
+
+# Statistics are frozen, so derived moments are cached_property attributes:
+# computed on first access and kept in the instance __dict__, which leaves
+# the dataclass fields, equality and replace() untouched. The abstract mean
+# and variance stay properties, reading from private _mean and _variance
+# caches. Cached arrays are read-only as they are shared between callers.
 @dataclass(frozen=True)
 class Statistic(ABC):
     n: int
@@ -17,7 +63,7 @@ class Statistic(ABC):
     def variance(self) -> float:
         pass
 
-    @property
+    @cached_property
     def stddev(self):
         return 0 if self.variance <= 0 else np.sqrt(self.variance)
 
@@ -35,7 +81,7 @@ class Statistic(ABC):
         """
         return self.mean
 
-    @property
+    @cached_property
     def _has_zero_variance(self) -> bool:
         return self.variance <= 0.0
 
@@ -47,12 +93,20 @@ class SampleMeanStatistic(Statistic):
 
     @property
     def variance(self):
+        return self._variance
+
+    @cached_property
+    def _variance(self):
         if self.n <= 1:
             return 0
-        return (self.sum_squares - pow(self.sum, 2) / self.n) / (self.n - 1)
+        return sample_variance(self.n, self.sum, self.sum_squares)
 
     @property
     def mean(self):
+        return self._mean
+
+    @cached_property
+    def _mean(self):
         if self.n == 0:
             return 0
         return self.sum / self.n
@@ -79,10 +133,18 @@ class ProportionStatistic(Statistic):
 
     @property
     def variance(self):
-        return self.mean * (1 - self.mean)
+        return self._variance
+
+    @cached_property
+    def _variance(self):
+        return proportion_variance(self.mean)
 
     @property
     def mean(self):
+        return self._mean
+
+    @cached_property
+    def _mean(self):
         if self.n == 0:
             return 0
         return self.sum / self.n
@@ -108,6 +170,10 @@ class RatioStatistic(Statistic):
 
     @property
     def mean(self):
+        return self._mean
+
+    @cached_property
+    def _mean(self):
         if self.d_statistic.sum == 0:
             return 0
         return self.m_statistic.sum / self.d_statistic.sum
@@ -120,9 +186,13 @@ class RatioStatistic(Statistic):
 
     @property
     def variance(self):
+        return self._variance
+
+    @cached_property
+    def _variance(self):
         if self.d_statistic.mean == 0 or self.n <= 1:
             return 0
-        return variance_of_ratios(
+        return delta_method_ratio_variance(
             self.m_statistic.mean,
             self.m_statistic.variance,
             self.d_statistic.mean,
@@ -130,7 +200,7 @@ class RatioStatistic(Statistic):
             self.covariance,
         )
 
-    @property
+    @cached_property
     def covariance(self):
         return compute_covariance(
             n=self.n,
@@ -175,6 +245,10 @@ class RegressionAdjustedStatistic(Statistic):
 
     @property
     def mean(self) -> float:
+        return self._mean
+
+    @cached_property
+    def _mean(self) -> float:
         theta = self.theta if self.theta else 0
         return self.post_statistic.mean - theta * self.pre_statistic.mean
 
@@ -194,16 +268,21 @@ class RegressionAdjustedStatistic(Statistic):
 
     @property
     def variance(self) -> float:
+        return self._variance
+
+    @cached_property
+    def _variance(self) -> float:
         if self.n <= 1:
             return 0
         theta = self.theta if self.theta else 0
-        return (
-            self.post_statistic.variance
-            + pow(theta, 2) * self.pre_statistic.variance
-            - 2 * theta * self.covariance
+        return regression_adjusted_variance(
+            self.post_statistic.variance,
+            self.pre_statistic.variance,
+            self.covariance,
+            theta,
         )
 
-    @property
+    @cached_property
     def covariance(self) -> float:
         return compute_covariance(
             n=self.n,
@@ -226,9 +305,9 @@ def compute_covariance(
     if isinstance(stat_a, ProportionStatistic) and isinstance(
         stat_b, ProportionStatistic
     ):
-        return sum_of_products / n - stat_a.sum * stat_b.sum / n**2
+        return proportion_covariance(n, stat_a.sum, stat_b.sum, sum_of_products)
     else:
-        return (sum_of_products - stat_a.sum * stat_b.sum / n) / (n - 1)
+        return sample_covariance(n, stat_a.sum, stat_b.sum, sum_of_products)
 
 
 def compute_theta(
@@ -323,18 +402,22 @@ class RegressionAdjustedRatioStatistic(Statistic):
 
     @property
     def mean(self) -> float:
+        return self._mean
+
+    @cached_property
+    def _mean(self) -> float:
         if self.d_statistic_post.sum == 0 or self.d_statistic_pre.sum == 0:
             return 0
         theta = self.theta if self.theta else 0
         return self.mean_post - theta * self.mean_pre
 
-    @property
+    @cached_property
     def mean_post(self) -> float:
         if self.d_statistic_post.sum == 0:
             return 0
         return self.m_statistic_post.sum / self.d_statistic_post.sum
 
-    @property
+    @cached_property
     def mean_pre(self) -> float:
         if self.d_statistic_pre.sum == 0:
             return 0
@@ -357,17 +440,21 @@ class RegressionAdjustedRatioStatistic(Statistic):
 
     @property
     def variance(self) -> float:
+        return self._variance
+
+    @cached_property
+    def _variance(self) -> float:
         return self.nabla.T.dot(self.lambda_matrix).dot(self.nabla)
 
-    @property
+    @cached_property
     def var_pre(self) -> float:
         return self.nabla[2:4].T.dot(self.lambda_matrix[2:4, 2:4]).dot(self.nabla[2:4])
 
-    @property
+    @cached_property
     def covariance(self) -> float:
         return self.nabla[2:4].T.dot(self.lambda_matrix[2:4, 0:2]).dot(self.nabla[0:2])
 
-    @property
+    @cached_property
     def cov_m_pre_d_pre(self) -> float:
         return compute_covariance(
             n=self.n,
@@ -376,7 +463,7 @@ class RegressionAdjustedRatioStatistic(Statistic):
             sum_of_products=self.m_pre_d_pre_sum_of_products,
         )
 
-    @property
+    @cached_property
     def cov_m_post_d_post(self) -> float:
         return compute_covariance(
             n=self.n,
@@ -385,7 +472,7 @@ class RegressionAdjustedRatioStatistic(Statistic):
             sum_of_products=self.m_post_d_post_sum_of_products,
         )
 
-    @property
+    @cached_property
     def cov_m_post_m_pre(self) -> float:
         return compute_covariance(
             n=self.n,
@@ -394,7 +481,7 @@ class RegressionAdjustedRatioStatistic(Statistic):
             sum_of_products=self.m_post_m_pre_sum_of_products,
         )
 
-    @property
+    @cached_property
     def cov_d_post_d_pre(self) -> float:
         return compute_covariance(
             n=self.n,
@@ -403,7 +490,7 @@ class RegressionAdjustedRatioStatistic(Statistic):
             sum_of_products=self.d_post_d_pre_sum_of_products,
         )
 
-    @property
+    @cached_property
     def cov_m_post_d_pre(self) -> float:
         return compute_covariance(
             n=self.n,
@@ -412,7 +499,7 @@ class RegressionAdjustedRatioStatistic(Statistic):
             sum_of_products=self.m_post_d_pre_sum_of_products,
         )
 
-    @property
+    @cached_property
     def cov_d_post_m_pre(self) -> float:
         return compute_covariance(
             n=self.n,
@@ -421,57 +508,57 @@ class RegressionAdjustedRatioStatistic(Statistic):
             sum_of_products=self.m_pre_d_post_sum_of_products,
         )
 
-    @property
+    @cached_property
     def betahat(self) -> np.ndarray:
-        return np.array(
-            [self.mean_m_post, self.mean_d_post, self.mean_m_pre, self.mean_d_pre]
+        return read_only(
+            np.array(
+                [self.mean_m_post, self.mean_d_post, self.mean_m_pre, self.mean_d_pre]
+            )
         )
 
-    @property
+    @cached_property
     def lambda_matrix(self) -> np.ndarray:
-        return np.array(
-            [
+        return read_only(
+            np.array(
                 [
-                    self.var_m_post,
-                    self.cov_m_post_d_post,
-                    self.cov_m_post_m_pre,
-                    self.cov_m_post_d_pre,
-                ],
-                [
-                    self.cov_m_post_d_post,
-                    self.var_d_post,
-                    self.cov_d_post_m_pre,
-                    self.cov_d_post_d_pre,
-                ],
-                [
-                    self.cov_m_post_m_pre,
-                    self.cov_d_post_m_pre,
-                    self.var_m_pre,
-                    self.cov_m_pre_d_pre,
-                ],
-                [
-                    self.cov_m_post_d_pre,
-                    self.cov_d_post_d_pre,
-                    self.cov_m_pre_d_pre,
-                    self.var_d_pre,
-                ],
-            ]
+                    [
+                        self.var_m_post,
+                        self.cov_m_post_d_post,
+                        self.cov_m_post_m_pre,
+                        self.cov_m_post_d_pre,
+                    ],
+                    [
+                        self.cov_m_post_d_post,
+                        self.var_d_post,
+                        self.cov_d_post_m_pre,
+                        self.cov_d_post_d_pre,
+                    ],
+                    [
+                        self.cov_m_post_m_pre,
+                        self.cov_d_post_m_pre,
+                        self.var_m_pre,
+                        self.cov_m_pre_d_pre,
+                    ],
+                    [
+                        self.cov_m_post_d_pre,
+                        self.cov_d_post_d_pre,
+                        self.cov_m_pre_d_pre,
+                        self.var_d_pre,
+                    ],
+                ]
+            )
         )
 
     # vector of partial derivatives for the absolute case
-    @property
+    @cached_property
     def nabla(self) -> np.ndarray:
         theta = self.theta if self.theta else 0
         if self.betahat[1] == 0 or self.betahat[3] == 0:
-            return np.zeros((4,))
-        return np.array(
-            [
-                1 / self.betahat[1],
-                -self.betahat[0] / self.betahat[1] ** 2,
-                -theta / self.betahat[3],
-                theta * self.betahat[2] / self.betahat[3] ** 2,
-            ]
+            return read_only(np.zeros((4,)))
+        gradient = regression_adjusted_ratio_gradient(
+            self.betahat[0], self.betahat[1], self.betahat[2], self.betahat[3], theta
         )
+        return read_only(np.array(gradient))
 
     @property
     def mean_m_post(self) -> float:
@@ -510,8 +597,12 @@ def compute_theta_regression_adjusted_ratio(
     a: RegressionAdjustedRatioStatistic, b: RegressionAdjustedRatioStatistic
 ) -> float:
     # set theta equal to 1, so the partial derivatives are unaffected by theta
-    a_one = replace(a, theta=1)
-    b_one = replace(b, theta=1)
+    return theta_from_unit_theta_statistics(replace(a, theta=1), replace(b, theta=1))
+
+
+def theta_from_unit_theta_statistics(
+    a_one: RegressionAdjustedRatioStatistic, b_one: RegressionAdjustedRatioStatistic
+) -> float:
     if a_one.var_pre + b_one.var_pre == 0:
         return 0
     return -(a_one.covariance + b_one.covariance) / (a_one.var_pre + b_one.var_pre)
@@ -526,9 +617,9 @@ class QuantileStatistic(Statistic):
     quantile_lower: float
     quantile_upper: float
 
-    @property
+    @cached_property
     def _has_zero_variance(self) -> bool:
-        multiplier = scipy.stats.norm.ppf(1.0 - 0.5 * 0.05, loc=0, scale=1)
+        multiplier = norm_ppf(1.0 - 0.5 * 0.05)
         quantile_above_one = self.n <= multiplier**2 * self.nu / (1.0 - self.nu)
         quantile_below_zero = self.n <= multiplier**2 * (1.0 - self.nu) / self.nu
         if quantile_above_one or quantile_below_zero:
@@ -546,16 +637,24 @@ class QuantileStatistic(Statistic):
     def unadjusted_mean(self) -> float:
         return self.mean
 
-    @property
-    def variance_init(self) -> float:
+    @cached_property
+    def iid_variance_init(self) -> float:
         if self.n <= 1:
             return 0
         num = self.quantile_upper - self.quantile_lower
-        den = 2 * scipy.stats.norm.ppf(1.0 - 0.5 * 0.05, loc=0, scale=1)
+        den = 2 * norm_ppf(1.0 - 0.5 * 0.05)
         return float((self.n_star / self.n) * (self.n - 1) * (num / den) ** 2)
 
+    @cached_property
+    def variance_init(self) -> float:
+        return self.iid_variance_init
+
     @property
     def variance(self) -> float:
+        return self._variance
+
+    @cached_property
+    def _variance(self) -> float:
         if self.n < 100:
             return self.variance_init
         else:
@@ -571,7 +670,7 @@ class QuantileClusteredStatistic(QuantileStatistic):
     main_denominator_sum_product: float
     n_clusters: int
 
-    @property
+    @cached_property
     def variance_init(self):
         if (
             self.n <= 1
@@ -580,12 +679,12 @@ class QuantileClusteredStatistic(QuantileStatistic):
             or self.denominator_sum <= 0
         ):
             return 0
-        v_iid = super().variance_init
+        v_iid = self.iid_variance_init
         v_nu_iid = self.nu * (1.0 - self.nu) / self.n
         v_nu_cluster = self.get_cluster_variance
         return v_iid * v_nu_cluster / v_nu_iid
 
-    @property
+    @cached_property
     def get_cluster_variance(self):
         mu_s = self.main_sum / self.n_clusters
         mu_n = self.denominator_sum / self.n_clusters
@@ -659,44 +758,181 @@ class BanditPeriodDataCuped:
     weights: List[float]
 
 
+def needs_theta(stat_a: TestStatistic, stat_b: TestStatistic) -> bool:
+    if isinstance(stat_a, RegressionAdjustedStatistic) and isinstance(
+        stat_b, RegressionAdjustedStatistic
+    ):
+        return stat_a.theta is None or stat_b.theta is None
+    if isinstance(stat_a, RegressionAdjustedRatioStatistic) and isinstance(
+        stat_b, RegressionAdjustedRatioStatistic
+    ):
+        return stat_a.theta is None or stat_b.theta is None
+    return False
+
+
 def create_theta_adjusted_statistics(
     stat_a: TestStatistic, stat_b: TestStatistic
 ) -> Tuple[TestStatistic, TestStatistic]:
-    if (
-        isinstance(stat_b, RegressionAdjustedStatistic)
-        and isinstance(stat_a, RegressionAdjustedStatistic)
-        and (stat_a.theta is None or stat_b.theta is None)
+    if not needs_theta(stat_a, stat_b):
+        return stat_a, stat_b
+    if isinstance(stat_a, RegressionAdjustedStatistic) and isinstance(
+        stat_b, RegressionAdjustedStatistic
     ):
         theta = compute_theta(stat_a, stat_b)
+    elif isinstance(stat_a, RegressionAdjustedRatioStatistic) and isinstance(
+        stat_b, RegressionAdjustedRatioStatistic
+    ):
+        theta = compute_theta_regression_adjusted_ratio(stat_a, stat_b)
+    else:
+        return stat_a, stat_b
+    return theta_adjusted_statistics(stat_a, stat_b, theta)
+
+
+def theta_adjusted_statistics(
+    stat_a: TestStatistic, stat_b: TestStatistic, theta: float
+) -> Tuple[TestStatistic, TestStatistic]:
+    if isinstance(stat_a, RegressionAdjustedStatistic) and isinstance(
+        stat_b, RegressionAdjustedStatistic
+    ):
         if theta == 0:
             # revert to non-RA under the hood if no variance in a time period
-            stat_a = stat_a.post_statistic
-            stat_b = stat_b.post_statistic
-        else:
-            # override statistic with theta initialized
-            stat_a = replace(stat_a, theta=theta)
-            stat_b = replace(stat_b, theta=theta)
-    elif (
-        isinstance(stat_b, RegressionAdjustedRatioStatistic)
-        and isinstance(stat_a, RegressionAdjustedRatioStatistic)
-        and (stat_a.theta is None or stat_b.theta is None)
+            return stat_a.post_statistic, stat_b.post_statistic
+        # override statistic with theta initialized
+        return replace(stat_a, theta=theta), replace(stat_b, theta=theta)
+    elif isinstance(stat_a, RegressionAdjustedRatioStatistic) and isinstance(
+        stat_b, RegressionAdjustedRatioStatistic
     ):
-        theta = compute_theta_regression_adjusted_ratio(stat_a, stat_b)
         if abs(theta) < 1e-8:
             # revert to non-RA under the hood if no variance in a time period
-            stat_a = RatioStatistic(
-                n=stat_a.n,
-                m_statistic=stat_a.m_statistic_post,
-                d_statistic=stat_a.d_statistic_post,
-                m_d_sum_of_products=stat_a.m_post_d_post_sum_of_products,
-            )
-            stat_b = RatioStatistic(
-                n=stat_b.n,
-                m_statistic=stat_b.m_statistic_post,
-                d_statistic=stat_b.d_statistic_post,
-                m_d_sum_of_products=stat_b.m_post_d_post_sum_of_products,
+            return (
+                RatioStatistic(
+                    n=stat_a.n,
+                    m_statistic=stat_a.m_statistic_post,
+                    d_statistic=stat_a.d_statistic_post,
+                    m_d_sum_of_products=stat_a.m_post_d_post_sum_of_products,
+                ),
+                RatioStatistic(
+                    n=stat_b.n,
+                    m_statistic=stat_b.m_statistic_post,
+                    d_statistic=stat_b.d_statistic_post,
+                    m_d_sum_of_products=stat_b.m_post_d_post_sum_of_products,
+                ),
             )
-        else:
-            stat_a = replace(stat_a, theta=theta)
-            stat_b = replace(stat_b, theta=theta)
+        return replace(stat_a, theta=theta), replace(stat_b, theta=theta)
     return stat_a, stat_b
+
+
+class CupedContext:
+    """Theta-adjusted statistics for every (control, variation) pair of one
+    dimension, matching create_theta_adjusted_statistics pair by pair.
+
+    For RegressionAdjustedStatistic the pooled pre/post sums of all pairs are
+    built from one set of arrays holding the control and every variation.
+    For RegressionAdjustedRatioStatistic the control's delta-method moments
+    are computed once and shared. Adjusted pairs are built on first use.
+    """
+
+    def __init__(self, control: TestStatistic, variations: Sequence[TestStatistic]):
+        self.control = control
+        self.variations = list(variations)
+        self.thetas = self.compute_thetas()
+        self._adjusted: Dict[int, Tuple[TestStatistic, TestStatistic]] = {}
+
+    def compute_thetas(self) -> List[Optional[float]]:
+        thetas: List[Optional[float]] = [None] * len(self.variations)
+        control = self.control
+        pairs = [
+            (i, stat)
+            for i, stat in enumerate(self.variations)
+            if needs_theta(control, stat)
+        ]
+        if isinstance(control, RegressionAdjustedRatioStatistic):
+            # set theta equal to 1, so the partial derivatives are unaffected by theta
+            a_one = replace(control, theta=1)
+            for i, stat in pairs:
+                if isinstance(stat, RegressionAdjustedRatioStatistic):
+                    thetas[i] = theta_from_unit_theta_statistics(
+                        a_one, replace(stat, theta=1)
+                    )
+        elif isinstance(control, RegressionAdjustedStatistic):
+            variations = [
+                (i, stat)
+                for i, stat in pairs
+                if isinstance(stat, RegressionAdjustedStatistic)
+            ]
+            pooled = pooled_thetas(control, [stat for _, stat in variations])
+            for (i, _), theta in zip(variations, pooled):
+                thetas[i] = theta
+        return thetas
+
+    def adjusted_statistics(self, i: int) -> Tuple[TestStatistic, TestStatistic]:
+        """Theta-adjusted (control, variation) statistics for variation i."""
+        if i not in self._adjusted:
+            theta = self.thetas[i]
+            if theta is None:
+                self._adjusted[i] = (self.control, self.variations[i])
+            else:
+                self._adjusted[i] = theta_adjusted_statistics(
+                    self.control, self.variations[i], theta
+                )
+        return self._adjusted[i]
+
+
+def pooled_thetas(
+    control: RegressionAdjustedStatistic,
+    variations: List[RegressionAdjustedStatistic],
+) -> List[float]:
+    """compute_theta of the control with each variation, from one set of
+    arrays holding the pooled sums of every pair."""
+    if not variations:
+        return []
+    stats = [control] + variations
+    post_types = {type(stat.post_statistic) for stat in stats}
+    pre_types = {type(stat.pre_statistic) for stat in stats}
+    if len(post_types) > 1 or len(pre_types) > 1:
+        # mixed statistic types raise in compute_theta
+        return [compute_theta(control, stat) for stat in variations]
+
+    def pooled(values: List[float]) -> np.ndarray:
+        array = np.array(values, dtype=float)
+        return array[0] + array[1:]
+
+    n = pooled([stat.n for stat in stats])
+    post_proportion = post_types == {ProportionStatistic}
+    pre_proportion = pre_types == {ProportionStatistic}
+    post_sum = pooled([stat.post_statistic.sum for stat in stats])
+    pre_sum = pooled([stat.pre_statistic.sum for stat in stats])
+    post_variance = pooled_variance(
+        n,
+        post_sum,
+        pooled([stat.post_statistic.sum_squares for stat in stats]),
+        post_proportion,
+    )
+    pre_variance = pooled_variance(
+        n,
+        pre_sum,
+        pooled([stat.pre_statistic.sum_squares for stat in stats]),
+        pre_proportion,
+    )
+    sum_of_products = pooled([stat.post_pre_sum_of_products for stat in stats])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if post_proportion and pre_proportion:
+            covariance = proportion_covariance(n, post_sum, pre_sum, sum_of_products)
+        else:
+            covariance = sample_covariance(n, post_sum, pre_sum, sum_of_products)
+        theta = np.where(
+            (pre_variance == 0) | (post_variance == 0) | (n <= 1),
+            0.0,
+            covariance / pre_variance,
+        )
+    return [float(t) for t in theta]
+
+
+def pooled_variance(
+    n: np.ndarray, sum: np.ndarray, sum_squares: np.ndarray, proportion: bool
+) -> np.ndarray:
+    """Variances of pooled ProportionStatistic or SampleMeanStatistic sums."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if proportion:
+            return proportion_variance(np.where(n == 0, 0.0, sum / n))
+        return np.where(n <= 1, 0.0, sample_variance(n, sum, sum_squares))
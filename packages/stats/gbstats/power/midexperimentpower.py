@@ -1,10 +1,11 @@
-from typing import Optional
+from typing import List, Optional, Sequence
 from dataclasses import field
 import numpy as np
 from pydantic.dataclasses import dataclass
 from scipy.stats import norm
 
 from gbstats.models.tests import TestResult, EffectMomentsResult
+from gbstats.frequentist.quantiles import norm_ppf
 from gbstats.frequentist.tests import (
     sequential_interval_halfwidth,
 )
@@ -42,6 +43,55 @@ class ScalingFactorResult:
     error: Optional[str] = None
 
 
+def power_from_halfwidth(
+    halfwidth: np.ndarray,
+    shift: np.ndarray,
+    target_mde: np.ndarray,
+    stddev: np.ndarray,
+) -> np.ndarray:
+    """Probability that an interval of the given halfwidth, centred on an
+    estimate shifted by `shift` (prior shrinkage), excludes zero in either
+    direction when the true effect is target_mde. Works elementwise."""
+    part_pos = norm.sf((halfwidth - shift - target_mde) / stddev)
+    part_neg = norm.cdf(-(halfwidth + shift + target_mde) / stddev)
+    return part_pos + part_neg
+
+
+def effect_power(
+    variance: np.ndarray,
+    pairwise_sample_size: np.ndarray,
+    target_mde: np.ndarray,
+    multiplier: np.ndarray,
+    prior_mean: np.ndarray = np.array(0.0),
+    prior_variance: np.ndarray = np.array(1.0),
+    proper: np.ndarray = np.array(False),
+    sequential: np.ndarray = np.array(False),
+    sequential_tuning_parameter: np.ndarray = np.array(5000.0),
+    sequential_alpha: np.ndarray = np.array(0.05),
+) -> np.ndarray:
+    """Power to detect target_mde when the effect estimate has the given variance.
+
+    With a proper prior the interval is the posterior one, shrunk towards the
+    prior mean; otherwise it is the fixed-horizon interval, or the sequential
+    one where `sequential` is set. All arguments broadcast against each other.
+    """
+    stddev = np.sqrt(variance)
+    posterior_precision = 1 / prior_variance + 1 / variance
+    scale = np.where(proper, variance * np.sqrt(posterior_precision), stddev)
+    halfwidth = scale * multiplier
+    shift = np.where(proper, variance * prior_mean / prior_variance, 0.0)
+    sequential = sequential & ~proper
+    if np.any(sequential):
+        sequential_halfwidth = sequential_interval_halfwidth(
+            pairwise_sample_size * variance,
+            pairwise_sample_size,
+            sequential_tuning_parameter,
+            sequential_alpha,
+        )
+        halfwidth = np.where(sequential, sequential_halfwidth, halfwidth)
+    return power_from_halfwidth(halfwidth, shift, target_mde, stddev)
+
+
 class MidExperimentPower:
     def __init__(
         self,
@@ -60,7 +110,7 @@ class MidExperimentPower:
             if power_config.p_value_corrected
             else 1
         )
-        self.multiplier = norm.ppf(1 - self.alpha / (2 * self.num_tests))
+        self.multiplier = norm_ppf(1 - self.alpha / (2 * self.num_tests))
         self.target_power = power_config.target_power
         self.adjusted_power = self.target_power ** (1 / self.num_goal_metrics)
         self.target_mde = np.abs(power_config.target_mde)
@@ -82,17 +132,17 @@ class MidExperimentPower:
         )
 
     def calculate_sample_size(self) -> AdditionalSampleSizeNeededResult:
-        if self.test_result.errorMessage:
-            return self._default_output(self.test_result.errorMessage, "unsuccessful")
+        return MidExperimentPowerBatch([self]).calculate_sample_sizes()[0]
 
-        scaling_factor_result = self.calculate_scaling_factor()
+    def sample_size_result(
+        self, scaling_factor_result: ScalingFactorResult
+    ) -> AdditionalSampleSizeNeededResult:
         if scaling_factor_result.scaling_factor:
             self.additional_users = (
                 self.pairwise_sample_size * scaling_factor_result.scaling_factor
             )
         else:
             self.additional_users = None
-
         if (
             scaling_factor_result.upper_bound_achieved
             and scaling_factor_result.scaling_factor is not None
@@ -136,16 +186,6 @@ class MidExperimentPower:
     def pairwise_sample_size(self) -> int:
         return self.effect_moments.pairwise_sample_size
 
-    # maximum number of iterations for bisection search for power estimation
-    @property
-    def max_iters(self) -> int:
-        return 100
-
-    # maximum number of iterations for finding the scaling factor: 2 ^ 27 = 134,217,728
-    @property
-    def max_iters_scaling_factor(self) -> int:
-        return 27
-
     @property
     def sigmahat_2_delta(self) -> float:
         if self.test_result.errorMessage is not None:
@@ -168,107 +208,194 @@ class MidExperimentPower:
         Returns:
             The power of the test.
         """
-        n_t_prime = scaling_factor * self.pairwise_sample_size
-        adjusted_variance = self.sigmahat_2_delta / (1 + scaling_factor)
-        if self.prior_effect and self.prior_effect.proper:
-            posterior_precision = 1 / self.prior_effect.variance + 1 / adjusted_variance
-            num_1 = adjusted_variance * posterior_precision**0.5 * self.multiplier
-            num_2 = (
-                adjusted_variance * self.prior_effect.mean / self.prior_effect.variance
-            )
-            num_3 = self.target_mde
-            den = adjusted_variance**0.5
-            part_pos = 1 - norm.cdf((num_1 - num_2 - num_3) / den)
-            part_neg = norm.cdf(-(num_1 + num_2 + num_3) / den)
-        else:
-            if self.sequential:
-                s2 = self.pairwise_sample_size * self.sigmahat_2_delta
-                n_total = self.pairwise_sample_size + n_t_prime
-                halfwidth = sequential_interval_halfwidth(
-                    s2,
-                    n_total,
-                    self.sequential_tuning_parameter,
-                    self.alpha / self.num_tests,
-                )
-            else:
-                halfwidth = self.multiplier * adjusted_variance**0.5
-            part_pos = 1 - norm.cdf(
-                (halfwidth - self.target_mde) / adjusted_variance**0.5
-            )
-            part_neg = norm.cdf(-(halfwidth + self.target_mde) / adjusted_variance**0.5)
-        return float(part_pos + part_neg)
+        batch = MidExperimentPowerBatch([self])
+        return float(batch.power(np.array([scaling_factor], dtype=float))[0])
 
     def calculate_scaling_factor(self) -> ScalingFactorResult:
-        """Calculates the scaling factor for the control group sample size.
+        """Calculates the scaling factor for the control group sample size,
+        i.e. the multiple of the current pairwise sample size that still
+        needs to be collected to reach the adjusted target power."""
+        return MidExperimentPowerBatch([self]).calculate_scaling_factors()[0]
 
-        Args:
-            mu_prior: The prior mean.
-            sigma_2_prior: The prior variance.
-            proper: A boolean indicating whether the prior is proper.
-            delta: The effect size (difference in means).
-            sigma_hat_2: The estimated variance.
-            n_t: The sample size of the treatment group.
-            alpha: The significance level.
 
-        Returns:
-            The scaling factor.
-        """
-        # case where this (metric, variation) is ready for decision
-        if self.already_powered:
-            return ScalingFactorResult(
+class MidExperimentPowerBatch:
+    """Solves for the scaling factors of many MidExperimentPower cells at once.
+
+    Power is evaluated for all cells in one vectorized call. Cells are
+    bracketed by doubling the scaling factor (up to 2 ^ max_iters_scaling_factor),
+    or, for the flat-prior fixed-horizon test, by the closed-form root of the
+    dominant tail; the root is then found with the Illinois variant of
+    regula falsi.
+    """
+
+    def __init__(self, cells: Sequence[MidExperimentPower]):
+        self.cells = cells
+        self.pairwise_sample_size = np.array(
+            [c.pairwise_sample_size for c in cells], dtype=float
+        )
+        self.sigmahat_2_delta = np.array(
+            [c.sigmahat_2_delta for c in cells], dtype=float
+        )
+        self.multiplier = np.array([c.multiplier for c in cells], dtype=float)
+        self.target_mde = np.array([c.target_mde for c in cells], dtype=float)
+        self.adjusted_power = np.array([c.adjusted_power for c in cells], dtype=float)
+        proper, prior_mean, prior_variance = [], [], []
+        for c in cells:
+            prior = c.prior_effect
+            if prior is not None and prior.proper:
+                proper.append(True)
+                prior_mean.append(prior.mean)
+                prior_variance.append(prior.variance)
+            else:
+                proper.append(False)
+                prior_mean.append(0)
+                prior_variance.append(1)
+        self.proper = np.array(proper, dtype=bool)
+        self.prior_mean = np.array(prior_mean, dtype=float)
+        self.prior_variance = np.array(prior_variance, dtype=float)
+        self.sequential = np.array(
+            [c.sequential and not p for c, p in zip(cells, self.proper)], dtype=bool
+        )
+        self.sequential_tuning_parameter = np.array(
+            [c.sequential_tuning_parameter for c in cells], dtype=float
+        )
+        self.sequential_alpha = np.array(
+            [c.alpha / c.num_tests for c in cells], dtype=float
+        )
+
+    # maximum number of iterations for the root search
+    @property
+    def max_iters(self) -> int:
+        return 100
+
+    # maximum number of doublings of the scaling factor: 2 ^ 27 = 134,217,728
+    @property
+    def max_iters_scaling_factor(self) -> int:
+        return 27
+
+    # absolute tolerance on power at the returned scaling factor
+    @property
+    def tolerance(self) -> float:
+        return 1e-10
+
+    def power(
+        self, scaling_factor: np.ndarray, cells: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Power of every cell (or the cells indexed by `cells`) at the
+        given scaling factors."""
+        idx = slice(None) if cells is None else cells
+        return effect_power(
+            self.sigmahat_2_delta[idx] / (1 + scaling_factor),
+            self.pairwise_sample_size[idx] * (1 + scaling_factor),
+            self.target_mde[idx],
+            self.multiplier[idx],
+            prior_mean=self.prior_mean[idx],
+            prior_variance=self.prior_variance[idx],
+            proper=self.proper[idx],
+            sequential=self.sequential[idx],
+            sequential_tuning_parameter=self.sequential_tuning_parameter[idx],
+            sequential_alpha=self.sequential_alpha[idx],
+        )
+
+    def closed_form_scaling_factor(self, cells: np.ndarray) -> np.ndarray:
+        """Root of the flat-prior fixed-horizon power, ignoring the opposite
+        tail. That tail only adds power, so this bounds the root from above."""
+        z_power = norm.ppf(self.adjusted_power[cells])
+        ratio = (self.multiplier[cells] + z_power) / self.target_mde[cells]
+        return self.sigmahat_2_delta[cells] * ratio**2 - 1
+
+    def calculate_scaling_factors(self) -> List[ScalingFactorResult]:
+        n_cells = len(self.cells)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            already_powered = self.power(np.zeros(n_cells)) > self.adjusted_power
+            active = np.flatnonzero(~already_powered)
+            lower = np.zeros(len(active))
+            upper = np.ones(len(active))
+            closed_form = ~self.proper[active] & ~self.sequential[active]
+            upper[closed_form] = np.maximum(
+                self.closed_form_scaling_factor(active[closed_form]), 0
+            )
+            max_scaling_factor = 2.0**self.max_iters_scaling_factor
+            upper[closed_form & ~(upper <= max_scaling_factor)] = max_scaling_factor
+            f_upper = self.power(upper, active) - self.adjusted_power[active]
+            # find the smallest power of 2 with enough power
+            for _ in range(self.max_iters_scaling_factor):
+                short = ~closed_form & (f_upper < 0)
+                if not np.any(short):
+                    break
+                lower[short] = upper[short]
+                upper[short] *= 2
+                f_upper[short] = (
+                    self.power(upper[short], active[short])
+                    - self.adjusted_power[active[short]]
+                )
+            # the closed-form bound can land a rounding error below target
+            bracketed = f_upper > -self.tolerance
+            converged = self.illinois(lower, upper, f_upper, active, bracketed)
+
+        results = [
+            ScalingFactorResult(
                 converged=True,
                 error="",
                 upper_bound_achieved=False,
                 scaling_factor=0,
             )
-        scaling_factor = 1
-        current_power = self.power(scaling_factor)
-        # First find minimum n_t_prime such that power is greater than 0.8
-        for _ in range(self.max_iters_scaling_factor):
-            if current_power < self.adjusted_power:
-                scaling_factor *= 2
-                current_power = self.power(scaling_factor)
+        ] * n_cells
+        for k, cell in enumerate(active):
+            if not bracketed[k]:
+                results[cell] = ScalingFactorResult(
+                    converged=False,
+                    error="could not find upper bound for scaling factor",
+                    upper_bound_achieved=True,
+                    scaling_factor=None,
+                )
             else:
+                results[cell] = ScalingFactorResult(
+                    converged=bool(converged[k]),
+                    error="" if converged[k] else "root search did not converge",
+                    scaling_factor=float(upper[k]) if converged[k] else None,
+                    upper_bound_achieved=False,
+                )
+        return results
+
+    def illinois(
+        self,
+        lower: np.ndarray,
+        upper: np.ndarray,
+        f_upper: np.ndarray,
+        cells: np.ndarray,
+        bracketed: np.ndarray,
+    ) -> np.ndarray:
+        """Illinois regula falsi on power - adjusted_power over [lower, upper],
+        where power(lower) is below target. Leaves each root in `upper`."""
+        f_lower = self.power(lower, cells) - self.adjusted_power[cells]
+        converged = ~bracketed | (np.abs(f_upper) < self.tolerance)
+        for _ in range(self.max_iters):
+            active = ~converged
+            if not np.any(active):
                 break
-        if current_power < self.adjusted_power:
-            return ScalingFactorResult(
-                converged=False,
-                error="could not find upper bound for scaling factor",
-                upper_bound_achieved=True,
-                scaling_factor=None,
+            a, b = lower[active], upper[active]
+            fa, fb = f_lower[active], f_upper[active]
+            c = b - fb * (b - a) / (fb - fa)
+            fc = self.power(c, cells[active]) - self.adjusted_power[cells[active]]
+            # keep the root bracketed between b and c; halve the stale endpoint
+            crossed = np.sign(fc) != np.sign(fb)
+            lower[active] = np.where(crossed, b, a)
+            f_lower[active] = np.where(crossed, fb, fa / 2)
+            upper[active] = c
+            f_upper[active] = fc
+            converged[active] = (np.abs(fc) < self.tolerance) | (
+                np.abs(c - np.where(crossed, b, a)) <= 1e-12 * np.abs(c)
             )
-        # Then perform grid search
-        scaling_factor_lower = 0
-        scaling_factor_upper = scaling_factor
-        diff = current_power - self.adjusted_power
-        tolerance = 1e-5  # change to property later
-        iteration = 0
-        for iteration in range(self.max_iters):  # change max_iters to property later
-            if diff > 0:
-                scaling_factor_upper = scaling_factor
-            else:
-                scaling_factor_lower = scaling_factor
-            scaling_factor = 0.5 * (scaling_factor_lower + scaling_factor_upper)
-            current_power = self.power(scaling_factor)
-            diff = current_power - self.adjusted_power
-            if abs(diff) < tolerance:
-                break
-        converged = iteration < self.max_iters - 1
-        error = "" if converged else "bisection search did not converge"
-        if error:
-            raise ValueError(
-                [
-                    current_power,
-                    self.adjusted_power,
-                    diff,
-                    scaling_factor,
-                    scaling_factor_lower,
-                    scaling_factor_upper,
-                ]
+        return converged & bracketed
+
+    def calculate_sample_sizes(self) -> List[AdditionalSampleSizeNeededResult]:
+        scaling_factors = self.calculate_scaling_factors()
+        return [
+            (
+                cell._default_output(cell.test_result.errorMessage, "unsuccessful")
+                if cell.test_result.errorMessage
+                else cell.sample_size_result(scaling_factor)
             )
-        return ScalingFactorResult(
-            converged=converged,
-            error=error,
-            scaling_factor=scaling_factor,
-            upper_bound_achieved=False,
-        )
+            for cell, scaling_factor in zip(self.cells, scaling_factors)
+        ]
@@ -0,0 +1,165 @@
+import dataclasses
+from dataclasses import replace
+from typing import Literal, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from pydantic.dataclasses import dataclass
+
+from gbstats.bayesian.tests import GaussianPrior
+from gbstats.frequentist.quantiles import norm_ppf
+from gbstats.models.statistics import (
+    ProportionStatistic,
+    RatioStatistic,
+    RegressionAdjustedStatistic,
+    SampleMeanStatistic,
+)
+from gbstats.power.midexperimentpower import effect_power
+
+PlanningStatistic = Union[
+    ProportionStatistic,
+    SampleMeanStatistic,
+    RatioStatistic,
+    RegressionAdjustedStatistic,
+]
+
+
+@dataclass
+class PowerPlanningConfig:
+    target_power: float = 0.8
+    alpha: float = 0.05
+    difference_type: Literal["relative", "absolute"] = "relative"
+    num_goal_metrics: int = 1
+    p_value_corrected: bool = False
+    prior_effect: Optional[GaussianPrior] = None
+    sequential: bool = False
+    sequential_tuning_parameter: float = 5000
+    traffic_percentage: float = 1
+    max_days: int = 60
+
+
+@dataclasses.dataclass
+class PowerPlanningResult:
+    """Power over the planning grid.
+
+    power has shape (metrics, traffic splits, mdes, days) and holds, for each
+    day of the experiment, the power of the least powered treatment arm.
+    required_days and required_users have shape (metrics, traffic splits,
+    mdes), and are NaN where the adjusted target power is not reached within
+    max_days.
+    """
+
+    days: np.ndarray
+    mdes: np.ndarray
+    traffic_splits: np.ndarray
+    power: np.ndarray
+    required_days: np.ndarray
+    required_users: np.ndarray
+
+
+def unit_moments(stat: PlanningStatistic) -> Tuple[float, float]:
+    """Mean and per-unit variance of a metric, CUPED-adjusted for
+    RegressionAdjustedStatistic (with the variance-minimizing theta unless one
+    is supplied)."""
+    if isinstance(stat, RegressionAdjustedStatistic):
+        theta = stat.theta
+        if theta is None:
+            pre_variance = stat.pre_statistic.variance
+            theta = stat.covariance / pre_variance if pre_variance > 0 else 0
+        return stat.unadjusted_mean, replace(stat, theta=theta).variance
+    return stat.mean, stat.variance
+
+
+def plan_experiment(
+    stats: Sequence[PlanningStatistic],
+    historical_days: float,
+    mdes: Sequence[float],
+    traffic_splits: Optional[Sequence[Sequence[float]]] = None,
+    num_variations: int = 2,
+    config: PowerPlanningConfig = PowerPlanningConfig(),
+) -> PowerPlanningResult:
+    """Power curves and required durations for a grid of experiment designs.
+
+    Args:
+        stats: Historical statistics of each metric over `historical_days`;
+            their sample size sets the daily traffic.
+        historical_days: Length of the window the statistics cover.
+        mdes: Effects to detect, relative or absolute per config.difference_type.
+        traffic_splits: Candidate variation weights, control first. Defaults
+            to an equal split.
+        num_variations: Number of variations, including control.
+        config: Test settings.
+
+    Returns:
+        A PowerPlanningResult over every metric, split, MDE and day.
+    """
+    if traffic_splits is None:
+        traffic_splits = [[1 / num_variations] * num_variations]
+    splits = np.array(traffic_splits, dtype=float)
+    if splits.ndim != 2 or splits.shape[1] != num_variations or num_variations < 2:
+        raise ValueError(
+            f"Each traffic split needs one weight per variation ({num_variations})."
+        )
+    if np.any(splits <= 0):
+        raise ValueError("Traffic split weights must be positive.")
+    splits = splits / splits.sum(axis=1, keepdims=True)
+    if historical_days <= 0:
+        raise ValueError("historical_days must be positive.")
+
+    moments = np.array([unit_moments(stat) for stat in stats], dtype=float)
+    mean, variance = moments[:, 0], moments[:, 1]
+    users_per_day = (
+        np.array([stat.n for stat in stats], dtype=float)
+        * config.traffic_percentage
+        / historical_days
+    )
+    days = np.arange(1, config.max_days + 1)
+    mde_grid = np.abs(np.array(mdes, dtype=float))
+
+    # axes: (metric, split, mde, day, treatment)
+    users = (users_per_day[:, None] * days)[:, None, None, :, None]
+    n_control = users * splits[:, 0][None, :, None, None, None]
+    n_treatment = users * splits[:, 1:][None, :, None, None, :]
+    var = variance[:, None, None, None, None]
+    mde = mde_grid[None, None, :, None, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if config.difference_type == "relative":
+            mn = mean[:, None, None, None, None]
+            effect_variance = (
+                var / n_treatment + var * (1 + mde) ** 2 / n_control
+            ) / mn**2
+        else:
+            effect_variance = var / n_treatment + var / n_control
+
+        num_tests = (
+            (num_variations - 1) * config.num_goal_metrics
+            if config.p_value_corrected
+            else 1
+        )
+        prior = config.prior_effect
+        proper = bool(prior and prior.proper)
+        power = effect_power(
+            effect_variance,
+            n_control + n_treatment,
+            mde,
+            np.asarray(norm_ppf(1 - config.alpha / (2 * num_tests))),
+            prior_mean=np.array(prior.mean if prior and proper else 0.0),
+            prior_variance=np.array(prior.variance if prior and proper else 1.0),
+            proper=np.array(proper),
+            sequential=np.array(config.sequential),
+            sequential_tuning_parameter=np.array(config.sequential_tuning_parameter),
+            sequential_alpha=np.array(config.alpha / num_tests),
+        ).min(axis=4)
+
+    adjusted_power = config.target_power ** (1 / config.num_goal_metrics)
+    reached = power >= adjusted_power
+    required_days = np.where(
+        reached.any(axis=3), days[np.argmax(reached, axis=3)], np.nan
+    )
+    return PowerPlanningResult(
+        days=days,
+        mdes=np.array(mdes, dtype=float),
+        traffic_splits=splits,
+        power=power,
+        required_days=required_days,
+        required_users=required_days * users_per_day[:, None, None],
+    )
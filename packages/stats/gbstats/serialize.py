@@ -0,0 +1,31 @@
+import dataclasses
+import json
+from typing import Any, Dict, Tuple
+
+# Field names per dataclass type, looked up once instead of on every instance
+_FIELD_NAMES: Dict[type, Tuple[str, ...]] = {}
+
+
+def _field_names(value: Any) -> Tuple[str, ...]:
+    names = _FIELD_NAMES.get(type(value))
+    if names is None:
+        names = tuple(f.name for f in dataclasses.fields(value))
+        _FIELD_NAMES[type(value)] = names
+    return names
+
+
+def _dataclass_fields(value: Any) -> Dict[str, Any]:
+    # json.dumps default hook: a shallow dict, the encoder recurses into it
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {name: getattr(value, name) for name in _field_names(value)}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> str:
+    """Serialize results (dataclasses, lists, dicts) to a JSON string.
+
+    Byte-identical to json.dumps(asdict(value), allow_nan=True), without the
+    deep copy: the default hook hands the encoder each dataclass's fields as
+    a shallow dict. NaN and infinities are written as NaN/Infinity/-Infinity.
+    """
+    return json.dumps(value, allow_nan=True, default=_dataclass_fields)
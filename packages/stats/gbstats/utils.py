@@ -1,14 +1,15 @@
 import importlib.metadata
-from typing import List, Optional, Tuple
+from typing import List, Optional, Sequence, Tuple
 
 import packaging.version
 import numpy as np
 from scipy.stats import truncnorm
 from scipy.stats.distributions import chi2  # type: ignore
-from scipy.stats import norm  # type: ignore
 import scipy.linalg as la
 from dataclasses import dataclass
 
+from gbstats.frequentist.quantiles import norm_ppf
+
 
 def check_gbstats_compatibility(nb_version: str) -> None:
     gbstats_version = importlib.metadata.version("gbstats")
@@ -59,6 +60,11 @@ def truncated_normal_mean(mu, sigma, a, b) -> float:
 def variance_of_ratios(mean_m, var_m, mean_d, var_d, cov_m_d) -> float:
     if mean_d == 0:
         return 0
+    return delta_method_ratio_variance(mean_m, var_m, mean_d, var_d, cov_m_d)
+
+
+# unguarded delta method variance of mean_m / mean_d; works elementwise on arrays
+def delta_method_ratio_variance(mean_m, var_m, mean_d, var_d, cov_m_d):
     return (
         var_m / mean_d**2
         + var_d * mean_m**2 / mean_d**4
@@ -68,27 +74,52 @@ def variance_of_ratios(mean_m, var_m, mean_d, var_d, cov_m_d) -> float:
 
 # Run a chi-squared test to make sure the observed traffic split matches the expected one
 def check_srm(users: List[int], weights: List[float]) -> float:
-    # Convert count of users into ratios
-    total_observed = sum(users)
-    if not total_observed:
-        return 1
+    return check_srm_bulk([users], weights)[0]
+
+
+def check_srm_bulk(
+    users: Sequence[Sequence[float]], weights: List[float]
+) -> np.ndarray:
+    """
+    SRM p-values for many traffic splits at once.
 
-    total_weight = sum(weights)
-    x = 0
-    for i, o in enumerate(users):
-        if weights[i] <= 0:
-            continue
-        e = weights[i] / total_weight * total_observed
-        x = x + ((o - e) ** 2) / e
+    Args:
+        users: dimensions x variations array of user counts.
+        weights: expected traffic weight of each variation.
 
-    return chi2.sf(x, len(users) - 1)  # type: ignore
+    Returns:
+        One p-value per row of users, 1 for rows without any users.
+    """
+    users_array = np.asarray(users, dtype=float)
+    weights_array = np.asarray(weights, dtype=float)
+    num_variations = users_array.shape[1]
+    if len(weights_array) < num_variations:
+        raise ValueError(
+            f"SRM check needs a weight per variation, got {len(weights_array)} weights for {num_variations} variations"
+        )
+    # as in the single split check, extra weights only count towards the total
+    total_weight = weights_array.sum()
+    weights_array = weights_array[:num_variations]
+    total_observed = users_array.sum(axis=1)
+    # variations without traffic are left out of the statistic
+    positive = weights_array > 0
+    expected = weights_array[positive] / total_weight * total_observed[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = (((users_array[:, positive] - expected) ** 2) / expected).sum(axis=1)
+    p_values = chi2.sf(x, users_array.shape[1] - 1)
+    return np.where(total_observed == 0, 1.0, p_values)
 
 
 def gaussian_credible_interval(
     mean_diff: float, std_diff: float, alpha: float
 ) -> Tuple[float, float]:
-    ci = norm.ppf([alpha / 2, 1 - alpha / 2], mean_diff, std_diff)
-    return (ci[0], ci[1])
+    # same as norm.ppf(q, mean_diff, std_diff), which is NaN unless std_diff > 0
+    if not std_diff > 0:
+        return (np.nan, np.nan)
+    return (
+        norm_ppf(alpha / 2) * std_diff + mean_diff,
+        norm_ppf(1 - alpha / 2) * std_diff + mean_diff,
+    )
 
 
 def weighted_mean(
@@ -182,3 +213,28 @@ def invert_symmetric_matrix(v: np.ndarray) -> MatrixInversionResult:
         return MatrixInversionResult(
             success=False, error=f"An unexpected error occurred: {e}"
         )
+
+
+def stacked_cholesky_gram(v: np.ndarray, b: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Computes b[k].T inv(v[k]) b[k] for a stack of symmetric positive-definite
+    matrices without forming the inverses.
+
+    Args:
+        v: K x p x p array of symmetric positive-definite matrices.
+        b: K x p x q array of right-hand sides.
+
+    Returns:
+        The K x q x q array of quadratic forms, or None if any matrix is not
+        finite and positive-definite, in which case callers should fall back to
+        invert_symmetric_matrix cell by cell.
+    """
+    if not (np.isfinite(v).all() and np.isfinite(b).all()):
+        return None
+    try:
+        # with v = L L^T, b^T inv(v) b = (inv(L) b)^T (inv(L) b)
+        v_cholesky = np.linalg.cholesky(v)
+    except np.linalg.LinAlgError:
+        return None
+    w = np.linalg.solve(v_cholesky, b)
+    return np.einsum("kpi,kpj->kij", w, w)
@@ -0,0 +1,62 @@
+from unittest import TestCase, main as unittest_main
+
+import numpy as np
+
+from gbstats.frequentist.multiple_testing import (
+    adjust_p_values,
+    adjusted_confidence_intervals,
+    benjamini_hochberg,
+    holm_bonferroni,
+)
+
+P_VALUES = np.array([0.04, 0.001, 0.3, 0.04, 0.02, 0.9])
+
+
+class TestAdjustPValues(TestCase):
+    def test_holm_bonferroni(self):
+        np.testing.assert_allclose(
+            holm_bonferroni(P_VALUES), [0.16, 0.006, 0.6, 0.16, 0.1, 0.9]
+        )
+
+    def test_benjamini_hochberg(self):
+        np.testing.assert_allclose(
+            benjamini_hochberg(P_VALUES), [0.06, 0.006, 0.36, 0.06, 0.06, 0.9]
+        )
+
+    def test_adjusted_values_are_capped_and_never_smaller(self):
+        p_values = np.random.default_rng(20).uniform(size=50) ** 3
+        for method in ["holm-bonferroni", "benjamini-hochberg"]:
+            adjusted = adjust_p_values(p_values, method)  # type: ignore
+            self.assertTrue(np.all(adjusted >= p_values))
+            self.assertTrue(np.all(adjusted <= 1))
+            # order is preserved
+            order = np.argsort(p_values)
+            self.assertTrue(np.all(np.diff(adjusted[order]) >= 0))
+        self.assertEqual(len(adjust_p_values(np.array([]), "holm-bonferroni")), 0)
+        with self.assertRaises(ValueError):
+            adjust_p_values(P_VALUES, "bonferroni")  # type: ignore
+
+
+class TestAdjustedConfidenceIntervals(TestCase):
+    def test_intervals_only_widen(self):
+        lift = np.array([0.1, 0.1, 0.1, 0.0])
+        p_adjusted = np.array([0.02, 0.002, 1.0, 0.5])
+        lower, upper = adjusted_confidence_intervals(
+            p_adjusted,
+            lift,
+            np.array([0.02, 0.02, 0.02, -0.1]),
+            np.array([0.18, 0.18, 0.18, 0.1]),
+            0.05,
+        )
+        # p = 0.02 implies a standard error of 0.1 / 2.326 and a wider interval
+        np.testing.assert_allclose(
+            [lower[0], upper[0]], [0.1 - 0.08425, 0.1 + 0.08425], atol=1e-5
+        )
+        # narrower intervals and zero lifts keep the original interval
+        np.testing.assert_array_equal(lower[[1, 3]], [0.02, -0.1])
+        np.testing.assert_array_equal(upper[[1, 3]], [0.18, 0.1])
+        self.assertEqual((lower[2], upper[2]), (-np.inf, np.inf))
+
+
+if __name__ == "__main__":
+    unittest_main()
@@ -20,6 +20,7 @@ from gbstats.messages import (
 )
 
 from gbstats.models.statistics import (
+    ProportionStatistic,
     RegressionAdjustedStatistic,
     SampleMeanStatistic,
     RatioStatistic,
@@ -28,12 +29,20 @@ from gbstats.models.statistics import (
 from gbstats.models.tests import (
     EffectMomentsResult,
     TestStatistic,
-    ProportionStatistic,
     EffectMomentsConfig,
     EffectMoments,
-    EffectMomentsPostStratification,
     sum_stats,
+)
+from gbstats.models.post_stratification import (
+    CreateStrataResult,
+    CreateStrataResultRatio,
+    CreateStrataResultRegressionAdjusted,
+    CreateStrataResultRegressionAdjustedRatio,
+    EffectMomentsPostStratification,
     PostStratificationSummary,
+    StrataMoments,
+    column_variances,
+    statistic_columns,
 )
 from gbstats.frequentist.tests import (
     FrequentistConfig,
@@ -937,6 +946,221 @@ class TestPostStratification(TestCase):
                 self.assertTrue(result.post_stratification_applied)
                 self.assertAlmostEqual(result.point_estimate, expected_relative_lift)
 
+    def test_stacked_moments_match_cell_results(self):
+        for create_class, stats in [
+            (CreateStrataResult, self.stats_count_strata),
+            (CreateStrataResultRatio, self.stats_ratio_strata),
+            (CreateStrataResultRegressionAdjusted, self.stats_count_reg_strata),
+            (CreateStrataResultRegressionAdjustedRatio, self.stats_ratio_reg_strata),
+        ]:
+            with self.subTest(create_class=create_class.__name__):
+                stacked = create_class.compute_moments(stats)  # type: ignore
+                expected = StrataMoments.from_strata_results(
+                    [create_class(*cell).compute_result() for cell in stats]  # type: ignore
+                )
+                self.assertIsNone(stacked.error_message)
+                np.testing.assert_array_equal(stacked.n, expected.n)
+                np.testing.assert_allclose(stacked.alpha, expected.alpha, rtol=1e-8)
+                np.testing.assert_allclose(
+                    stacked.alpha_cov, expected.alpha_cov, rtol=1e-8
+                )
+
+    def test_stacked_moments_fall_back_per_cell(self):
+        # a cell without covariate variance uses the unadjusted estimate
+        stat_a, stat_b = self.stats_count_reg_strata[0]
+        fallback_cell = (
+            replace(
+                stat_a,
+                pre_statistic=SampleMeanStatistic(n=stat_a.n, sum=0, sum_squares=0),
+            ),
+            replace(
+                stat_b,
+                pre_statistic=SampleMeanStatistic(n=stat_b.n, sum=0, sum_squares=0),
+            ),
+        )
+        stats = [fallback_cell] + self.stats_count_reg_strata[1:]
+        stacked = CreateStrataResultRegressionAdjusted.compute_moments(stats)  # type: ignore
+        expected = StrataMoments.from_strata_results(
+            [CreateStrataResultRegressionAdjusted(*cell).compute_result() for cell in stats]  # type: ignore
+        )
+        self.assertIsNone(stacked.error_message)
+        np.testing.assert_allclose(stacked.alpha, expected.alpha, rtol=1e-8)
+        np.testing.assert_allclose(stacked.alpha_cov, expected.alpha_cov, rtol=1e-8)
+
+    def test_combine_cells_for_analysis_matches_cell_by_cell(self):
+        def combine_cell_by_cell(stats):
+            sorted_cells = sorted(stats, key=lambda x: x[0].n + x[1].n, reverse=True)
+            cells = [sorted_cells[0]]
+            for stat_a, stat_b in sorted_cells[1:]:
+                if EffectMomentsPostStratification.is_cell_viable(stat_a, stat_b):
+                    cells.append((stat_a, stat_b))
+                else:
+                    cells[0] = (cells[0][0] + stat_a, cells[0][1] + stat_b)
+            return cells
+
+        single = SampleMeanStatistic(n=1, sum=2, sum_squares=4)
+        small = SampleMeanStatistic(n=3, sum=6, sum_squares=14)
+        sparse_cells = {
+            "count": [(single, single), (ProportionStatistic(n=4, sum=0), small)],
+            "ratio": [
+                (
+                    RatioStatistic(
+                        n=1,
+                        m_statistic=single,
+                        d_statistic=single,
+                        m_d_sum_of_products=4,
+                    ),
+                )
+                * 2
+            ],
+            "count_reg": [
+                (
+                    RegressionAdjustedStatistic(
+                        n=1,
+                        post_statistic=single,
+                        pre_statistic=single,
+                        post_pre_sum_of_products=4,
+                        theta=None,
+                    ),
+                )
+                * 2
+            ],
+            "ratio_reg": [
+                (
+                    RegressionAdjustedRatioStatistic(
+                        n=3,
+                        m_statistic_post=small,
+                        d_statistic_post=replace(small, sum=5),
+                        m_statistic_pre=replace(small, sum_squares=20),
+                        d_statistic_pre=small,
+                        m_post_m_pre_sum_of_products=15,
+                        d_post_d_pre_sum_of_products=12,
+                        m_pre_d_pre_sum_of_products=13,
+                        m_post_d_post_sum_of_products=11,
+                        m_post_d_pre_sum_of_products=14,
+                        m_pre_d_post_sum_of_products=10,
+                        theta=None,
+                    ),
+                )
+                * 2
+            ],
+        }
+        for name, stats in [
+            ("count", self.stats_count_strata),
+            ("ratio", self.stats_ratio_strata),
+            ("count_reg", self.stats_count_reg_strata),
+            ("ratio_reg", self.stats_ratio_reg_strata),
+        ]:
+            with self.subTest(name=name):
+                cells = sparse_cells[name] + stats
+                combined = EffectMomentsPostStratification.combine_cells_for_analysis(
+                    cells  # type: ignore
+                )
+                expected = combine_cell_by_cell(cells)
+                self.assertEqual(len(combined), len(stats))
+                self.assertEqual(len(combined), len(expected))
+                for cell, expected_cell in zip(combined, expected):
+                    for stat, expected_stat in zip(cell, expected_cell):
+                        self.assertEqual(type(stat), type(expected_stat))
+                        self.assertEqual(stat.n, expected_stat.n)
+                        self.assertAlmostEqual(stat.mean, expected_stat.mean)
+                        self.assertAlmostEqual(stat.variance, expected_stat.variance)
+
+    def test_column_variances_match_statistic_variances(self):
+        # edge cases: no units, one unit, zero sums and proportions
+        counts = [
+            SampleMeanStatistic(n=0, sum=0, sum_squares=0),
+            SampleMeanStatistic(n=1, sum=2, sum_squares=4),
+            SampleMeanStatistic(n=3, sum=6, sum_squares=14),
+            SampleMeanStatistic(n=5, sum=0, sum_squares=0),
+            SampleMeanStatistic(n=40, sum=-12.5, sum_squares=90.25),
+            ProportionStatistic(n=0, sum=0),
+            ProportionStatistic(n=1, sum=1),
+            ProportionStatistic(n=4, sum=0),
+            ProportionStatistic(n=4, sum=4),
+            ProportionStatistic(n=30, sum=11),
+        ]
+        pairs = [(a, b) for a in counts for b in counts if a.n == b.n]
+        stats = {
+            "count": counts,
+            "ratio": [
+                RatioStatistic(
+                    n=a.n, m_statistic=a, d_statistic=b, m_d_sum_of_products=p
+                )
+                for a, b in pairs
+                for p in [0, 3.5]
+            ],
+            "count_reg": [
+                RegressionAdjustedStatistic(
+                    n=a.n,
+                    post_statistic=a,
+                    pre_statistic=b,
+                    post_pre_sum_of_products=p,
+                    theta=theta,
+                )
+                for a, b in pairs
+                if type(a) == type(b)
+                for p in [0, 3.5]
+                for theta in [None, 0.4]
+            ],
+            "ratio_reg": [
+                RegressionAdjustedRatioStatistic(
+                    n=a.n,
+                    m_statistic_post=a,
+                    d_statistic_post=b,
+                    m_statistic_pre=a,
+                    d_statistic_pre=b,
+                    m_post_m_pre_sum_of_products=p,
+                    d_post_d_pre_sum_of_products=p + 1,
+                    m_pre_d_pre_sum_of_products=p + 2,
+                    m_post_d_post_sum_of_products=p + 3,
+                    m_post_d_pre_sum_of_products=p + 4,
+                    m_pre_d_post_sum_of_products=p + 5,
+                    theta=theta,
+                )
+                for a, b in pairs
+                for p in [0, 3.5]
+                for theta in [None, 0.4]
+            ],
+        }
+        for name, stat_list in stats.items():
+            with self.subTest(name=name):
+                stat_type = type(stat_list[0])
+                columns = statistic_columns(stat_list)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    variances = column_variances(stat_type, columns)
+                np.testing.assert_allclose(
+                    variances,
+                    [stat.variance for stat in stat_list],
+                    rtol=1e-12,
+                    atol=1e-12,
+                )
+                np.testing.assert_array_equal(
+                    EffectMomentsPostStratification.viable_cells(
+                        stat_type, columns, statistic_columns(stat_list[::-1])
+                    ),
+                    [
+                        EffectMomentsPostStratification.is_cell_viable(a, b)
+                        for a, b in zip(stat_list, stat_list[::-1])
+                    ],
+                )
+
+    def test_max_strata_merges_smallest_cells(self):
+        stats = self.stats_count_strata
+        sorted_cells = sorted(stats, key=lambda x: x[0].n + x[1].n, reverse=True)
+        largest_a, largest_b = sum_stats([sorted_cells[0]] + sorted_cells[2:])
+        result = EffectMomentsPostStratification(
+            stats,  # type: ignore
+            EffectMomentsConfig(difference_type="relative", max_strata=2),
+        ).compute_result()
+        expected = EffectMomentsPostStratification(
+            [(largest_a, largest_b), sorted_cells[1]],  # type: ignore
+            self.moments_config_rel,
+        ).compute_result()
+        self.assertDictEqual(
+            _round_result_dict(asdict(result)), _round_result_dict(asdict(expected))
+        )
+
     def test_zero_negative_variance(self):
         stats_count_strata = [
             (
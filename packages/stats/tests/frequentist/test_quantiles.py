@@ -0,0 +1,59 @@
+from unittest import TestCase, main as unittest_main
+
+import numpy as np
+from scipy.stats import norm, t
+
+from gbstats.frequentist import quantiles
+from gbstats.frequentist.quantiles import (
+    clear_quantile_caches,
+    norm_ppf,
+    sequential_rho,
+    t_ppf,
+)
+from gbstats.utils import gaussian_credible_interval
+
+
+class TestQuantiles(TestCase):
+    def setUp(self):
+        clear_quantile_caches()
+
+    def test_matches_scipy(self):
+        for q in [0.025, 0.95, 0.975, 0.9999]:
+            self.assertEqual(norm_ppf(q), norm.ppf(q))
+            for dof in [1.5, 27.3, 1234.567, 1e7]:
+                self.assertEqual(t_ppf(q, dof), t.ppf(q, dof))
+
+    def test_repeated_lookups_hit_cache(self):
+        for _ in range(5):
+            t_ppf(0.975, 154.2)
+            norm_ppf(np.float64(0.975))
+            sequential_rho(0.05, 5000)
+        self.assertEqual(quantiles._cached_t_ppf.cache_info().misses, 1)
+        self.assertEqual(quantiles._cached_t_ppf.cache_info().hits, 4)
+        self.assertEqual(quantiles._cached_norm_ppf.cache_info().hits, 4)
+        self.assertEqual(quantiles._cached_sequential_rho.cache_info().hits, 4)
+        # distinct sidedness is a distinct key
+        self.assertNotEqual(
+            sequential_rho(0.05, 5000), sequential_rho(0.05, 5000, two_sided=False)
+        )
+
+    def test_arrays_bypass_cache(self):
+        alpha = np.array([0.05, 0.01])
+        np.testing.assert_array_equal(
+            sequential_rho(alpha, 5000),
+            [sequential_rho(0.05, 5000), sequential_rho(0.01, 5000)],
+        )
+        np.testing.assert_array_equal(norm_ppf(alpha), norm.ppf(alpha))
+        self.assertEqual(quantiles._cached_norm_ppf.cache_info().currsize, 0)
+
+    def test_gaussian_credible_interval_matches_scipy(self):
+        for mean, std in [(0.1, 0.02), (-3.0, 1.5)]:
+            expected = norm.ppf([0.025, 0.975], mean, std)
+            self.assertEqual(
+                gaussian_credible_interval(mean, std, 0.05), tuple(expected)
+            )
+        self.assertTrue(np.all(np.isnan(gaussian_credible_interval(0.1, 0, 0.05))))
+
+
+if __name__ == "__main__":
+    unittest_main()
@@ -12,7 +12,25 @@ from gbstats.models.settings import (
     AnalysisSettingsForStatsEngine,
 )
 
-from gbstats.devtools.simulation import CreateStatistic, CreateRow
+from gbstats.bayesian.tests import (
+    EffectBayesianABTest,
+    EffectBayesianConfig,
+    GaussianPrior,
+)
+from gbstats.devtools.batch_simulation import (
+    BatchSimulationStudy,
+    MeanStatisticArrays,
+)
+from gbstats.devtools.simulation import CreateStatistic, CreateRow, SimulationStudy
+from gbstats.devtools.sufficient_statistics import (
+    bernoulli_moments,
+    multivariate_normal_moments,
+    normal_moments,
+    statistic_from_moments,
+    streaming_moments,
+    unit_moments,
+)
+from gbstats.frequentist.tests import SequentialConfig, SequentialTwoSidedTTest
 from gbstats.gbstats import process_single_metric
 
 
@@ -160,3 +178,229 @@ class TestCreateRows(TestCase):
             self.results_gbstats[1].analyses[0].dimensions[0].variations[1].ci,
             self.res_3.ci,
         )
+
+
+BATCH_TESTS = {
+    "t_test_relative": (TwoSidedTTest, FrequentistConfig()),
+    "t_test_absolute": (TwoSidedTTest, FrequentistConfig(difference_type="absolute")),
+    "sequential": (
+        SequentialTwoSidedTTest,
+        SequentialConfig(sequential_tuning_parameter=1000),
+    ),
+    "bayesian_relative": (
+        EffectBayesianABTest,
+        EffectBayesianConfig(prior_effect=GaussianPrior(0.1, 0.2, True)),
+    ),
+    "bayesian_absolute": (
+        EffectBayesianABTest,
+        EffectBayesianConfig(
+            difference_type="absolute",
+            prior_effect=GaussianPrior(0.1, 0.2, True),
+        ),
+    ),
+}
+
+
+class NormalMeanStudy(BatchSimulationStudy):
+    def generate_data(self, rng, n_sim):
+        n, mu, delta = (self.data_params[k] for k in ["n", "mu", "delta"])
+        y_a = rng.normal(mu, 1, size=(n_sim, n))
+        y_b = rng.normal(mu + delta, 1, size=(n_sim, n))
+        return (
+            MeanStatisticArrays.from_units(y_a),
+            MeanStatisticArrays.from_units(y_b),
+            delta / mu,
+        )
+
+
+def single_chunk_data(study):
+    [(seed_sequence, n_sim)] = study.chunks()
+    return study.generate_data(np.random.default_rng(seed_sequence), n_sim)
+
+
+class TestBatchSimulationStudy(TestCase):
+    def test_kernels_match_tests(self):
+        study = NormalMeanStudy(
+            BATCH_TESTS, {"n": 20, "mu": 0.5, "delta": 0.1}, seed=20241218, n_sim=40
+        )
+        study.run_sim()
+        stat_a, stat_b, _ = single_chunk_data(study)
+        for i, pair in enumerate(zip(stat_a.to_statistics(), stat_b.to_statistics())):
+            for j, (test, config) in enumerate(BATCH_TESTS.values()):
+                result = test([pair], config).compute_result()
+                np.testing.assert_allclose(
+                    [study.pt[i, j], study.se[i, j]],
+                    [result.expected, result.uplift.stddev],
+                    rtol=1e-12,
+                )
+                np.testing.assert_allclose(
+                    [study.lower_limit[i, j], study.upper_limit[i, j]],
+                    result.ci,
+                    rtol=1e-12,
+                )
+
+    def test_kernels_return_default_output_on_errors(self):
+        # zero variance in control, an empty arm and a zero control mean
+        stat_a = MeanStatisticArrays(
+            n=np.array([10, 0, 10]),
+            sum=np.array([5.0, 0, 0]),
+            sum_squares=np.array([2.5, 0, 4]),
+        )
+        stat_b = MeanStatisticArrays(
+            n=np.array([10, 10, 10]),
+            sum=np.array([6.0, 6, 6]),
+            sum_squares=np.array([8.0, 8, 8]),
+        )
+        study = NormalMeanStudy(BATCH_TESTS, {}, seed=1)
+        for kernel, config in zip(study.kernels, study.configs):
+            result = kernel(stat_a, stat_b, config)
+            for value in [result.expected, result.ci_lower, result.ci_upper]:
+                np.testing.assert_array_equal(value, [0, 0, 0])
+
+    def test_metrics_match_loop_study(self):
+        batch = NormalMeanStudy(
+            BATCH_TESTS, {"n": 30, "mu": 1, "delta": 0.2}, seed=7, n_sim=25
+        )
+        batch.run_sim()
+        stat_a, stat_b, estimand = single_chunk_data(batch)
+        pairs = list(zip(stat_a.to_statistics(), stat_b.to_statistics()))
+
+        class LoopStudy(SimulationStudy):
+            def generate_data(self):
+                return (*pairs[self.i], estimand)
+
+            def run_iteration(self, i):
+                self.i = i
+                super().run_iteration(i)
+
+        loop = LoopStudy(BATCH_TESTS, {}, seed=7, n_sim=25)
+        loop.run_sim()
+        for metric in ["coverage", "reject", "mse", "bias", "variance"]:
+            np.testing.assert_allclose(
+                getattr(batch, metric), getattr(loop, metric), rtol=1e-10
+            )
+
+    def test_coverage(self):
+        study = NormalMeanStudy(
+            BATCH_TESTS, {"n": 200, "mu": 1, "delta": 0.0}, seed=3, n_sim=4000
+        )
+        study.run_sim()
+        self.assertEqual(study.pt.shape, (4000, len(BATCH_TESTS)))
+        # frequentist intervals cover the true effect about 95% of the time
+        np.testing.assert_allclose(study.coverage[:2], 0.95, atol=0.015)
+        self.assertGreater(study.coverage[2], 0.99)
+        np.testing.assert_allclose(study.reject[:2], 0.05, atol=0.015)
+
+    def test_chunks(self):
+        study = NormalMeanStudy(BATCH_TESTS, {}, seed=5, n_sim=2500, chunk_size=400)
+        chunks = study.chunks()
+        self.assertEqual([n for _, n in chunks], [400] * 6 + [100])
+        self.assertEqual(len({tuple(s.generate_state(4)) for s, _ in chunks}), 7)
+        with self.assertRaises(ValueError):
+            NormalMeanStudy(BATCH_TESTS, {}, seed=5, chunk_size=0)
+
+    def test_parallel_runs_are_reproducible(self):
+        params = {"n": 50, "mu": 1, "delta": 0.1}
+        runs = []
+        for n_workers in [1, 2, 3]:
+            study = NormalMeanStudy(
+                BATCH_TESTS, params, seed=11, n_sim=2500, chunk_size=400
+            )
+            study.run_sim(n_workers=n_workers)
+            runs.append(study)
+        for study in runs[1:]:
+            for attr in ["pt", "se", "lower_limit", "upper_limit", "theta"]:
+                np.testing.assert_array_equal(
+                    getattr(study, attr), getattr(runs[0], attr)
+                )
+            np.testing.assert_array_equal(study.coverage, runs[0].coverage)
+            np.testing.assert_array_equal(study.reject, runs[0].reject)
+
+
+class LargeNormalMeanStudy(BatchSimulationStudy):
+    def generate_data(self, rng, n_sim):
+        n, mu, delta = (self.data_params[k] for k in ["n", "mu", "delta"])
+        return (
+            MeanStatisticArrays.from_moments(normal_moments(rng, n, mu, 2, n_sim)),
+            MeanStatisticArrays.from_moments(
+                normal_moments(rng, n, mu + delta, 2, n_sim)
+            ),
+            delta / mu,
+        )
+
+
+class TestSufficientStatistics(TestCase):
+    def test_create_statistic_matches_unit_sums(self):
+        rng = np.random.default_rng(20241219)
+        y, x = rng.normal(size=(500, 2)), rng.normal(size=(500, 2))
+        stat = CreateStatistic(
+            "regression_adjusted_ratio", y, x, None
+        ).create_statistic()
+        expected = {
+            "m_post_m_pre_sum_of_products": np.sum(y[:, 0] * x[:, 0]),
+            "d_post_d_pre_sum_of_products": np.sum(y[:, 1] * x[:, 1]),
+            "m_pre_d_pre_sum_of_products": np.sum(x[:, 0] * x[:, 1]),
+            "m_post_d_post_sum_of_products": np.sum(y[:, 0] * y[:, 1]),
+            "m_post_d_pre_sum_of_products": np.sum(y[:, 0] * x[:, 1]),
+            "m_pre_d_post_sum_of_products": np.sum(x[:, 0] * y[:, 1]),
+        }
+        for attr, value in expected.items():
+            self.assertAlmostEqual(getattr(stat, attr), value, places=10)
+        self.assertAlmostEqual(stat.d_statistic_pre.sum_squares, np.sum(x[:, 1] ** 2))
+        ratio = CreateStatistic("ratio", y[:, 0], x[:, 0], None).create_statistic()
+        self.assertAlmostEqual(ratio.m_d_sum_of_products, np.sum(y[:, 0] * x[:, 0]))
+        with self.assertRaises(ValueError):
+            CreateStatistic("ratio", y[:, 0], None, None).create_statistic()
+        with self.assertRaises(ValueError):
+            statistic_from_moments("ratio", 500, np.zeros(3), np.zeros((3, 3)))
+
+    def test_streaming_matches_unit_moments(self):
+        def sampler(rng, size, m):
+            return rng.exponential(size=(size, m, 2))
+
+        streamed = streaming_moments(
+            np.random.default_rng(3), sampler, n=1000, size=1, chunk_size=300
+        )
+        # the chunks consume the same stream as a single draw
+        whole = unit_moments(sampler(np.random.default_rng(3), 1, 1000)[0])
+        self.assertEqual(streamed.n, 1000)
+        np.testing.assert_allclose(streamed.sums, whole.sums, rtol=1e-12)
+        np.testing.assert_allclose(
+            streamed.cross_products, whole.cross_products, rtol=1e-12
+        )
+
+    def test_multivariate_normal_moments_distribution(self):
+        n, size = 30, 20000
+        mean, cov = np.array([1.0, 2.0]), np.array([[1.0, 0.5], [0.5, 2.0]])
+        moments = multivariate_normal_moments(
+            np.random.default_rng(4), n, mean, cov, size
+        )
+        self.assertEqual(moments.cross_products.shape, (size, 2, 2))
+        sums = moments.sums
+        scatter = moments.cross_products - sums[:, :, None] * sums[:, None, :] / n
+        np.testing.assert_allclose(np.mean(sums, axis=0) / n, mean, atol=0.01)
+        np.testing.assert_allclose(np.cov(sums.T) / n, cov, rtol=0.05)
+        # the scatter matrix is Wishart(n - 1, cov)
+        np.testing.assert_allclose(np.mean(scatter, axis=0), (n - 1) * cov, rtol=0.02)
+        np.testing.assert_allclose(np.var(scatter[:, 0, 0]), 2 * (n - 1), rtol=0.05)
+        with self.assertRaises(ValueError):
+            multivariate_normal_moments(np.random.default_rng(4), 2, mean, cov)
+
+    def test_bernoulli_moments(self):
+        moments = bernoulli_moments(np.random.default_rng(5), 1000, 0.2, size=5000)
+        np.testing.assert_array_equal(
+            moments.cross_products[:, 0, 0], moments.sums[:, 0]
+        )
+        self.assertAlmostEqual(np.mean(moments.sums) / 1000, 0.2, places=3)
+        stat = moments.to_statistics("proportion")[0]
+        self.assertEqual((stat.n, stat.sum), (1000, moments.sums[0, 0]))
+
+    def test_large_n_study(self):
+        study = LargeNormalMeanStudy(
+            dict(list(BATCH_TESTS.items())[:2]),
+            {"n": 10**7, "mu": 1, "delta": 0.001},
+            seed=6,
+            n_sim=4000,
+        )
+        study.run_sim()
+        np.testing.assert_allclose(study.coverage, 0.95, atol=0.015)
@@ -1,8 +1,10 @@
 import dataclasses
+import json
 from functools import partial
 from unittest import TestCase, main as unittest_main
 import numpy as np
 import pandas as pd
+from scipy.stats import norm
 import copy
 
 from gbstats.gbstats import (
@@ -15,14 +17,31 @@ from gbstats.gbstats import (
     get_metric_dfs,
     variation_statistic_from_metric_row,
     process_analysis,
+    combine_core_and_supplemental_results,
     get_bandit_result,
     create_bandit_statistics,
     preprocess_bandits,
+    BanditExperimentStatistics,
+    bandit_result_from_response,
+    create_bandit,
+    get_bandit_results,
+    process_experiment_results,
+)
+from gbstats.frequentist.multiple_testing import adjust_p_values
+from gbstats.bayesian.bandits import (
+    Bandits,
+    BanditsSimple,
+    BanditConfig,
+    BanditState,
 )
-from gbstats.bayesian.bandits import BanditsSimple, BanditConfig
 
+from gbstats.devtools.sufficient_statistics import unit_moments
 from gbstats.models.settings import BanditWeightsSinglePeriod
 from gbstats.models.statistics import (
+    BanditPeriodDataCuped,
+    BanditPeriodDataRatio,
+    BanditPeriodDataSampleMean,
+    RatioStatistic,
     RegressionAdjustedStatistic,
     SampleMeanStatistic,
 )
@@ -431,6 +450,264 @@ class TestBanditMinVariationWeightFloor(TestCase):
         np.testing.assert_allclose(p, w, atol=1e-9)
 
 
+class TestBanditSampling(TestCase):
+    def setUp(self):
+        self.y = np.random.default_rng(7).normal(size=(500, 4))
+
+    def _bandit(
+        self,
+        inverse=False,
+        best_arm_method="monte_carlo",
+        top_two=False,
+        num_variations=3,
+    ):
+        stats = [
+            SampleMeanStatistic(n=1000, sum=100, sum_squares=2000),
+            SampleMeanStatistic(n=1000, sum=110, sum_squares=2000),
+            SampleMeanStatistic(n=400, sum=45, sum_squares=900),
+        ]
+        config = BanditConfig(
+            bandit_weights_seed=100,
+            top_two=top_two,
+            inverse=inverse,
+            best_arm_method=best_arm_method,
+        )
+        stats = stats[:num_variations]
+        return BanditsSimple(stats, [1 / num_variations] * num_variations, config)
+
+    def test_weights_reproducible_for_seed(self):
+        first = self._bandit().compute_result()
+        second = self._bandit().compute_result()
+        self.assertEqual(first.seed, 100)
+        self.assertEqual(first.bandit_weights, second.bandit_weights)
+
+    def test_top_two_weights_match_sorted_draws(self):
+        for inverse in [False, True]:
+            ranked = np.argsort(self.y, axis=1)
+            top_two = ranked[:, :2] if inverse else ranked[:, -2:]
+            expected = np.bincount(top_two.ravel(), minlength=4) / top_two.size
+            np.testing.assert_allclose(
+                Bandits.top_two_weights(self.y, inverse), expected, atol=1e-12
+            )
+
+    def test_two_arm_probabilities_match_normal_cdf(self):
+        for method in ["monte_carlo", "quadrature"]:
+            for inverse in [False, True]:
+                bandit = self._bandit(inverse, method, num_variations=2)
+                result = bandit.compute_result()
+                diff = bandit.posterior_mean[1] - bandit.posterior_mean[0]
+                p_one = norm.cdf(diff / np.sqrt(np.sum(bandit.posterior_variance)))
+                expected = 1 - p_one if inverse else p_one
+                delta = 0.02 if method == "monte_carlo" else 1e-9
+                self.assertAlmostEqual(
+                    result.best_arm_probabilities[1], expected, delta=delta
+                )
+
+    def test_quadrature_matches_monte_carlo(self):
+        for inverse in [False, True]:
+            for top_two in [False, True]:
+                mc_result = self._bandit(
+                    inverse, "monte_carlo", top_two
+                ).compute_result()
+                quad_result = self._bandit(
+                    inverse, "quadrature", top_two
+                ).compute_result()
+                self.assertAlmostEqual(
+                    sum(quad_result.best_arm_probabilities), 1.0, places=9
+                )
+                np.testing.assert_allclose(
+                    quad_result.best_arm_probabilities,
+                    mc_result.best_arm_probabilities,
+                    atol=0.02,
+                )
+                np.testing.assert_allclose(
+                    quad_result.bandit_weights, mc_result.bandit_weights, atol=0.02
+                )
+
+
+class TestGetBanditResults(TestCase):
+    def _mean_stats(self, sums):
+        return [SampleMeanStatistic(n=1000, sum=s, sum_squares=3 * s) for s in sums]
+
+    def _ratio_stats(self, sums):
+        return [
+            RatioStatistic(
+                n=1000,
+                m_statistic=SampleMeanStatistic(n=1000, sum=s, sum_squares=3 * s),
+                d_statistic=SampleMeanStatistic(n=1000, sum=900, sum_squares=1000),
+                m_d_sum_of_products=2 * s,
+            )
+            for s in sums
+        ]
+
+    def test_batch_matches_single_experiments(self):
+        inverse_metric = dataclasses.replace(COUNT_METRIC, inverse=True)
+        experiments = []
+        for seed in [100, 7]:
+            for top_two in [False, True]:
+                for metric, stats in [
+                    (COUNT_METRIC, self._mean_stats([100, 120, 110, 105])),
+                    (inverse_metric, self._mean_stats([100, 120, 110])),
+                    (RATIO_METRIC, self._ratio_stats([300, 320, 280])),
+                ]:
+                    settings = dataclasses.replace(
+                        BANDIT_ANALYSIS,
+                        current_weights=[1 / len(stats)] * len(stats),
+                        bandit_weights_seed=seed,
+                        top_two=top_two,
+                    )
+                    experiments.append(
+                        BanditExperimentStatistics(stats, metric, settings)
+                    )
+        results = get_bandit_results(experiments)
+        self.assertEqual(len(results), len(experiments))
+        for e, result in zip(experiments, results):
+            b = create_bandit(e.stats, e.metric, e.bandit_settings, 0.05)
+            expected = bandit_result_from_response(
+                b, b.compute_result(), e.bandit_settings
+            )
+            self.assertEqual(result, expected)
+
+    def test_missing_statistics_return_error(self):
+        settings = dataclasses.replace(BANDIT_ANALYSIS, current_weights=[0.5, 0.5])
+        ok = BanditExperimentStatistics(
+            self._mean_stats([100, 120]), COUNT_METRIC, settings
+        )
+        missing = BanditExperimentStatistics([], COUNT_METRIC, settings)
+        [missing_result, ok_result] = get_bandit_results([missing, ok])
+        self.assertEqual(missing_result.updatedWeights, [0.5, 0.5])
+        self.assertNotEqual(missing_result.error, "")
+        self.assertEqual(ok_result.error, "")
+
+
+class TestBanditState(TestCase):
+    def setUp(self):
+        self.config = BanditConfig(bandit_weights_seed=100, top_two=True)
+        self.periods = [
+            BanditPeriodDataSampleMean(
+                stats=[
+                    SampleMeanStatistic(n=n, sum=s, sum_squares=3 * s)
+                    for n, s in zip(ns, sums)
+                ],
+                weights=weights,
+            )
+            for ns, sums, weights in [
+                ([300, 300, 300], [30, 33, 36], [1 / 3] * 3),
+                ([200, 250, 450], [20, 26, 55], [0.2, 0.25, 0.55]),
+                ([100, 150, 650], [9, 16, 80], [0.1, 0.15, 0.75]),
+            ]
+        ]
+
+    def assert_period_weighted(self, state, periods):
+        # each period is weighted by its share of all users, as in the
+        # cumulative bandit query
+        period_users = [sum(stat.n for stat in period.stats) for period in periods]
+        weights = np.array(period_users) / sum(period_users)
+        for i, stat in enumerate(state.stats):
+            arm = [period.stats[i] for period in periods]
+            self.assertEqual(stat.n, sum(s.n for s in arm))
+            components = {
+                "sample_mean": lambda s: [s],
+                "ratio": lambda s: [s.m_statistic, s.d_statistic],
+                "regression_adjusted": lambda s: [s.post_statistic, s.pre_statistic],
+            }[state.statistic_type]
+            for component, period_components in zip(
+                components(stat), zip(*[components(s) for s in arm])
+            ):
+                self.assertAlmostEqual(
+                    component.mean,
+                    sum(w * c.mean for w, c in zip(weights, period_components)),
+                )
+                self.assertAlmostEqual(
+                    component.variance / stat.n,
+                    sum(
+                        w**2 * c.variance / c.n
+                        for w, c in zip(weights, period_components)
+                    ),
+                )
+            if state.statistic_type != "sample_mean":
+                self.assertAlmostEqual(
+                    stat.covariance / stat.n,
+                    sum(w**2 * s.covariance / s.n for w, s in zip(weights, arm)),
+                )
+
+    def test_updates_match_period_weighted_statistics(self):
+        state = BanditState.from_period(self.periods[0])
+        for period in self.periods[1:]:
+            state = state.update(period)
+        self.assertEqual(state.num_periods, 3)
+        self.assertEqual(state.current_weights, [0.1, 0.15, 0.75])
+        self.assert_period_weighted(state, self.periods)
+        expected = BanditsSimple(state.stats, [0.1, 0.15, 0.75], self.config)
+        self.assertEqual(state.compute_result(self.config), expected.compute_result())
+
+    def test_single_period_keeps_statistics(self):
+        state = BanditState.from_period(self.periods[1])
+        for stat, expected in zip(state.stats, self.periods[1].stats):
+            self.assertEqual(stat.n, expected.n)
+            self.assertAlmostEqual(stat.mean, expected.mean)
+            self.assertAlmostEqual(stat.variance, expected.variance)
+
+    def test_ratio_and_cuped_periods(self):
+        rng = np.random.default_rng(2024)
+
+        def units(n, mean, sd):
+            # correlated outcome and denominator / pre-period value
+            values = rng.normal(mean, sd, (n, 2))
+            values[:, 0] += 0.8 * values[:, 1]
+            return values
+
+        for statistic_type, period_type in [
+            ("ratio", BanditPeriodDataRatio),
+            ("regression_adjusted", BanditPeriodDataCuped),
+        ]:
+            with self.subTest(statistic_type=statistic_type):
+                periods = [
+                    period_type(
+                        stats=[
+                            unit_moments(
+                                units(n, [1 + i, 2], [1, 0.5 + p])
+                            ).to_statistics(statistic_type)[0]
+                            for i, n in enumerate(ns)
+                        ],
+                        weights=[0.5, 0.5],
+                    )
+                    for p, ns in enumerate([[50, 60], [200, 20], [10, 300]])
+                ]
+                state = BanditState.from_period(periods[0])
+                for period in periods[1:]:
+                    state = state.update(period)
+                self.assert_period_weighted(state, periods)
+                if statistic_type == "regression_adjusted":
+                    # theta pools each period over the variations
+                    pooled = [
+                        sum(period.stats[1:], period.stats[0]) for period in periods
+                    ]
+                    self.assertAlmostEqual(
+                        state.theta,
+                        sum(s.n**2 * s.covariance for s in pooled)
+                        / sum(s.n**2 * s.pre_statistic.variance for s in pooled),
+                    )
+                    self.assertTrue(all(s.theta == state.theta for s in state.stats))
+
+    def test_round_trips_through_json(self):
+        state = BanditState.from_period(self.periods[0]).update(self.periods[1])
+        restored = BanditState.from_dict(json.loads(json.dumps(state.to_dict())))
+        self.assertEqual(restored, state)
+        self.assertEqual(
+            restored.update(self.periods[2]).compute_result(self.config),
+            state.update(self.periods[2]).compute_result(self.config),
+        )
+
+    def test_mismatched_variations_raise(self):
+        state = BanditState.from_period(self.periods[0])
+        period = BanditPeriodDataSampleMean(
+            stats=self.periods[1].stats[:2], weights=[0.5, 0.5]
+        )
+        with self.assertRaises(ValueError):
+            state.update(period)
+
+
 class TestGetMetricDf(TestCase):
     def test_get_metric_dfs_missing_count(self):
         rows = MULTI_DIMENSION_STATISTICS_DF.drop("count", axis=1)
@@ -440,9 +717,42 @@ class TestGetMetricDf(TestCase):
             ["zero", "one"],
         )
         for d in dimension_metric_data:
-            for row in d.data.iterrows():
-                self.assertEqual(row[1]["baseline_count"], row[1]["baseline_users"])
-                self.assertEqual(row[1]["v1_count"], row[1]["v1_users"])
+            for row in d.data:
+                self.assertEqual(row["baseline_count"], row["baseline_users"])
+                self.assertEqual(row["v1_count"], row["v1_users"])
+
+    def test_get_metric_dfs_strata_codes(self):
+        def row(variation, browser, region):
+            return {
+                "dimension": "All",
+                "variation": variation,
+                "dim_exp_browser": browser,
+                "dim_exp_region": region,
+                "users": 10,
+                "count": 10,
+                "main_sum": 5,
+                "main_sum_squares": 5,
+            }
+
+        rows = [
+            row(variation, browser, region)
+            for variation in ["zero", "one"]
+            for browser, region in [
+                ("a_b", "c"),
+                ("a", "b_c"),
+                (None, "c"),
+                (float("nan"), "c"),
+            ]
+        ]
+        [dimension_metric_data] = get_metric_dfs(
+            rows, {"zero": 0, "one": 1}, ["zero", "one"], post_stratify=True
+        )
+        self.assertEqual(
+            [row["strata"] for row in dimension_metric_data.data], [0, 1, 2]
+        )
+        self.assertEqual(
+            [row["baseline_users"] for row in dimension_metric_data.data], [10, 10, 20]
+        )
 
 
 class TestVariationStatisticBuilder(TestCase):
@@ -540,16 +850,16 @@ class TestReduceDimensionality(TestCase):
         reduced_2 = reduce_dimensionality(df, num_variations=2, max=2)
 
         self.assertEqual(len(reduced_3), 3)
-        self.assertEqual(reduced_3[0].data.at[0, "dimension"], "three")
-        self.assertEqual(reduced_3[0].data.at[0, "v1_main_sum"], 222)
+        self.assertEqual(reduced_3[0].data[0]["dimension"], "three")
+        self.assertEqual(reduced_3[0].data[0]["v1_main_sum"], 222)
         self.assertEqual(len(reduced_2), 2)
-        self.assertEqual(reduced_2[1].data.at[0, "dimension"], "(other)")
-        self.assertEqual(reduced_2[1].data.at[0, "v1_main_sum"], 1070)
-        self.assertEqual(reduced_2[1].data.at[0, "v1_main_sum_squares"], 4440)
-        self.assertEqual(reduced_2[1].data.at[0, "v1_users"], 340)
-        self.assertEqual(reduced_2[1].data.at[0, "baseline_users"], 300)
-        self.assertEqual(reduced_2[1].data.at[0, "baseline_main_sum"], 1010)
-        self.assertEqual(reduced_2[1].data.at[0, "baseline_main_sum_squares"], 4464.38)
+        self.assertEqual(reduced_2[1].data[0]["dimension"], "(other)")
+        self.assertEqual(reduced_2[1].data[0]["v1_main_sum"], 1070)
+        self.assertEqual(reduced_2[1].data[0]["v1_main_sum_squares"], 4440)
+        self.assertEqual(reduced_2[1].data[0]["v1_users"], 340)
+        self.assertEqual(reduced_2[1].data[0]["baseline_users"], 300)
+        self.assertEqual(reduced_2[1].data[0]["baseline_main_sum"], 1010)
+        self.assertEqual(reduced_2[1].data[0]["baseline_main_sum_squares"], 4464.38)
 
     def test_reduce_dimensionality_ratio(self):
         rows = pd.concat(
@@ -563,48 +873,42 @@ class TestReduceDimensionality(TestCase):
 
         reduced_20 = reduce_dimensionality(df, num_variations=2, max=20)
         self.assertEqual(len(reduced_20), 2)
-        self.assertEqual(reduced_20[0].data.at[0, "dimension"], "one")
-        self.assertEqual(reduced_20[0].data.at[0, "v1_users"], 120)
-        self.assertEqual(reduced_20[0].data.at[0, "v1_main_sum"], 300)
-        self.assertEqual(reduced_20[0].data.at[0, "v1_main_sum_squares"], 869)
-        self.assertEqual(reduced_20[0].data.at[0, "v1_denominator_sum"], 500)
-        self.assertEqual(reduced_20[0].data.at[0, "v1_denominator_sum_squares"], 800)
+        self.assertEqual(reduced_20[0].data[0]["dimension"], "one")
+        self.assertEqual(reduced_20[0].data[0]["v1_users"], 120)
+        self.assertEqual(reduced_20[0].data[0]["v1_main_sum"], 300)
+        self.assertEqual(reduced_20[0].data[0]["v1_main_sum_squares"], 869)
+        self.assertEqual(reduced_20[0].data[0]["v1_denominator_sum"], 500)
+        self.assertEqual(reduced_20[0].data[0]["v1_denominator_sum_squares"], 800)
+        self.assertEqual(reduced_20[0].data[0]["v1_main_denominator_sum_product"], -905)
+        self.assertEqual(reduced_20[0].data[0]["baseline_users"], 100)
+        self.assertEqual(reduced_20[0].data[0]["baseline_main_sum"], 270)
+        self.assertEqual(reduced_20[0].data[0]["baseline_main_sum_squares"], 848.79)
+        self.assertEqual(reduced_20[0].data[0]["baseline_denominator_sum"], 510)
+        self.assertEqual(reduced_20[0].data[0]["baseline_denominator_sum_squares"], 810)
         self.assertEqual(
-            reduced_20[0].data.at[0, "v1_main_denominator_sum_product"], -905
-        )
-        self.assertEqual(reduced_20[0].data.at[0, "baseline_users"], 100)
-        self.assertEqual(reduced_20[0].data.at[0, "baseline_main_sum"], 270)
-        self.assertEqual(reduced_20[0].data.at[0, "baseline_main_sum_squares"], 848.79)
-        self.assertEqual(reduced_20[0].data.at[0, "baseline_denominator_sum"], 510)
-        self.assertEqual(
-            reduced_20[0].data.at[0, "baseline_denominator_sum_squares"], 810
-        )
-        self.assertEqual(
-            reduced_20[0].data.at[0, "baseline_main_denominator_sum_product"], -900
+            reduced_20[0].data[0]["baseline_main_denominator_sum_product"], -900
         )
 
         reduced_1 = reduce_dimensionality(df, num_variations=2, max=1)
         self.assertEqual(len(reduced_1), 1)
-        self.assertEqual(reduced_1[0].data.at[0, "dimension"], "(other)")
-        self.assertEqual(reduced_1[0].data.at[0, "v1_users"], 120 * 2)
-        self.assertEqual(reduced_1[0].data.at[0, "v1_main_sum"], 300 * 2)
-        self.assertEqual(reduced_1[0].data.at[0, "v1_main_sum_squares"], 869 * 2)
-        self.assertEqual(reduced_1[0].data.at[0, "v1_denominator_sum"], 500 * 2)
-        self.assertEqual(reduced_1[0].data.at[0, "v1_denominator_sum_squares"], 800 * 2)
-        self.assertEqual(
-            reduced_1[0].data.at[0, "v1_main_denominator_sum_product"], -905 * 2
-        )
-        self.assertEqual(reduced_1[0].data.at[0, "baseline_users"], 100 * 2)
-        self.assertEqual(reduced_1[0].data.at[0, "baseline_main_sum"], 270 * 2)
+        self.assertEqual(reduced_1[0].data[0]["dimension"], "(other)")
+        self.assertEqual(reduced_1[0].data[0]["v1_users"], 120 * 2)
+        self.assertEqual(reduced_1[0].data[0]["v1_main_sum"], 300 * 2)
+        self.assertEqual(reduced_1[0].data[0]["v1_main_sum_squares"], 869 * 2)
+        self.assertEqual(reduced_1[0].data[0]["v1_denominator_sum"], 500 * 2)
+        self.assertEqual(reduced_1[0].data[0]["v1_denominator_sum_squares"], 800 * 2)
         self.assertEqual(
-            reduced_1[0].data.at[0, "baseline_main_sum_squares"], 848.79 * 2
+            reduced_1[0].data[0]["v1_main_denominator_sum_product"], -905 * 2
         )
-        self.assertEqual(reduced_1[0].data.at[0, "baseline_denominator_sum"], 510 * 2)
+        self.assertEqual(reduced_1[0].data[0]["baseline_users"], 100 * 2)
+        self.assertEqual(reduced_1[0].data[0]["baseline_main_sum"], 270 * 2)
+        self.assertEqual(reduced_1[0].data[0]["baseline_main_sum_squares"], 848.79 * 2)
+        self.assertEqual(reduced_1[0].data[0]["baseline_denominator_sum"], 510 * 2)
         self.assertEqual(
-            reduced_1[0].data.at[0, "baseline_denominator_sum_squares"], 810 * 2
+            reduced_1[0].data[0]["baseline_denominator_sum_squares"], 810 * 2
         )
         self.assertEqual(
-            reduced_1[0].data.at[0, "baseline_main_denominator_sum_product"], -900 * 2
+            reduced_1[0].data[0]["baseline_main_denominator_sum_product"], -900 * 2
         )
 
 
@@ -1297,6 +1601,176 @@ class TestProcessAnalysis(TestCase):
             for i, v in enumerate(res.variations):
                 self.assertEqual(v.denominator, 510 if i == 0 else 500)
 
+    def test_process_analysis_rows_match_dataframe(self):
+        for rows in [RATIO_STATISTICS_DF, RA_STATISTICS_DF]:
+            kwargs = dict(
+                var_id_map={"zero": 0, "one": 1},
+                metric=RA_METRIC if rows is RA_STATISTICS_DF else RATIO_METRIC,
+                analysis=DEFAULT_ANALYSIS,
+            )
+            self.assertEqual(
+                process_analysis(rows.to_dict("records"), **kwargs),  # type: ignore
+                process_analysis(rows, **kwargs),  # type: ignore
+            )
+
+    def test_cuped_context_is_shared_across_passes(self):
+        metric_data = get_metric_dfs(
+            RA_STATISTICS_DF, {"zero": 0, "one": 1}, ["zero", "one"]
+        )
+        uncapped = [dataclasses.replace(d) for d in metric_data]
+        results = [
+            analyze_metric_df(
+                data, num_variations=2, metric=RA_METRIC, analysis=DEFAULT_ANALYSIS
+            )
+            for data in [metric_data, metric_data, uncapped]
+        ]
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0], results[2])
+        for d, u in zip(metric_data, uncapped):
+            self.assertEqual(list(d.cuped_contexts), [("mean_ra", False)])
+            self.assertIsNot(d.cuped_contexts, u.cuped_contexts)
+
+    def test_core_responses_are_not_rebuilt(self):
+        metric_data = get_metric_dfs(
+            RA_STATISTICS_DF, {"zero": 0, "one": 1}, ["zero", "one"]
+        )
+        core = analyze_metric_df(
+            metric_data,
+            num_variations=2,
+            metric=RA_METRIC,
+            analysis=DEFAULT_ANALYSIS,
+            with_supplemental_results=True,
+        )
+        unadjusted = analyze_metric_df(
+            metric_data,
+            num_variations=2,
+            metric=dataclasses.replace(RA_METRIC, statistic_type="mean"),
+            analysis=DEFAULT_ANALYSIS,
+        )
+        result = combine_core_and_supplemental_results(
+            core, unadjusted, None, None, None, None
+        )
+        for core_variation, variation, unadjusted_variation in zip(
+            core[0].variations, result[0].variations, unadjusted[0].variations
+        ):
+            self.assertIs(variation, core_variation)
+            self.assertIs(
+                variation.supplementalResults.cupedUnadjusted,  # type: ignore
+                unadjusted_variation,
+            )
+
+
+class TestPValueCorrections(TestCase):
+    def setUp(self):
+        metric_rows = {
+            "m0": [(300, 869), (270, 848.79), (770, 3571), (740, 3615.59)],
+            "m1": [(310, 869), (270, 848.79), (700, 3571), (740, 3615.59)],
+            "m2": [(330, 869), (270, 848.79), (780, 3571), (740, 3615.59)],
+        }
+        rows = []
+        for i, row in enumerate(QUERY_OUTPUT):
+            r = {k: row[k] for k in ["dimension", "variation", "users"]}
+            for j, metric_rows_j in enumerate(metric_rows.values()):
+                r[f"m{j}_main_sum"], r[f"m{j}_main_sum_squares"] = metric_rows_j[i]
+                r[f"m{j}_count"] = row["count"]
+            rows.append(r)
+        self.metrics = {
+            metric: dataclasses.asdict(
+                dataclasses.replace(
+                    COUNT_METRIC, id=metric, name=metric, business_metric_type=[kind]
+                )
+            )
+            for metric, kind in zip(metric_rows, ["goal", "goal", "guardrail"])
+        }
+        self.analysis = dataclasses.asdict(
+            dataclasses.replace(
+                DEFAULT_ANALYSIS,
+                var_names=["zero", "one"],
+                var_ids=["zero", "one"],
+                dimension="dimension",
+                stats_engine="frequentist",
+                p_value_corrected=True,
+                p_value_correction="holm-bonferroni",
+            )
+        )
+        self.query_results = [{"rows": rows, "metrics": list(metric_rows)}]
+
+    def run_analyses(self, analyses):
+        results, _ = process_experiment_results(
+            {
+                "metrics": self.metrics,
+                "analyses": analyses,
+                "query_results": self.query_results,
+            }
+        )
+        return results
+
+    def test_adjusts_goal_metrics_across_dimensions(self):
+        uncorrected = {**self.analysis, "p_value_correction": None}
+        results = self.run_analyses([self.analysis, uncorrected])
+        goal_variations = [
+            d.variations[1] for r in results[:2] for d in r.analyses[0].dimensions
+        ]
+        self.assertEqual(len(goal_variations), 4)
+        expected = adjust_p_values(
+            np.array([v.pValue for v in goal_variations]), "holm-bonferroni"
+        )
+        for v, p in zip(goal_variations, expected):
+            self.assertEqual(v.pValueAdjusted, p)  # type: ignore
+            self.assertLessEqual(v.ciAdjusted[0], v.ci[0])  # type: ignore
+            self.assertGreaterEqual(v.ciAdjusted[1], v.ci[1])  # type: ignore
+        # guardrails and analyses without a correction are left alone
+        for r, a in [(results[2], 0), (results[0], 1)]:
+            for d in r.analyses[a].dimensions:
+                self.assertIsNone(d.variations[1].pValueAdjusted)  # type: ignore
+                self.assertIsNone(d.variations[1].ciAdjusted)  # type: ignore
+
+    def test_skipped_quantile_analyses_keep_positions(self):
+        # quantile metrics skip precomputed dimension analyses, so their
+        # results have fewer analyses than the request
+        for i, row in enumerate(self.query_results[0]["rows"]):
+            quantile = 2 + 0.1 * i
+            row.update(
+                {
+                    "m3_quantile_n": row["users"],
+                    "m3_quantile_nstar": row["users"],
+                    "m3_quantile": quantile,
+                    "m3_quantile_lower": quantile - 0.2,
+                    "m3_quantile_upper": quantile + 0.2,
+                    "m3_main_sum": 0,
+                    "m3_main_sum_squares": 0,
+                    "m3_count": row["users"],
+                }
+            )
+        self.query_results[0]["metrics"].append("m3")
+        self.metrics["m3"] = dataclasses.asdict(
+            dataclasses.replace(
+                COUNT_METRIC,
+                id="m3",
+                name="m3",
+                statistic_type="quantile_unit",
+                main_metric_type="quantile",
+                quantile_value=0.5,
+                business_metric_type=["goal"],
+            )
+        )
+        uncorrected = {**self.analysis, "p_value_correction": None}
+        precomputed = {**self.analysis, "dimension": "precomputed:dimension"}
+        results = self.run_analyses([uncorrected, precomputed])
+        self.assertEqual(len(results[3].analyses), 1)
+        for d in results[3].analyses[0].dimensions:
+            self.assertIsNone(d.variations[1].pValueAdjusted)  # type: ignore
+        for r in results[:2]:
+            for d in r.analyses[1].dimensions:
+                self.assertIsNotNone(d.variations[1].pValueAdjusted)  # type: ignore
+
+    def test_bayesian_analyses_are_not_adjusted(self):
+        bayesian = {**self.analysis, "stats_engine": "bayesian"}
+        results = self.run_analyses([bayesian])
+        for r in results:
+            for d in r.analyses[0].dimensions:
+                self.assertNotIsInstance(d.variations[1], FrequentistVariationResponse)
+
 
 # Test data for 3-armed test with CUPED
 THREE_ARMED_CUPED_DF = pd.DataFrame(
@@ -0,0 +1,67 @@
+import json
+import subprocess
+import sys
+from unittest import TestCase, main as unittest_main
+
+# Generous enough for a loaded CI runner; a cold import currently takes ~0.9s
+IMPORT_BUDGET_SECONDS = 3.0
+
+LAZY_MODULES = [
+    "pandas",
+    "nbformat",
+    "gbstats.gen_notebook",
+    "gbstats.devtools",
+    "gbstats.bayesian.bandits",
+    "gbstats.models.post_stratification",
+]
+
+
+def cold_import(module: str) -> dict:
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(json.dumps({\n"
+        "    'seconds': time.perf_counter() - start,\n"
+        "    'modules': sorted(sys.modules),\n"
+        "}))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, check=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+class TestImportTime(TestCase):
+    def test_gbstats_import_within_budget(self):
+        # best of a few runs so a single slow disk read doesn't fail the test
+        seconds = min(cold_import("gbstats.gbstats")["seconds"] for _ in range(3))
+        self.assertLess(seconds, IMPORT_BUDGET_SECONDS)
+
+    def test_heavy_modules_load_lazily(self):
+        modules = set(cold_import("gbstats.gbstats")["modules"])
+        for module in LAZY_MODULES:
+            self.assertNotIn(module, modules)
+
+    def test_frequentist_tests_do_not_import_pandas(self):
+        modules = set(cold_import("gbstats.frequentist.tests")["modules"])
+        self.assertNotIn("pandas", modules)
+
+    def test_post_stratification_reexported_lazily(self):
+        from gbstats.models import post_stratification, tests
+
+        self.assertIs(
+            tests.EffectMomentsPostStratification,
+            post_stratification.EffectMomentsPostStratification,
+        )
+        from gbstats.models.tests import PostStratificationSummary
+
+        self.assertIs(
+            PostStratificationSummary, post_stratification.PostStratificationSummary
+        )
+        with self.assertRaises(AttributeError):
+            tests.NotAnExport  # type: ignore
+
+
+if __name__ == "__main__":
+    unittest_main()
@@ -10,6 +10,7 @@ from gbstats.models.tests import BaseConfig, EffectMoments, EffectMomentsConfig
 
 from gbstats.frequentist.tests import (
     FrequentistConfig,
+    sequential_interval_halfwidth,
     TwoSidedTTest,
     SequentialConfig,
     SequentialTwoSidedTTest,
@@ -29,6 +30,7 @@ from gbstats.models.statistics import (
 from gbstats.power.midexperimentpower import (
     MidExperimentPowerConfig,
     MidExperimentPower,
+    MidExperimentPowerBatch,
 )
 
 
@@ -103,7 +105,7 @@ class TestMidExperimentPower(TestCase):
         self.result_bayes = self.m_bayes.calculate_scaling_factor()
 
     def test_calculate_midexperiment_power_freq(self):
-        scaling_factor_true = 25.45703125
+        scaling_factor_true = 25.4564797
         if self.result_freq.scaling_factor:
             self.assertAlmostEqual(
                 self.m_freq.power(self.result_freq.scaling_factor), 0.8, places=4
@@ -115,7 +117,7 @@ class TestMidExperimentPower(TestCase):
             raise ValueError("scaling_factor_freq is None")
 
     def test_calculate_midexperiment_power_seq(self):
-        scaling_factor_true = 55.66796875
+        scaling_factor_true = 55.6683202
         if self.result_seq.scaling_factor:
             self.assertAlmostEqual(
                 self.m_seq.power(self.result_seq.scaling_factor), 0.8, places=4
@@ -127,7 +129,7 @@ class TestMidExperimentPower(TestCase):
             raise ValueError("scaling_factor_seq is None")
 
     def test_calculate_midexperiment_power_bayesian(self):
-        scaling_factor_true = 13.9404296875
+        scaling_factor_true = 13.9401998
         if self.result_bayes.scaling_factor:
             self.assertAlmostEqual(
                 self.m_bayes.power(self.result_bayes.scaling_factor), 0.8, places=4
@@ -137,3 +139,64 @@ class TestMidExperimentPower(TestCase):
             )
         else:
             raise ValueError("scaling_factor_bayes is None")
+
+    def test_batch_matches_single_cells(self):
+        power_config_tiny_mde = copy.deepcopy(self.power_config_freq)
+        power_config_tiny_mde.target_mde = 1e-7
+        power_config_large_mde = copy.deepcopy(self.power_config_seq)
+        power_config_large_mde.target_mde = 1.0
+        m_tiny_mde = MidExperimentPower(
+            self.test_freq.moments_result,
+            self.res_freq,
+            self.config,
+            power_config_tiny_mde,
+        )
+        m_large_mde = MidExperimentPower(
+            self.test_seq.moments_result,
+            self.res_seq,
+            self.config,
+            power_config_large_mde,
+        )
+        cells = [self.m_freq, m_tiny_mde, self.m_seq, m_large_mde, self.m_bayes]
+        results = MidExperimentPowerBatch(cells).calculate_scaling_factors()
+        self.assertEqual(results[0], self.result_freq)
+        self.assertEqual(results[2], self.result_seq)
+        self.assertEqual(results[4], self.result_bayes)
+        self.assertTrue(results[1].upper_bound_achieved)
+        self.assertIsNone(results[1].scaling_factor)
+        self.assertEqual(results[3].scaling_factor, 0)
+        for cell, result in zip(cells, results):
+            self.assertEqual(result, cell.calculate_scaling_factor())
+            if result.scaling_factor:
+                self.assertAlmostEqual(
+                    cell.power(result.scaling_factor), cell.adjusted_power, places=9
+                )
+
+    def test_batch_power_matches_reference(self):
+        def reference(m, s):
+            v = m.sigmahat_2_delta / (1 + s)
+            shift = 0
+            if m.prior_effect and m.prior_effect.proper:
+                precision = 1 / m.prior_effect.variance + 1 / v
+                halfwidth = v * precision**0.5 * m.multiplier
+                shift = v * m.prior_effect.mean / m.prior_effect.variance
+            elif m.sequential:
+                n = m.pairwise_sample_size
+                halfwidth = sequential_interval_halfwidth(
+                    n * m.sigmahat_2_delta, n * (1 + s), 5000, m.alpha
+                )
+            else:
+                halfwidth = m.multiplier * v**0.5
+            return (
+                1
+                - norm.cdf((halfwidth - shift - m.target_mde) / v**0.5)
+                + norm.cdf(-(halfwidth + shift + m.target_mde) / v**0.5)
+            )
+
+        cells = [self.m_freq, self.m_seq, self.m_bayes]
+        scaling_factors = np.array([0.5, 3.0, 40.0])
+        np.testing.assert_allclose(
+            MidExperimentPowerBatch(cells).power(scaling_factors),
+            [reference(c, s) for c, s in zip(cells, scaling_factors)],
+            rtol=1e-12,
+        )
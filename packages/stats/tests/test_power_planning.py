@@ -0,0 +1,126 @@
+from unittest import TestCase, main as unittest_main
+
+import numpy as np
+from scipy.stats import norm
+
+from gbstats.bayesian.tests import GaussianPrior
+from gbstats.models.results import EffectMomentsResult, Uplift
+from gbstats.models.results import TestResult as EffectTestResult
+from gbstats.models.statistics import (
+    RegressionAdjustedStatistic,
+    SampleMeanStatistic,
+)
+from gbstats.models.tests import BaseConfig
+from gbstats.power.midexperimentpower import (
+    MidExperimentPower,
+    MidExperimentPowerConfig,
+)
+from gbstats.power.planning import PowerPlanningConfig, plan_experiment
+
+
+class TestPlanExperiment(TestCase):
+    def setUp(self):
+        # 1,000 users a day with mean 3 and variance ~4
+        self.stat = SampleMeanStatistic(n=14000, sum=42000, sum_squares=14000 * 13)
+        self.v = self.stat.variance
+        self.mdes = [0.01, 0.03, 0.05]
+
+    def test_fixed_horizon_power_matches_formula(self):
+        result = plan_experiment([self.stat], 14, self.mdes)
+        self.assertEqual(result.power.shape, (1, 1, 3, 60))
+        n = 500 * result.days
+        for k, mde in enumerate(self.mdes):
+            se = np.sqrt(self.v / n + self.v * (1 + mde) ** 2 / n) / 3
+            z = norm.ppf(0.975)
+            expected = norm.sf(z - mde / se) + norm.cdf(-z - mde / se)
+            np.testing.assert_allclose(result.power[0, 0, k], expected, rtol=1e-12)
+
+    def test_matches_mid_experiment_power(self):
+        prior = GaussianPrior(mean=0.01, variance=0.001, proper=True)
+        for power_config in [
+            MidExperimentPowerConfig(target_mde=0.03, prior_effect=None),
+            MidExperimentPowerConfig(
+                target_mde=0.03, prior_effect=None, sequential=True
+            ),
+            MidExperimentPowerConfig(target_mde=0.03, prior_effect=prior),
+        ]:
+            config = PowerPlanningConfig(
+                prior_effect=power_config.prior_effect,
+                sequential=power_config.sequential,
+            )
+            result = plan_experiment([self.stat], 14, [0.03], config=config)
+            day = 10
+            se = np.sqrt(self.v / 5000 + self.v * 1.03**2 / 5000) / 3
+            mid_experiment = MidExperimentPower(
+                EffectMomentsResult(
+                    point_estimate=0.03,
+                    standard_error=se,
+                    pairwise_sample_size=10000,
+                    error_message=None,
+                    post_stratification_applied=False,
+                ),
+                EffectTestResult(
+                    expected=0.03,
+                    ci=(0, 0.06),
+                    uplift=Uplift(dist="normal", mean=0.03, stddev=se),
+                    errorMessage=None,
+                ),
+                BaseConfig(),
+                power_config,
+            )
+            self.assertAlmostEqual(
+                result.power[0, 0, 0, day - 1], mid_experiment.power(0), places=12
+            )
+
+    def test_required_days_first_reach_target(self):
+        config = PowerPlanningConfig(max_days=30)
+        splits = [[0.5, 0.5], [0.2, 0.8], [0.4, 0.3, 0.3]]
+        with self.assertRaises(ValueError):
+            plan_experiment([self.stat], 14, self.mdes, splits, config=config)
+        result = plan_experiment([self.stat], 14, self.mdes, splits[:2], config=config)
+        power, required_days = result.power[0], result.required_days[0]
+        # 1% is not detectable within 30 days
+        self.assertTrue(np.all(np.isnan(required_days[:, 0])))
+        for s in range(2):
+            for k in range(1, 3):
+                day = int(required_days[s, k])
+                self.assertGreaterEqual(power[s, k, day - 1], 0.8)
+                if day > 1:
+                    self.assertLess(power[s, k, day - 2], 0.8)
+        # an uneven split needs longer than an even one
+        self.assertTrue(np.all(required_days[1, 1:] > required_days[0, 1:]))
+        np.testing.assert_array_equal(result.required_users[0], required_days * 1000)
+
+    def test_multiple_variations_use_least_powered_arm(self):
+        even = plan_experiment([self.stat], 14, self.mdes, num_variations=3)
+        uneven = plan_experiment(
+            [self.stat],
+            14,
+            self.mdes,
+            [[1 / 3, 1 / 3, 1 / 3], [0.4, 0.4, 0.2]],
+            num_variations=3,
+        )
+        np.testing.assert_allclose(uneven.power[0, 0], even.power[0, 0])
+        self.assertTrue(np.all(uneven.power[0, 1] < even.power[0, 0]))
+
+    def test_cuped_shortens_experiments(self):
+        post = self.stat
+        pre = SampleMeanStatistic(n=14000, sum=42000, sum_squares=14000 * 13)
+        # pre-period correlation of 0.8
+        cuped = RegressionAdjustedStatistic(
+            n=14000,
+            post_statistic=post,
+            pre_statistic=pre,
+            post_pre_sum_of_products=14000 * (9 + 0.8 * 4),
+            theta=None,
+        )
+        result = plan_experiment([post, cuped], 14, self.mdes[1:])
+        self.assertTrue(np.all(result.required_days[1] < result.required_days[0]))
+        # variance shrinks by 1 - rho^2 = 0.36, so 9 days match 25 unadjusted
+        np.testing.assert_allclose(
+            result.power[1, :, :, 8], result.power[0, :, :, 24], rtol=1e-12
+        )
+
+
+if __name__ == "__main__":
+    unittest_main()
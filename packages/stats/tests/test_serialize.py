@@ -0,0 +1,67 @@
+import json
+from dataclasses import asdict
+from unittest import TestCase, main as unittest_main
+
+import numpy as np
+
+from gbstats import serialize
+from gbstats.models.results import (
+    BaselineResponse,
+    DimensionResponseIndividual,
+    FrequentistVariationResponseIndividual,
+    MetricStats,
+    RealizedSettings,
+    Uplift,
+)
+
+
+def variation_response(value: float) -> FrequentistVariationResponseIndividual:
+    return FrequentistVariationResponseIndividual(
+        cr=0.1,
+        value=value,
+        users=100,
+        denominator=100,
+        stats=MetricStats(users=100, count=100, stddev=0.3, mean=0.1),
+        expected=value,
+        ci=(value - 1, value + 1),
+        uplift=Uplift(dist="normal", mean=value, stddev=0.01),
+        errorMessage=None,
+        pValue=np.float64(0.5),
+        pValueErrorMessage=None,
+        realizedSettings=RealizedSettings(postStratificationApplied=False),
+    )
+
+
+def dimension_response(value: float) -> DimensionResponseIndividual:
+    return DimensionResponseIndividual(
+        dimension="All",
+        srm=0.5,
+        variations=[
+            BaselineResponse(
+                cr=0.1,
+                value=10,
+                users=100,
+                denominator=100,
+                stats=MetricStats(users=100, count=100, stddev=0.3, mean=0.1),
+            ),
+            variation_response(value),
+        ],
+    )
+
+
+class TestDumps(TestCase):
+    def test_matches_asdict_json_dumps(self):
+        for value in [0.05, float("nan"), float("-inf")]:
+            result = dimension_response(value)
+            self.assertEqual(
+                serialize.dumps({"id": "a", "results": [result]}),
+                json.dumps({"id": "a", "results": [asdict(result)]}, allow_nan=True),
+            )
+
+    def test_rejects_unknown_types(self):
+        with self.assertRaises(TypeError):
+            serialize.dumps({"value": object()})
+
+
+if __name__ == "__main__":
+    unittest_main()
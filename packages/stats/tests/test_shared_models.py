@@ -2,12 +2,13 @@
 1. Demonstrating of the expected inputs
 2. Demonstrating equivalence to numpy methods that take raw data"""
 
-from unittest import TestCase, main as unittest_main
+from unittest import TestCase, main as unittest_main, mock
 import numpy as np
-from dataclasses import asdict
+from dataclasses import asdict, replace
 from typing import Literal
 
 from gbstats.messages import ZERO_NEGATIVE_VARIANCE_MESSAGE
+from gbstats.models import statistics
 from gbstats.models.statistics import (
     ProportionStatistic,
     RatioStatistic,
@@ -15,7 +16,9 @@ from gbstats.models.statistics import (
     RegressionAdjustedStatistic,
     SampleMeanStatistic,
     QuantileStatistic,
+    CupedContext,
     compute_theta,
+    create_theta_adjusted_statistics,
 )
 
 from gbstats.frequentist.tests import FrequentistConfig, TwoSidedTTest
@@ -192,6 +195,76 @@ class TestComputeTheta(TestCase):
         self.assertEqual(compute_theta(ra_stat_a, ra_stat_b), 0)
 
 
+def regression_adjusted_stat(rng, n: int, proportion: bool = False, lift: float = 0):
+    pre = rng.normal(5, 2, n)
+    post = 0.6 * pre + rng.normal(2 + lift, 1, n)
+    if proportion:
+        pre, post = (pre > 5).astype(float), (post > 5).astype(float)
+
+    def make(x: np.ndarray):
+        if proportion:
+            return ProportionStatistic(n=n, sum=float(x.sum()))
+        return SampleMeanStatistic(
+            n=n, sum=float(x.sum()), sum_squares=float((x**2).sum())
+        )
+
+    return RegressionAdjustedStatistic(
+        n=n,
+        post_statistic=make(post),
+        pre_statistic=make(pre),
+        post_pre_sum_of_products=float((post * pre).sum()),
+        theta=None,
+    )
+
+
+class TestCupedContext(TestCase):
+    def assert_matches_pairwise(self, control, variations):
+        context = CupedContext(control, variations)
+        for i, variation in enumerate(variations):
+            self.assertEqual(
+                context.adjusted_statistics(i),
+                create_theta_adjusted_statistics(control, variation),
+            )
+
+    def test_regression_adjusted_statistics(self):
+        rng = np.random.default_rng(7)
+        for proportion in [False, True]:
+            with self.subTest(proportion=proportion):
+                control = regression_adjusted_stat(rng, 300, proportion)
+                variations = [
+                    regression_adjusted_stat(rng, 250 + 10 * k, proportion, 0.1 * k)
+                    for k in range(4)
+                ]
+                self.assert_matches_pairwise(control, variations)
+
+    def test_regression_adjusted_ratio_statistics(self):
+        stat = TestEffectMomentsCupedRatioNegativeBaseline._stat
+        d = np.array([1.0, 2.0, 1.5, 2.5])
+        control = replace(stat(METRIC_1, d, METRIC_3, d[::-1]), theta=None)
+        variations = [
+            replace(stat(METRIC_3, d[::-1], METRIC_1, d), theta=None),
+            replace(stat(METRIC_1 + 1, d, METRIC_3, d), theta=None),
+        ]
+        self.assert_matches_pairwise(control, variations)
+
+    def test_no_variance_and_fixed_theta(self):
+        rng = np.random.default_rng(8)
+        control = regression_adjusted_stat(rng, 300)
+        no_pre_variance = replace(
+            control,
+            pre_statistic=SampleMeanStatistic(n=300, sum=0, sum_squares=0),
+            post_pre_sum_of_products=0,
+        )
+        self.assert_matches_pairwise(no_pre_variance, [no_pre_variance])
+        fixed_theta = replace(regression_adjusted_stat(rng, 200), theta=0.4)
+        self.assert_matches_pairwise(replace(control, theta=0.4), [fixed_theta])
+        # non-regression-adjusted statistics pass through unchanged
+        self.assert_matches_pairwise(
+            control.post_statistic, [fixed_theta.post_statistic]
+        )
+        self.assertEqual(CupedContext(control, []).thetas, [])
+
+
 class TestSumStats(TestCase):
     def setUp(self):
         self.stat_a_0 = SampleMeanStatistic(n=500, sum=10, sum_squares=75)
@@ -452,5 +525,41 @@ class TestEffectMomentsCupedRatioNegativeBaseline(TestCase):
                 self.assertAlmostEqual(negative.standard_error, positive.standard_error)
 
 
+class TestCachedMoments(TestCase):
+    def setUp(self):
+        stat = TestEffectMomentsCupedRatioNegativeBaseline._stat
+        d = np.array([1.0, 2.0, 1.5, 2.5])
+        self.stat_a = stat(METRIC_1, d, METRIC_3, d[::-1])
+        self.stat_b = stat(METRIC_3, d[::-1], METRIC_1, d)
+
+    def test_effect_moments_evaluate_each_covariance_once(self):
+        calls = []
+
+        def compute_covariance(**kwargs):
+            calls.append(kwargs)
+            return covariance(**kwargs)
+
+        covariance = statistics.compute_covariance
+        with mock.patch.object(statistics, "compute_covariance", compute_covariance):
+            result = EffectMoments([(self.stat_a, self.stat_b)]).compute_result()
+            # six distinct covariances per statistic
+            self.assertEqual(len(calls), 12)
+            self.assertEqual(
+                EffectMoments([(self.stat_a, self.stat_b)]).compute_result(), result
+            )
+            self.assertEqual(len(calls), 12)
+
+    def test_cache_is_invisible_to_dataclass_behavior(self):
+        variance = self.stat_a.variance
+        self.assertIn("_variance", self.stat_a.__dict__)
+        self.assertNotIn("variance", asdict(self.stat_a))
+        self.assertEqual(self.stat_a, replace(self.stat_a))
+        adjusted = replace(self.stat_a, theta=0)
+        self.assertNotIn("_variance", adjusted.__dict__)
+        self.assertNotEqual(adjusted.variance, variance)
+        with self.assertRaises(ValueError):
+            self.stat_a.nabla[0] = 1
+
+
 if __name__ == "__main__":
     unittest_main()
@@ -0,0 +1,78 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from unittest import TestCase, main as unittest_main, skipUnless
+
+STATS_DIR = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = STATS_DIR.parent / "back-end" / "scripts"
+
+
+@skipUnless(
+    (SCRIPTS_DIR / "stats_fork_server.py").exists() and hasattr(os, "fork"),
+    "stats fork server script not available",
+)
+class TestStatsForkServer(TestCase):
+    def setUp(self):
+        sys.path.insert(0, str(SCRIPTS_DIR))
+        self.addCleanup(sys.path.remove, str(SCRIPTS_DIR))
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.socket_path = os.path.join(directory.name, "stats.sock")
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(
+            [str(STATS_DIR), str(SCRIPTS_DIR), env.get("PYTHONPATH", "")]
+        )
+        self.server = subprocess.Popen(
+            [
+                sys.executable,
+                str(SCRIPTS_DIR / "stats_fork_server.py"),
+                self.socket_path,
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env,
+            text=True,
+        )
+        self.addCleanup(self.stop_server)
+
+    def stop_server(self):
+        self.server.kill()
+        self.server.wait()
+        for pipe in [self.server.stdin, self.server.stdout]:
+            if pipe is not None:
+                pipe.close()
+
+    def test_protocol(self):
+        from stats_fork_server import WARMUP_DATA
+
+        assert self.server.stdout is not None and self.server.stdin is not None
+        ready = json.loads(self.server.stdout.readline())
+        self.assertEqual(ready, {"ready": True, "pid": self.server.pid})
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.connect(self.socket_path)
+            with conn.makefile("r") as infile, conn.makefile("w") as outfile:
+                # the forked child announces itself before any results
+                child_pid = json.loads(infile.readline())["pid"]
+                self.assertNotEqual(child_pid, self.server.pid)
+                outfile.write(json.dumps({"id": "smoke", "data": WARMUP_DATA}) + "\n")
+                outfile.flush()
+                response = json.loads(infile.readline())
+        self.assertEqual(response["id"], "smoke")
+        [result] = response["results"]
+        self.assertEqual(result["id"], "warmup")
+        self.assertIsNone(result["error"])
+        self.assertEqual(len(result["results"]), 3)
+
+        # closing stdin shuts the server down and removes the socket
+        self.server.stdin.close()
+        self.assertEqual(self.server.wait(timeout=10), 0)
+        self.assertFalse(os.path.exists(self.socket_path))
+
+
+if __name__ == "__main__":
+    unittest_main()
@@ -3,10 +3,12 @@ from functools import partial
 from unittest import TestCase, main as unittest_main
 
 import numpy as np
-from scipy.stats import norm
+from scipy.stats import chi2, norm
 import copy
 
 from gbstats.utils import (
+    check_srm,
+    check_srm_bulk,
     frequentist_diff,
     multinomial_covariance,
     truncated_normal_mean,
@@ -97,3 +99,40 @@ class TestMultinomial(TestCase):
         v_theoretical = multinomial_covariance(self.nu)
         v_empirical = np.cov(data, rowvar=False, ddof=1)
         self.assertTrue(np.allclose(v_theoretical, v_empirical, atol=1e-3))
+
+
+class TestCheckSrm(TestCase):
+    def test_bulk_matches_single(self):
+        weights = [0.25, 0.25, 0.5, 0]
+        users = [
+            [1000, 1010, 2050, 0],
+            [500, 400, 1100, 3],
+            [0, 0, 0, 0],
+            [10, 0, 0, 0],
+        ]
+        p_values = check_srm_bulk(users, weights)
+        self.assertEqual(len(p_values), len(users))
+        for row, p_value in zip(users, p_values):
+            total = sum(row)
+            expected = 1
+            if total:
+                x = sum(
+                    (o - w * total) ** 2 / (w * total)
+                    for o, w in zip(row, weights)
+                    if w > 0
+                )
+                expected = chi2.sf(x, len(row) - 1)
+            self.assertAlmostEqual(p_value, expected)
+            self.assertAlmostEqual(check_srm(row, weights), expected)
+        self.assertEqual(p_values[2], 1)
+        self.assertAlmostEqual(check_srm([1000, 1000], [0.5, 0.5]), 1)
+        self.assertLess(check_srm([1000, 1200], [0.5, 0.5]), 0.001)
+
+    def test_weight_count_mismatch(self):
+        # weights of variations without users still count towards the total
+        self.assertAlmostEqual(
+            check_srm([1000, 1000], [0.25, 0.25, 0.5]),
+            chi2.sf(2 * (1000 - 500) ** 2 / 500, 1),
+        )
+        with self.assertRaisesRegex(ValueError, "weight per variation"):
+            check_srm_bulk([[1000, 1000, 1000]], [0.5, 0.5])